@@ -7,9 +7,10 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from Data_Masking.remote_ner_model import RemoteNERModel
+from Data_Masking.backends import get_backend
 
-# NER模型加载器单例类（现在使用远程模型）
+# NER模型加载器单例类，后端由 config.json 中的 model_config.model_type 决定
+# （remote: 远程模型，gazetteer: 本地词典匹配，onnx: 本地ONNX模型）
 class NERModelLoader:
     _instance = None
 
@@ -19,8 +20,7 @@ class NERModelLoader:
         return cls._instance
 
     def __init__(self):
-        # 使用远程NER模型
-        self.ner_pipeline = RemoteNERModel()
+        self.ner_pipeline = get_backend()
 
     def get_pipeline(self):
         return self.ner_pipeline
@@ -29,27 +29,50 @@ class NERModelLoader:
         """直接处理单个文本"""
         return self.ner_pipeline.process_text(text)
 
-def recognize_entities(text, save_to_file=True, output_dir='output', output_filename='result.json', max_chunk_size=450, num_workers=4, enable_parallel=False):
+    def process_texts(self, texts):
+        """批量处理多个文本块，返回与输入等长的结果列表"""
+        return self.ner_pipeline.process_texts(texts)
+
+def recognize_entities(text, save_to_file=True, output_dir='output', output_filename='result.json', max_chunk_size=None, num_workers=None, enable_parallel=None, deduplicate=True):
     """
-    使用远程NER模型识别文本中的实体
+    使用配置的NER后端识别文本中的实体
 
     参数:
         text (str): 待识别的文本
         save_to_file (bool): 是否将结果保存到文件，默认为True
         output_dir (str): 输出目录，默认为'output'
         output_filename (str): 输出文件名，默认为'result.json'
-        max_chunk_size (int): 每个文本块的最大字符数，默认为450
-        num_workers (int): 并行处理的工作线程数，默认为4
-        enable_parallel (bool): 是否启用并行处理，默认为False
+        max_chunk_size (int): 每个文本块的最大字符数，默认取 ner_config.max_chunk_size（450）
+        num_workers (int): 并行处理的工作线程数，默认取 ner_config.num_workers（4）
+        enable_parallel (bool): 是否启用并行处理，默认取 ner_config.enable_parallel（False）
+        deduplicate (bool): 是否按 (实体文本, 实体类型) 去重，默认为True；为False时保留实体的每一次出现
 
     返回:
         dict: 识别结果的字典
     """
-    # 直接使用远程NER模型的recognize_entities函数
+    # 分块、并行和结果合并由remote_ner_model中的recognize_entities统一处理，与后端类型无关
     from Data_Masking.remote_ner_model import recognize_entities as remote_recognize_entities
-    return remote_recognize_entities(text, save_to_file, output_dir, output_filename, max_chunk_size, num_workers, enable_parallel)
+    return remote_recognize_entities(text, save_to_file, output_dir, output_filename, max_chunk_size, num_workers, enable_parallel, deduplicate)
+
+async def arecognize_entities(text, save_to_file=False, output_dir='output', output_filename='result.json', max_chunk_size=None, deduplicate=True):
+    """
+    recognize_entities 的异步版本，基于AsyncOpenAI，在途请求数由全局并发信号量控制
+
+    参数:
+        text (str): 待识别的文本
+        save_to_file (bool): 是否将结果保存到文件，默认为False
+        output_dir (str): 输出目录，默认为'output'
+        output_filename (str): 输出文件名，默认为'result.json'
+        max_chunk_size (int): 每个文本块的最大字符数，默认取 ner_config.max_chunk_size（450）
+        deduplicate (bool): 是否按 (实体文本, 实体类型) 去重，默认为True
+
+    返回:
+        dict: 识别结果的字典
+    """
+    from Data_Masking.remote_ner_model import arecognize_entities as remote_arecognize_entities
+    return await remote_arecognize_entities(text, save_to_file, output_dir, output_filename, max_chunk_size, deduplicate)
 
-def batch_recognize_entities(texts, save_to_file=True, output_dir='output', output_filename_prefix='result', max_chunk_size=450, num_workers=4, enable_parallel=False):
+def batch_recognize_entities(texts, save_to_file=True, output_dir='output', output_filename_prefix='result', max_chunk_size=None, num_workers=None, enable_parallel=None):
     """
     批量处理多个文本的实体识别
 
@@ -58,9 +81,9 @@ def batch_recognize_entities(texts, save_to_file=True, output_dir='output', outp
         save_to_file (bool): 是否将结果保存到文件，默认为True
         output_dir (str): 输出目录，默认为'output'
         output_filename_prefix (str): 输出文件名前缀，默认为'result'
-        max_chunk_size (int): 每个文本块的最大字符数，默认为450
-        num_workers (int): 并行处理的工作线程数，默认为4
-        enable_parallel (bool): 是否启用并行处理，默认为False
+        max_chunk_size (int): 每个文本块的最大字符数，默认取 ner_config.max_chunk_size（450）
+        num_workers (int): 并行处理的工作线程数，默认取 ner_config.num_workers（4）
+        enable_parallel (bool): 是否启用并行处理，默认取 ner_config.enable_parallel（False）
 
     返回:
         List[dict]: 识别结果的字典列表
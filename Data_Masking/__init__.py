@@ -1,7 +1,9 @@
 # Data_Masking 包初始化文件
 
 # 导入NER模型相关功能
-from .NER_model import recognize_entities, NERModelLoader, batch_recognize_entities
+from .NER_model import recognize_entities, arecognize_entities, NERModelLoader, batch_recognize_entities
+from .ner_resilience import RemoteNERError, CircuitOpenError
+from .instrumentation import configure_logging
 
 # 导入脱敏相关功能
 from .masking import (
@@ -12,7 +14,8 @@ from .masking import (
 # 导出模块内容
 __all__ = [
     # NER模型相关
-    'recognize_entities', 'NERModelLoader', 'batch_recognize_entities',
+    'recognize_entities', 'arecognize_entities', 'NERModelLoader', 'batch_recognize_entities',
+    'RemoteNERError', 'CircuitOpenError', 'configure_logging',
     # 脱敏策略相关
     'MaskingStrategy', 'ReplacementStrategy', 'HashStrategy', 'TypeBasedStrategy',
     # 脱敏器相关
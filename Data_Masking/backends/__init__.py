@@ -0,0 +1,17 @@
+# NER后端模块
+# 远程模型、词典匹配和ONNX本地模型共用同一接口，由 model_config.model_type 选择
+
+from .base import NERBackend
+from .registry import (
+    available_backends, create_backend, get_backend, load_config, register_backend, reset_backends
+)
+
+__all__ = [
+    'NERBackend',
+    'available_backends',
+    'create_backend',
+    'get_backend',
+    'load_config',
+    'register_backend',
+    'reset_backends',
+]
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# NER后端接口 - 远程模型和本地模型共同实现的识别接口
+
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+
+from Data_Masking.chunk_prefilter import ChunkPrefilter, create_chunk_prefilter
+from Data_Masking.execution_settings import ExecutionAutotuner, create_autotuner
+
+# 项目根目录，配置文件和本地模型的相对路径都相对于它
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def resolve_path(path: str) -> str:
+    """把配置中的相对路径解析为相对项目根目录的绝对路径"""
+    return path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+
+
+class NERBackend:
+    """NER后端基类
+
+    子类至少实现 process_texts；识别结果的格式与远程模型一致：
+    {'output': [{'span', 'type', 'start', 'end', 'prob'}, ...]}，位置为文本块内的字符索引。
+    """
+
+    # 后端名称，对应 model_config.model_type
+    name = 'base'
+
+    def __init__(self, config: Dict[str, Any]):
+        """
+        参数:
+            config (Dict[str, Any]): 完整的 config.json 配置
+        """
+        self.config = config
+
+    def process_texts(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """批量识别多个文本块，返回与输入等长、顺序一致的结果列表"""
+        raise NotImplementedError
+
+    def process_text(self, text: str) -> Dict[str, Any]:
+        """识别单个文本块"""
+        return self.process_texts([text])[0]
+
+    async def aprocess_texts(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """process_texts 的异步版本，默认在线程池中执行同步识别，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.process_texts, texts)
+
+    async def aprocess_text(self, text: str) -> Dict[str, Any]:
+        """process_text 的异步版本"""
+        return (await self.aprocess_texts([text]))[0]
+
+    def get_batch_size(self) -> int:
+        """recognize_entities 每次调用 process_texts 时传入的文本块数"""
+        return 1
+
+    def get_prefilter(self) -> Optional[ChunkPrefilter]:
+        """返回文本块预过滤器（prefilter_config 未启用时为None），首次调用时创建"""
+        if '_prefilter' not in self.__dict__:
+            self._prefilter = create_chunk_prefilter(self.config)
+        return self._prefilter
+
+    def get_autotuner(self) -> Optional[ExecutionAutotuner]:
+        """返回执行参数自动调优器（autotune_config 未启用时为None），首次调用时创建"""
+        if '_autotuner' not in self.__dict__:
+            self._autotuner = create_autotuner(self.config)
+        return self._autotuner
+
+    def get_pipeline(self):
+        """兼容旧接口，返回自身"""
+        return self
+
+    def get_recognizer(self):
+        """返回实际执行识别的对象，默认为自身"""
+        return self
+
+    def get_cascade_stats(self) -> Optional[Dict[str, Any]]:
+        """级联识别统计，不支持级联的后端返回None"""
+        return None
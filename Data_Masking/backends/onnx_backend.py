@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ONNX NER后端 - 在本地CPU上运行导出为ONNX格式的token分类模型（如BERT的BIO序列标注模型）
+
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from Data_Masking.backends.base import NERBackend, resolve_path
+
+logger = logging.getLogger(__name__)
+
+
+class OnnxTokenClassifierBackend(NERBackend):
+    """ONNX token分类模型NER后端
+
+    模型目录中需要包含：
+    - model.onnx：输入 input_ids / attention_mask（可选 token_type_ids），输出 [batch, seq, labels] 的logits
+    - tokenizer.json：HuggingFace tokenizers 格式的分词器，用于获得每个token在原文中的字符位置
+    - config.json（可选）：HuggingFace 模型配置，从 id2label 读取标签列表
+
+    标签支持 BIO / BIOES 标注；实体置信度为其各token预测概率的平均值。
+    依赖 onnxruntime、tokenizers 和 numpy（可选依赖，仅使用该后端时需要安装）。
+    """
+
+    name = 'onnx'
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        local_config = config.get('local_model_config', {})
+        model_dir = local_config.get('onnx_model_dir')
+        if not model_dir:
+            raise ValueError("ONNX后端需要配置 local_model_config.onnx_model_dir")
+        model_dir = resolve_path(model_dir)
+
+        try:
+            import numpy
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "ONNX后端需要安装可选依赖：pip install onnxruntime tokenizers numpy"
+            ) from e
+        self._np = numpy
+
+        self.batch_size = max(1, int(local_config.get('batch_size', 16)))
+        self.max_length = int(local_config.get('max_length', 512))
+        self.min_prob = float(local_config.get('min_prob', 0.5))
+        # 模型标签类型到本项目实体类型的映射，如 {"PER": "人名"}
+        self.type_mapping = dict(local_config.get('type_mapping', {}))
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self._tokenizer.enable_truncation(self.max_length)
+        self._tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        num_threads = int(local_config.get('num_threads', 0))
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        model_path = os.path.join(model_dir, local_config.get('onnx_model_file', 'model.onnx'))
+        self._session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self._input_names = {model_input.name for model_input in self._session.get_inputs()}
+
+        self.labels = list(local_config.get('labels') or self._load_labels(model_dir))
+        if not self.labels:
+            raise ValueError("ONNX后端未找到标签列表，请配置 local_model_config.labels 或在模型目录中提供 config.json")
+
+        logger.info("初始化ONNX NER后端: %s，共%d个标签", model_path, len(self.labels))
+
+    @staticmethod
+    def _load_labels(model_dir: str) -> List[str]:
+        """从HuggingFace模型配置的 id2label 读取标签列表"""
+        config_path = os.path.join(model_dir, 'config.json')
+        if not os.path.exists(config_path):
+            return []
+        with open(config_path, 'r', encoding='utf-8') as f:
+            id2label = json.load(f).get('id2label', {})
+        return [label for _, label in sorted(id2label.items(), key=lambda item: int(item[0]))]
+
+    @staticmethod
+    def _split_label(label: str):
+        """把标签拆成 (前缀, 实体类型)，如 B-PER -> (B, PER)；没有前缀的非O标签视为I"""
+        if label == 'O':
+            return 'O', ''
+        if '-' in label:
+            prefix, entity_type = label.split('-', 1)
+            return prefix.upper(), entity_type
+        return 'I', label
+
+    def _decode(self, text: str, encoding, probs) -> List[Dict[str, Any]]:
+        """把一个文本块的逐token预测合并为实体，位置由分词器的字符偏移得到"""
+        entities = []
+        current: Optional[Dict[str, Any]] = None
+
+        def close():
+            nonlocal current
+            if current is not None:
+                prob = sum(current['probs']) / len(current['probs'])
+                if prob >= self.min_prob:
+                    entities.append({
+                        'span': text[current['start']:current['end']],
+                        'type': self.type_mapping.get(current['type'], current['type']),
+                        'start': current['start'],
+                        'end': current['end'],
+                        'prob': prob
+                    })
+            current = None
+
+        label_ids = probs.argmax(axis=-1)
+        for index, ((start, end), special) in enumerate(zip(encoding.offsets, encoding.special_tokens_mask)):
+            if special or start == end:
+                close()
+                continue
+            label_id = int(label_ids[index])
+            prefix, entity_type = self._split_label(self.labels[label_id])
+            if prefix == 'O':
+                close()
+                continue
+
+            if prefix in ('B', 'S') or current is None or current['type'] != entity_type:
+                close()
+                current = {'type': entity_type, 'start': start, 'end': end, 'probs': []}
+            current['end'] = end
+            current['probs'].append(float(probs[index, label_id]))
+            if prefix in ('E', 'S'):
+                close()
+        close()
+        return entities
+
+    def _run_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        np = self._np
+        encodings = self._tokenizer.encode_batch(texts)
+        for text, encoding in zip(texts, encodings):
+            if encoding.overflowing:
+                logger.warning("ONNX后端: 文本块超过 max_length=%d 个token，超出部分未识别（文本长度 %d 字符），"
+                               "请减小 max_chunk_size", self.max_length, len(text))
+
+        feeds = {
+            'input_ids': np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            'attention_mask': np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            'token_type_ids': np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        feeds = {name: value for name, value in feeds.items() if name in self._input_names}
+        logits = self._session.run(None, feeds)[0]
+
+        # softmax，减去最大值避免溢出
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        probs = exp / exp.sum(axis=-1, keepdims=True)
+        return [{'output': self._decode(text, encoding, text_probs)}
+                for text, encoding, text_probs in zip(texts, encodings, probs)]
+
+    def process_texts(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """按 batch_size 分批推理；onnxruntime 推理时释放GIL，多个线程可同时调用"""
+        results = []
+        for start in range(0, len(texts), self.batch_size):
+            results.extend(self._run_batch(texts[start:start + self.batch_size]))
+        return results
+
+    def get_batch_size(self) -> int:
+        return self.batch_size
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# NER后端注册表 - 根据 model_config.model_type 创建对应的后端
+
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from Data_Masking.backends.base import PROJECT_ROOT, NERBackend
+from Data_Masking.instrumentation import apply_log_config
+
+# 后端名称 -> 工厂函数（参数为完整配置）
+_BACKEND_FACTORIES: Dict[str, Callable[[Dict[str, Any]], NERBackend]] = {}
+_active_backend: Optional[NERBackend] = None
+_lock = threading.Lock()
+
+DEFAULT_BACKEND = 'remote'
+
+
+def load_config() -> Dict[str, Any]:
+    """加载配置文件，环境变量 DATA_MASKING_CONFIG 可指定其他配置文件路径"""
+    config_path = os.environ.get('DATA_MASKING_CONFIG') or os.path.join(PROJECT_ROOT, 'config.json')
+
+    if not os.path.exists(config_path):
+        raise FileNotFoundError(
+            f"配置文件不存在: {config_path}\n"
+            "请创建config.json文件并配置远程模型信息"
+        )
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def register_backend(name: str, factory: Callable[[Dict[str, Any]], NERBackend]):
+    """注册NER后端
+
+    参数:
+        name (str): 后端名称，即 model_config.model_type 的取值
+        factory (Callable): 接收完整配置、返回 NERBackend 实例的工厂函数（通常就是后端类）
+    """
+    _BACKEND_FACTORIES[name] = factory
+
+
+def available_backends() -> List[str]:
+    """返回已注册的后端名称"""
+    return sorted(_BACKEND_FACTORIES)
+
+
+def create_backend(config: Dict[str, Any], model_type: Optional[str] = None) -> NERBackend:
+    """按名称创建NER后端
+
+    参数:
+        config (Dict[str, Any]): 完整配置
+        model_type (str, optional): 后端名称，默认取 model_config.model_type，未配置时为 remote
+
+    返回:
+        NERBackend: 后端实例
+    """
+    model_type = model_type or config.get('model_config', {}).get('model_type') or DEFAULT_BACKEND
+    factory = _BACKEND_FACTORIES.get(model_type)
+    if factory is None:
+        raise ValueError(f"未知的NER后端: {model_type}，可选: {', '.join(available_backends())}")
+    return factory(config)
+
+
+def get_backend() -> NERBackend:
+    """返回当前配置对应的NER后端（进程内只创建一次，reset_backends 后重新读取配置）"""
+    global _active_backend
+    with _lock:
+        if _active_backend is None:
+            config = load_config()
+            # 日志的采样率和原文记录开关随配置生效，即使调用方没有调用 configure_logging
+            apply_log_config(config)
+            _active_backend = create_backend(config)
+        return _active_backend
+
+
+def reset_backends():
+    """丢弃已创建的后端，下次调用 get_backend 时重新读取配置"""
+    global _active_backend
+    from Data_Masking.remote_ner_model import RemoteNERModel
+
+    with _lock:
+        _active_backend = None
+    RemoteNERModel.reset_instance()
+
+
+def _create_remote_backend(config: Dict[str, Any]) -> NERBackend:
+    # 远程模型本身是单例，读取同一份配置，延迟导入以避免循环导入
+    from Data_Masking.remote_ner_model import RemoteNERModel
+    return RemoteNERModel()
+
+
+def _create_gazetteer_backend(config: Dict[str, Any]) -> NERBackend:
+    from Data_Masking.backends.gazetteer import GazetteerBackend
+    return GazetteerBackend(config)
+
+
+def _create_onnx_backend(config: Dict[str, Any]) -> NERBackend:
+    # onnxruntime 等可选依赖只在选择该后端时导入
+    from Data_Masking.backends.onnx_backend import OnnxTokenClassifierBackend
+    return OnnxTokenClassifierBackend(config)
+
+
+register_backend('remote', _create_remote_backend)
+register_backend('gazetteer', _create_gazetteer_backend)
+register_backend('onnx', _create_onnx_backend)
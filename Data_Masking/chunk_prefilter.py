@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 文本块预过滤 - 在调用NER模型之前用本地规则跳过不可能包含命名实体的文本块
+
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from Data_Masking.instrumentation import log_event
+
+logger = logging.getLogger(__name__)
+
+# 常见单字姓氏（覆盖绝大多数人口）和复姓的首字；"和""时""上"等在普通文本中过于常见的字不计入
+COMMON_SURNAMES = set(
+    "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈"
+    "姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤"
+    "常温康施文牛樊葛邢安齐易乔伍庞颜倪庄聂章鲁岳翟殷詹申欧耿关兰焦俞左柳甘祝包宁尚符舒阮柯纪梅童凌毕单季裴"
+    "霍涂成苗谷盛曲翁冉骆蓝路游辛靳管柴蒙鲍华喻祁蒲房滕屈饶解牟艾尤阳穆农司卓古吉缪简车项连芦麦褚娄窦戚岑"
+    "景党宫费卜冷晏席卫米柏宗瞿桂全佟应臧闵苟邬边卞姬师仇栾隋商刁沙荣巫寇桑郎甄丛仲虞敖巩明佘池查麻苑迟邝"
+    "诸皇令"
+)
+
+# 地名、机构名常见后缀
+PLACE_ORG_SUFFIXES = (
+    "省", "市", "县", "区", "镇", "乡", "村", "街", "路", "巷", "号", "州", "旗",
+    "公司", "集团", "银行", "法院", "检察院", "公安局", "派出所", "医院", "大学", "学院", "学校",
+    "委员会", "协会", "中心", "研究所", "事务所", "局", "厅", "厂", "店", "社"
+)
+_CJK_PATTERN = re.compile(r'[一-鿿㐀-䶿]')
+_SUFFIX_PATTERN = re.compile('|'.join(sorted(map(re.escape, PLACE_ORG_SUFFIXES), key=len, reverse=True)))
+# 首字母大写的英文单词（英文人名、机构名），至少两个字母
+_CAPITALIZED_PATTERN = re.compile(r'(?<![A-Za-z])[A-Z][A-Za-z]+')
+
+
+class ChunkPrefilter:
+    """文本块预过滤器
+
+    根据中文字符密度、常见姓氏和地名/机构名后缀命中数、首字母大写的英文单词数
+    判断文本块是否可能包含命名实体。表格分隔线、页码、案号、纯标点行等文本块直接跳过，
+    不调用NER模型。手机号、身份证号等格式固定的信息由正则检测负责，不受预过滤影响。
+    """
+
+    def __init__(self, min_cjk_chars: int = 2, min_cjk_density: float = 0.3,
+                 always_send_cjk_chars: int = 30, min_capitalized_tokens: int = 1):
+        """
+        参数:
+            min_cjk_chars (int): 中文字符数少于该值的文本块只看英文大写单词
+            min_cjk_density (float): 中文字符占非空白字符的最低比例，低于该值视为表格、编号等噪声
+            always_send_cjk_chars (int): 中文字符数不少于该值的文本块总是发送（长段落几乎总有实体线索）
+            min_capitalized_tokens (int): 首字母大写的英文单词数不少于该值时发送，0表示不按英文单词判断
+        """
+        self.min_cjk_chars = min_cjk_chars
+        self.min_cjk_density = min_cjk_density
+        self.always_send_cjk_chars = always_send_cjk_chars
+        self.min_capitalized_tokens = min_capitalized_tokens
+        self._lock = threading.Lock()
+        self._stats = {'checked': 0, 'skipped': 0, 'checked_chars': 0, 'skipped_chars': 0}
+
+    def score(self, text: str) -> Dict[str, Any]:
+        """计算文本块的特征：中文字符数、中文字符密度、姓氏命中数、后缀命中数、大写英文单词数"""
+        visible = len(text) - sum(1 for char in text if char.isspace())
+        cjk_chars = _CJK_PATTERN.findall(text)
+        return {
+            'cjk_chars': len(cjk_chars),
+            'cjk_density': len(cjk_chars) / visible if visible else 0.0,
+            'surname_hits': sum(1 for char in cjk_chars if char in COMMON_SURNAMES),
+            'suffix_hits': len(_SUFFIX_PATTERN.findall(text)),
+            'capitalized_tokens': len(_CAPITALIZED_PATTERN.findall(text)),
+        }
+
+    def is_plausible(self, text: str) -> bool:
+        """文本块是否可能包含命名实体"""
+        features = self.score(text)
+        if self.min_capitalized_tokens and features['capitalized_tokens'] >= self.min_capitalized_tokens:
+            return True
+        if features['cjk_chars'] < self.min_cjk_chars:
+            return False
+        if features['cjk_chars'] >= self.always_send_cjk_chars:
+            return True
+        if features['cjk_density'] < self.min_cjk_density:
+            return False
+        return features['surname_hits'] + features['suffix_hits'] > 0
+
+    def select(self, texts: Sequence[str]) -> List[int]:
+        """返回可能包含实体的文本块序号，并更新跳过统计"""
+        selected = [i for i, text in enumerate(texts) if self.is_plausible(text)]
+        skipped_chars = sum(len(texts[i]) for i in set(range(len(texts))) - set(selected))
+        with self._lock:
+            self._stats['checked'] += len(texts)
+            self._stats['skipped'] += len(texts) - len(selected)
+            self._stats['checked_chars'] += sum(len(text) for text in texts)
+            self._stats['skipped_chars'] += skipped_chars
+        if len(selected) < len(texts):
+            log_event(logger, logging.INFO, 'prefilter.skip',
+                      f"预过滤跳过{len(texts) - len(selected)}/{len(texts)}个不含实体线索的文本块",
+                      chunks=len(texts), skipped=len(texts) - len(selected), skipped_chars=skipped_chars)
+        return selected
+
+    def stats(self) -> Dict[str, Any]:
+        """返回检查和跳过的文本块数、字符数以及跳过比例"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['skip_rate'] = stats['skipped'] / stats['checked'] if stats['checked'] else 0.0
+        return stats
+
+
+def create_chunk_prefilter(config: Dict[str, Any]) -> Optional[ChunkPrefilter]:
+    """根据 config.json 中的 prefilter_config 创建预过滤器，未启用时返回None"""
+    prefilter_config = config.get('prefilter_config', {})
+    if not prefilter_config.get('enabled', False):
+        return None
+    return ChunkPrefilter(
+        min_cjk_chars=prefilter_config.get('min_cjk_chars', 2),
+        min_cjk_density=prefilter_config.get('min_cjk_density', 0.3),
+        always_send_cjk_chars=prefilter_config.get('always_send_cjk_chars', 30),
+        min_capitalized_tokens=prefilter_config.get('min_capitalized_tokens', 1)
+    )
+
+
+if __name__ == "__main__":
+    samples = [
+        "|---|---|---|",
+        "- 3 -",
+        "（2023）京0105民初12345号",
+        "第二章",
+        "原告：王鸿雁，女，汉族",
+        "被告北京繁星科技有限公司",
+        "Plaintiff John Smith",
+        "13812345678",
+        "经审理查明，双方当事人之间的借贷关系合法有效，本院予以确认。",
+    ]
+    prefilter = ChunkPrefilter()
+    for sample in samples:
+        print(f"{'发送' if prefilter.is_plausible(sample) else '跳过'}  {sample}  {prefilter.score(sample)}")
+    prefilter.select(samples)
+    print(prefilter.stats())
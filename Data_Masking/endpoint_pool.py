@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# NER服务端点池 - 多个OpenAI兼容端点之间的负载均衡与被动健康检查
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from openai import OpenAI, AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# EndpointPool.release 的请求结果
+SUCCESS = 'success'
+FAILURE = 'failure'
+INCONCLUSIVE = 'inconclusive'
+
+
+class Endpoint:
+    """单个OpenAI兼容端点及其运行统计"""
+
+    def __init__(self, api_base: str, api_key: str, timeout: float = 60, latency_window: int = 100):
+        self.api_base = api_base
+        self.api_key = api_key
+        self.timeout = timeout
+        # 重试由调用方统一处理，关闭SDK自带的重试
+        self.client = OpenAI(base_url=api_base, api_key=api_key, timeout=timeout, max_retries=0)
+        # 异步客户端绑定事件循环，按事件循环分别创建
+        self._async_clients = weakref.WeakKeyDictionary()
+
+        # 当前在途请求数
+        self.outstanding = 0
+        self.total_requests = 0
+        self.total_failures = 0
+        self.consecutive_failures = 0
+        # 被摘除到该时间点（time.monotonic）之前不参与调度
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.latencies = deque(maxlen=latency_window)
+
+    def get_async_client(self) -> AsyncOpenAI:
+        """获取当前事件循环对应的异步客户端"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(base_url=self.api_base, api_key=self.api_key,
+                                 timeout=self.timeout, max_retries=0)
+            self._async_clients[loop] = client
+        return client
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        return {
+            'api_base': self.api_base,
+            'available': self.is_available(time.monotonic()),
+            'outstanding': self.outstanding,
+            'total_requests': self.total_requests,
+            'total_failures': self.total_failures,
+            'consecutive_failures': self.consecutive_failures,
+            'ejections': self.ejections,
+            'latency_avg': sum(latencies) / len(latencies) if latencies else None,
+            'latency_p50': latencies[len(latencies) // 2] if latencies else None,
+            'latency_p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+        }
+
+
+class EndpointPool:
+    """端点池
+
+    - 路由：在可用端点中选择在途请求数最少的一个，数量相同时轮询
+    - 被动健康检查：端点连续失败达到 failure_threshold 次后摘除 eject_seconds 秒，
+      到期后自动重新加入；重新加入后再次失败会立即被摘除，成功一次则恢复正常；
+      不可重试的错误（如400）不能说明端点是否健康，不影响摘除状态
+    - 所有端点都被摘除时，选择最早到期的端点，保证请求仍能发出
+    """
+
+    def __init__(self, endpoints: List[Endpoint], failure_threshold: int = 3, eject_seconds: float = 30.0):
+        if not endpoints:
+            raise ValueError("端点池至少需要一个端点")
+        self.endpoints = endpoints
+        self.failure_threshold = max(1, failure_threshold)
+        self.eject_seconds = eject_seconds
+        self._lock = threading.Lock()
+        # 轮询起点，在途请求数相同时依次选择不同端点
+        self._cursor = 0
+
+    @classmethod
+    def from_config(cls, model_config: Dict[str, Any]) -> 'EndpointPool':
+        """根据 model_config 创建端点池
+
+        model_config.endpoints 为端点列表，每项可单独指定 api_base、api_key、timeout，
+        未指定的字段沿用 model_config 中的值；未配置 endpoints 时使用单个 api_base。
+        """
+        default_key = model_config.get('api_key') or 'dummy-key'
+        default_timeout = model_config.get('timeout', 60)
+        endpoint_configs = model_config.get('endpoints') or [
+            {'api_base': model_config.get('api_base', 'http://localhost:8000/v1')}
+        ]
+
+        endpoints = []
+        for endpoint_config in endpoint_configs:
+            if isinstance(endpoint_config, str):
+                endpoint_config = {'api_base': endpoint_config}
+            endpoints.append(Endpoint(
+                api_base=endpoint_config['api_base'],
+                api_key=endpoint_config.get('api_key') or default_key,
+                timeout=endpoint_config.get('timeout', default_timeout)
+            ))
+
+        return cls(
+            endpoints,
+            failure_threshold=model_config.get('endpoint_failure_threshold', 3),
+            eject_seconds=model_config.get('endpoint_eject_seconds', 30.0)
+        )
+
+    def acquire(self, exclude: Optional[Endpoint] = None) -> Endpoint:
+        """选择一个端点并将其在途请求数加一，使用完毕后必须调用 release
+
+        参数:
+            exclude (Endpoint, optional): 尽量避开的端点（如上一次失败的端点），
+                没有其他可用端点时仍可能返回它
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e.is_available(now)]
+            if exclude is not None and len(candidates) > 1:
+                candidates = [e for e in candidates if e is not exclude] or candidates
+
+            if candidates:
+                offset = self._cursor % len(candidates)
+                self._cursor += 1
+                candidates = candidates[offset:] + candidates[:offset]
+                endpoint = min(candidates, key=lambda e: e.outstanding)
+            else:
+                endpoint = min(self.endpoints, key=lambda e: e.ejected_until)
+
+            endpoint.outstanding += 1
+            endpoint.total_requests += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, latency: Optional[float] = None, outcome: str = SUCCESS):
+        """请求结束后归还端点并记录结果
+
+        参数:
+            endpoint (Endpoint): acquire 返回的端点
+            latency (float, optional): 成功请求的耗时（秒）
+            outcome (str): 请求结果
+                - SUCCESS: 请求成功，清零连续失败次数，被摘除的端点重新加入
+                - FAILURE: 端点故障（超时、连接错误、5xx等），计入连续失败，达到阈值时摘除
+                - INCONCLUSIVE: 不能说明端点是否健康（参数错误等不可重试的错误、请求被取消），
+                  既不计入失败也不重新加入
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            if outcome == FAILURE:
+                endpoint.total_failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.failure_threshold:
+                    endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                    endpoint.ejections += 1
+                    logger.warning("端点摘除: %s 连续失败%d次，%.0f秒后重新加入",
+                                   endpoint.api_base, endpoint.consecutive_failures, self.eject_seconds)
+            elif outcome == SUCCESS:
+                endpoint.consecutive_failures = 0
+                endpoint.ejected_until = 0.0
+                if latency is not None:
+                    endpoint.latencies.append(latency)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """返回各端点的运行统计"""
+        with self._lock:
+            return [endpoint.stats() for endpoint in self.endpoints]
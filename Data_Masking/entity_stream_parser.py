@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 实体响应解析器 - JSON数组的增量解析，以及每行一个实体的紧凑格式解析
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# 紧凑格式中表示"没有实体"的行
+EMPTY_MARKERS = frozenset({'无', 'none', 'null', '没有实体', '(无)', '（无）'})
+# 紧凑格式的字段分隔符：制表符，兼容模型偶尔输出的竖线
+_FIELD_SEPARATOR = re.compile(r'\t+|\s*\|\s*')
+
+
+class IncrementalEntityParser:
+    """增量解析形如 [{...}, {...}] 的JSON实体数组
+
+    每次 feed 一段响应文本，返回这段文本中新闭合的实体对象。
+    数组之前的说明文字或 ```json 标记会被忽略；响应被截断时，已闭合的实体仍然有效。
+    """
+
+    def __init__(self):
+        # 是否已进入顶层数组
+        self.in_array = False
+        # 顶层数组是否已结束
+        self.finished = False
+        # 当前对象的花括号深度，0表示不在对象内
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        # 当前正在累积的对象文本
+        self._buffer: List[str] = []
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        """输入一段响应文本，返回其中新闭合的实体对象"""
+        entities = []
+        if self.finished or not delta:
+            return entities
+
+        for char in delta:
+            if not self.in_array:
+                if char == '[':
+                    self.in_array = True
+                continue
+
+            if self.depth == 0:
+                # 在数组内、对象之间：只关心对象开始和数组结束
+                if char == '{':
+                    self.depth = 1
+                    self._buffer = [char]
+                elif char == ']':
+                    self.finished = True
+                    break
+                continue
+
+            self._buffer.append(char)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '{':
+                self.depth += 1
+            elif char == '}':
+                self.depth -= 1
+                if self.depth == 0:
+                    entity = self._decode(''.join(self._buffer))
+                    self._buffer = []
+                    if entity is not None:
+                        entities.append(entity)
+
+        return entities
+
+    def close(self) -> List[Dict[str, Any]]:
+        """响应结束时调用，JSON格式没有待处理的残留内容"""
+        return []
+
+    @staticmethod
+    def _decode(object_text: str):
+        try:
+            entity = json.loads(object_text)
+        except json.JSONDecodeError:
+            return None
+        return entity if isinstance(entity, dict) else None
+
+
+def split_compact_line(line: str, fields: int) -> Optional[Tuple[str, ...]]:
+    """把紧凑格式的一行拆成 fields 个字段，不是实体行时返回None
+
+    最后一个字段（实体文本）保留其中的分隔符以外的全部内容，
+    行首的列表符号（"- "、"1. "）和代码块标记会被忽略。
+    """
+    line = line.strip()
+    if not line or line.startswith('```') or line.lower() in EMPTY_MARKERS:
+        return None
+    line = re.sub(r'^(?:[-*•]\s+|\d+[.)、]\s+)', '', line)
+    parts = _FIELD_SEPARATOR.split(line, maxsplit=fields - 1)
+    if len(parts) != fields:
+        return None
+    parts = [part.strip() for part in parts]
+    if not all(parts) or parts[-1].lower() in EMPTY_MARKERS:
+        return None
+    return tuple(parts)
+
+
+def parse_compact_entities(response_text: str) -> List[Dict[str, Any]]:
+    """解析每行一个 "类型<Tab>实体文本" 的紧凑格式响应，实体位置由调用方在本地计算"""
+    entities = []
+    for line in response_text.splitlines():
+        fields = split_compact_line(line, 2)
+        if fields is not None:
+            entities.append({"type": fields[0], "span": fields[1]})
+    return entities
+
+
+def looks_like_json(response_text: str) -> bool:
+    """响应是否为JSON格式（用于紧凑格式解析时回退到JSON解析）"""
+    stripped = response_text.strip()
+    if stripped.startswith('```'):
+        stripped = stripped.split('\n', 1)[-1].lstrip()
+    return stripped[:1] in ('[', '{')
+
+
+class IncrementalCompactParser:
+    """增量解析紧凑格式响应，每收到一个完整的行就返回其中的实体"""
+
+    def __init__(self):
+        self.finished = False
+        self._pending = ''
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        if self.finished or not delta:
+            return []
+        lines = (self._pending + delta).split('\n')
+        self._pending = lines.pop()
+        return parse_compact_entities('\n'.join(lines))
+
+    def close(self) -> List[Dict[str, Any]]:
+        """响应结束时调用，解析最后一行（通常没有换行符结尾）"""
+        if self.finished:
+            return []
+        self.finished = True
+        pending, self._pending = self._pending, ''
+        return parse_compact_entities(pending)
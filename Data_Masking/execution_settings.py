@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 执行参数 - 从 ner_config 读取并行、线程数和分块大小，可选按实测延迟和错误率自动调优
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from Data_Masking.instrumentation import log_event
+
+logger = logging.getLogger(__name__)
+
+# ner_config 未配置时的默认值（与各接口原来的默认参数一致）
+DEFAULT_ENABLE_PARALLEL = False
+DEFAULT_NUM_WORKERS = 4
+DEFAULT_MAX_CHUNK_SIZE = 450
+
+
+class ExecutionSettings(NamedTuple):
+    enable_parallel: bool
+    num_workers: int
+    max_chunk_size: int
+    # 线程数是否由自动调优器决定（此时识别过程中会跟随调优结果变化）
+    autotuned: bool = False
+
+
+class ExecutionAutotuner:
+    """执行参数自动调优器
+
+    以 window_chunks 个文本块为一个观测窗口，统计吞吐（字符/秒）、平均请求延迟和错误率，
+    每个窗口结束时调整一次：
+    - 线程数：错误率超过 target_error_rate 时减半；否则逐步增加，吞吐不再提升时回到最佳值并停止增加
+    - 分块大小：按 target_latency_seconds / 平均延迟 的比例缩放，使单次请求耗时接近目标值
+
+    线程数的调整在识别过程中立即生效，分块大小从下一次调用 recognize_entities 开始生效。
+    """
+
+    def __init__(self, initial_workers: int, initial_chunk_size: int, window_chunks: int = 32,
+                 target_error_rate: float = 0.02, target_latency_seconds: float = 10.0,
+                 min_workers: int = 1, max_workers: int = 16,
+                 min_chunk_size: int = 200, max_chunk_size: int = 2000):
+        """
+        参数:
+            initial_workers (int): 初始线程数
+            initial_chunk_size (int): 初始分块大小（字符数）
+            window_chunks (int): 每个观测窗口包含的文本块数
+            target_error_rate (float): 允许的最高错误率（失败的请求尝试 / 全部请求尝试）
+            target_latency_seconds (float): 单次请求的目标耗时（秒）
+            min_workers / max_workers (int): 线程数的调整范围
+            min_chunk_size / max_chunk_size (int): 分块大小的调整范围
+        """
+        self.window_chunks = max(1, window_chunks)
+        self.target_error_rate = target_error_rate
+        self.target_latency_seconds = target_latency_seconds
+        self.min_workers, self.max_workers = max(1, min_workers), max(1, max_workers)
+        self.min_chunk_size, self.max_chunk_size = min_chunk_size, max_chunk_size
+        self.workers = min(max(initial_workers, self.min_workers), self.max_workers)
+        self.chunk_size = min(max(initial_chunk_size, self.min_chunk_size), self.max_chunk_size)
+        self.converged = False
+        self.history: List[Dict[str, Any]] = []
+
+        self._lock = threading.Lock()
+        self._best_throughput: Optional[float] = None
+        self._best_workers = self.workers
+        self._reset_window()
+
+    def _reset_window(self):
+        self._chunks = 0
+        self._chars = 0
+        self._requests = 0
+        self._errors = 0
+        self._latency = 0.0
+        self._busy = 0.0
+        self._started: Optional[float] = None
+
+    def current_workers(self) -> int:
+        """当前线程数（供调度器在识别过程中读取）"""
+        return self.workers
+
+    def begin_run(self):
+        """一次识别调用开始：把上一段忙碌时间计入窗口，调用之间的空闲时间不计入吞吐"""
+        with self._lock:
+            if self._started is not None:
+                self._busy += self._last_record - self._started
+                self._started = None
+
+    def record(self, chunks: int, chars: int, latency: float, failed: bool = False):
+        """记录一次后端调用（一组文本块）的结果"""
+        with self._lock:
+            now = time.monotonic()
+            if self._started is None:
+                self._started = now - latency
+            self._last_record = now
+            self._chunks += chunks
+            self._chars += chars
+            self._requests += 1
+            self._latency += latency
+            if failed:
+                self._errors += 1
+            if self._chunks >= self.window_chunks:
+                self._adjust(now)
+
+    def record_error(self):
+        """记录一次失败后重试的请求尝试（限流、超时、5xx等）"""
+        with self._lock:
+            self._errors += 1
+
+    def _adjust(self, now: float):
+        elapsed = self._busy + (now - self._started)
+        throughput = self._chars / elapsed if elapsed > 0 else 0.0
+        error_rate = self._errors / (self._requests + self._errors)
+        mean_latency = self._latency / self._requests
+        workers, chunk_size = self.workers, self.chunk_size
+
+        if error_rate > self.target_error_rate:
+            # 错误率过高：线程数减半，之后重新探索
+            workers = max(self.min_workers, workers // 2)
+            self.converged = False
+            self._best_throughput = None
+        elif not self.converged:
+            if self._best_throughput is None or throughput > self._best_throughput * 1.05:
+                self._best_throughput, self._best_workers = throughput, workers
+                workers = min(self.max_workers, workers + max(1, workers // 2))
+                self.converged = workers == self._best_workers
+            else:
+                # 增加线程数不再提升吞吐，回到最佳值
+                workers = self._best_workers
+                self.converged = True
+
+        if mean_latency > 0 and self.target_latency_seconds > 0:
+            factor = min(max(self.target_latency_seconds / mean_latency, 0.5), 1.5)
+            if factor < 0.8 or factor > 1.25:
+                chunk_size = min(max(int(chunk_size * factor), self.min_chunk_size), self.max_chunk_size)
+
+        self.history.append({
+            'chunks': self._chunks, 'throughput': throughput, 'error_rate': error_rate,
+            'mean_latency': mean_latency, 'workers': workers, 'chunk_size': chunk_size
+        })
+        if (workers, chunk_size) != (self.workers, self.chunk_size):
+            log_event(logger, logging.INFO, 'autotune.adjust',
+                      f"自动调优: 线程数 {self.workers} -> {workers}，分块大小 {self.chunk_size} -> {chunk_size}",
+                      throughput=round(throughput, 1), error_rate=round(error_rate, 4),
+                      mean_latency=round(mean_latency, 4), workers=workers, chunk_size=chunk_size)
+        self.workers, self.chunk_size = workers, chunk_size
+        self._reset_window()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回当前参数、是否收敛和各窗口的观测结果"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'chunk_size': self.chunk_size,
+                'converged': self.converged,
+                'history': list(self.history),
+            }
+
+
+def create_autotuner(config: Dict[str, Any]) -> Optional[ExecutionAutotuner]:
+    """根据 config.json 中的 autotune_config 创建自动调优器，未启用时返回None
+
+    初始线程数和分块大小取 ner_config 中的 num_workers 和 max_chunk_size。
+    """
+    autotune_config = config.get('autotune_config', {})
+    if not autotune_config.get('enabled', False):
+        return None
+    ner_config = config.get('ner_config', {})
+    return ExecutionAutotuner(
+        initial_workers=ner_config.get('num_workers', DEFAULT_NUM_WORKERS),
+        initial_chunk_size=ner_config.get('max_chunk_size', DEFAULT_MAX_CHUNK_SIZE),
+        window_chunks=autotune_config.get('window_chunks', 32),
+        target_error_rate=autotune_config.get('target_error_rate', 0.02),
+        target_latency_seconds=autotune_config.get('target_latency_seconds', 10.0),
+        min_workers=autotune_config.get('min_workers', 1),
+        max_workers=autotune_config.get('max_workers', 16),
+        min_chunk_size=autotune_config.get('min_chunk_size', 200),
+        max_chunk_size=autotune_config.get('max_chunk_size', 2000)
+    )
+
+
+def resolve_execution_settings(enable_parallel: Optional[bool] = None, num_workers: Optional[int] = None,
+                               max_chunk_size: Optional[int] = None, backend=None) -> ExecutionSettings:
+    """确定一次调用的执行参数
+
+    显式传入的参数优先；未传入（None）的参数取自动调优器的当前值（启用 autotune_config 时），
+    否则取 config.json 中 ner_config 的 enable_parallel、num_workers、max_chunk_size。
+
+    参数:
+        enable_parallel (bool, optional): 是否并行处理
+        num_workers (int, optional): 并行处理的线程数上限
+        max_chunk_size (int, optional): 每个文本块的最大字符数
+        backend (NERBackend, optional): 提供配置的NER后端，默认为当前后端（配置文件不存在时使用默认值）
+
+    返回:
+        ExecutionSettings: 确定后的执行参数
+    """
+    if backend is None:
+        from Data_Masking.backends import get_backend
+        try:
+            backend = get_backend()
+        except FileNotFoundError:
+            backend = None
+    ner_config = backend.config.get('ner_config', {}) if backend is not None else {}
+    autotuner = backend.get_autotuner() if backend is not None else None
+
+    if autotuner is not None:
+        defaults = ExecutionSettings(True, autotuner.workers, autotuner.chunk_size, autotuned=True)
+    else:
+        defaults = ExecutionSettings(
+            bool(ner_config.get('enable_parallel', DEFAULT_ENABLE_PARALLEL)),
+            int(ner_config.get('num_workers', DEFAULT_NUM_WORKERS)),
+            int(ner_config.get('max_chunk_size', DEFAULT_MAX_CHUNK_SIZE))
+        )
+
+    return ExecutionSettings(
+        enable_parallel=defaults.enable_parallel if enable_parallel is None else enable_parallel,
+        num_workers=defaults.num_workers if num_workers is None else num_workers,
+        max_chunk_size=defaults.max_chunk_size if max_chunk_size is None else max_chunk_size,
+        autotuned=defaults.autotuned and num_workers is None and enable_parallel is not False
+    )
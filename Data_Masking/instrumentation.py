@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 日志与埋点 - 基于logging的分级、采样、结构化日志，默认不记录待脱敏的原文
+
+import json
+import logging
+import random
+import sys
+from typing import Any, Dict, Optional
+
+# 包内所有模块的日志记录器都在该名称之下（logging.getLogger(__name__)）
+LOGGER_NAME = 'Data_Masking'
+
+# 日志选项，由 apply_log_config / configure_logging 根据 log_config 设置
+_options: Dict[str, Any] = {'sample_rate': 1.0, 'log_sensitive_text': False}
+
+# 日志记录的标准属性，其余属性视为 extra 传入的字段
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+def apply_log_config(config: Dict[str, Any]):
+    """应用 config.json 中 log_config 的采样率和原文记录开关，不改变日志输出位置和级别"""
+    log_config = config.get('log_config', {})
+    _options['sample_rate'] = min(max(float(log_config.get('sample_rate', 1.0)), 0.0), 1.0)
+    _options['log_sensitive_text'] = bool(log_config.get('log_sensitive_text', False))
+
+
+def sensitive_text_enabled() -> bool:
+    """是否允许在日志中记录原文（文本预览、模型响应、实体文本）"""
+    return _options['log_sensitive_text']
+
+
+def preview(text: str, limit: int = 80) -> str:
+    """日志中使用的文本预览：默认只记录长度，开启 log_sensitive_text 时记录前 limit 个字符"""
+    if not _options['log_sensitive_text']:
+        return f"<{len(text)}字符>"
+    return text[:limit] + ('...' if len(text) > limit else '')
+
+
+def log_event(logger: logging.Logger, level: int, event: str, message: str = '',
+              sampled: bool = False, **fields: Any):
+    """输出一条结构化日志
+
+    字段通过 extra 附加在日志记录上，文本格式输出为 key=value，JSON格式输出为独立字段。
+
+    参数:
+        logger (logging.Logger): 日志记录器
+        level (int): 日志级别
+        event (str): 事件名，如 'ner.call'
+        message (str): 可读的说明，默认为事件名
+        sampled (bool): 是否按 log_config.sample_rate 采样（用于每个文本块一条的高频记录）
+        **fields: 结构化字段，如 latency、chunk_chars、entity_count
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if sampled and _options['sample_rate'] < 1.0 and random.random() >= _options['sample_rate']:
+        return
+    logger.log(level, message or event, extra=dict(fields, event=event))
+
+
+def _record_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in vars(record).items() if key not in _RESERVED_ATTRS}
+
+
+class TextFormatter(logging.Formatter):
+    """文本格式：时间 级别 记录器 说明 key=value ..."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _record_fields(record)
+        fields.pop('event', None)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={json.dumps(value, ensure_ascii=False, default=str)}"
+                                   for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON格式：每条日志一行JSON，便于日志系统检索和统计"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update(_record_fields(record))
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def configure_logging(config: Optional[Dict[str, Any]] = None, level: Optional[str] = None) -> logging.Logger:
+    """按 log_config 配置包内日志的级别、格式和输出位置，供命令行、GUI和Web服务等入口调用
+
+    重复调用时替换上一次添加的输出，不会重复输出。
+
+    参数:
+        config (Dict[str, Any], optional): 完整配置，默认读取配置文件（不存在时使用默认值）
+        level (str, optional): 日志级别，覆盖 log_config.level
+
+    返回:
+        logging.Logger: 包的根日志记录器
+    """
+    if config is None:
+        from Data_Masking.backends.registry import load_config
+        try:
+            config = load_config()
+        except FileNotFoundError:
+            config = {}
+    apply_log_config(config)
+    log_config = config.get('log_config', {})
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel((level or log_config.get('level', 'INFO')).upper())
+
+    log_file = log_config.get('file')
+    handler = logging.FileHandler(log_file, encoding='utf-8') if log_file else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if log_config.get('format') == 'json' else TextFormatter())
+    handler._data_masking_handler = True
+
+    for existing in list(logger.handlers):
+        if getattr(existing, '_data_masking_handler', False):
+            logger.removeHandler(existing)
+            existing.close()
+    logger.addHandler(handler)
+    logger.propagate = False
+    return logger
@@ -3,8 +3,10 @@
 
 from .data_masker import DataMasker
 from .document_masker import DocumentMasker
+from .replacement_engine import OffsetMap
 
 __all__ = [
     'DataMasker',
     'DocumentMasker',
+    'OffsetMap',
 ]
\ No newline at end of file
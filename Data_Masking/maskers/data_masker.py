@@ -1,43 +1,78 @@
 # 数据脱敏器 - 负责文本脱敏和恢复
 
+import logging
 import os
-import re
-import uuid
 import pickle
-import concurrent.futures
-import tqdm
+import threading
 from typing import Dict, List, Tuple, Union, Optional, Any
 
 from ..strategies import MaskingStrategy, ContextAwareStrategy
-from ..NER_model import recognize_entities
+from ..NER_model import recognize_entities, arecognize_entities
+from ..backends import get_backend, load_config
+from ..execution_settings import resolve_execution_settings
+from ..ner_resilience import CircuitOpenError
+from ..scheduler import POOL_CPU, get_scheduler
+from ..regex_detectors import DEFAULT_REGEX_PATTERNS, RegexScanner
+from ..span_locator import AhoCorasick
+from ..text_chunker import deduplicate_chunks
+from .mapping_store import MappingStore
+from .mask_id import MASKED_ID_PATTERN, encode_secret, keyed_mask_id, load_mask_secret, random_mask_id
+from .replacement_engine import DEFAULT_OVERLAP_PRIORITY, OffsetMap, ReplacementEngine, replace_spans, resolve_overlaps
+
+logger = logging.getLogger(__name__)
 
 class DataMasker:
     """数据脱敏器 - 负责文本脱敏和恢复"""
-    def __init__(self, mapping_file: str = "masking_map.pkl"):
+    def __init__(self, mapping_file: str = "masking_map.pkl", mask_secret: Optional[Union[str, bytes]] = None):
+        """
+        参数:
+            mapping_file (str): 脱敏映射表文件路径
+            mask_secret (str | bytes, optional): 租户密钥，提供时脱敏标记由密钥派生（HMAC），
+                多个进程或机器使用相同密钥即可得到一致的脱敏结果；默认按 mask_id_config 决定
+        """
         # 脱敏映射表文件路径
         self.mapping_file = mapping_file
-        # 脱敏映射表 {脱敏后的文本: (原始文本, 实体类型)}
-        self.mapping: Dict[str, Tuple[str, str]] = {}
-        # 实体到掩码的映射表 {(原始文本, 实体类型): 脱敏后的文本}
-        # 用于确保同一实体始终使用相同的掩码
-        self.entity_to_mask: Dict[Tuple[str, str], str] = {}
+        # 密钥派生脱敏标记的密钥，为None时使用随机标记
+        self._mask_secret = encode_secret(mask_secret) if mask_secret is not None else self._configured_mask_secret()
+        # 线程安全的脱敏映射表，并行脱敏时同一实体只生成一个掩码
+        self.store = MappingStore()
+        # 有状态的脱敏策略（计数器等）不是线程安全的，生成新掩码时串行调用
+        self._strategy_lock = threading.Lock()
         # 加载已有的映射表
         self._load_mapping()
+        # 最近一次实体识别是否为降级结果（远程NER熔断时仅使用正则和已知实体词典）
+        self.degraded = False
+        # 已知实体词典的匹配自动机，实体数量变化时重建
+        self._known_entity_matcher: Optional[AhoCorasick] = None
+        self._known_entity_types: Dict[str, str] = {}
+        self._known_entity_count = -1
         # 默认策略
         self.default_strategy = ContextAwareStrategy()
         # 类型策略映射
         self.type_strategies: Dict[str, MaskingStrategy] = {}
         # 正则表达式模式
-        self.regex_patterns = {
-            "PHONE": r'(?<!\d)(?:(?:1[3-9]\d{9})|(?:0\d{2,3}-?\d{7,8}))(?!\d)',  # 手机号和座机号
-            "ID": r'(?<!\d)\d{17}[0-9Xx](?!\d)',  # 身份证号
-            "BANK": r'(?<!\d)(?:\d{16}|\d{19})(?!\d)',  # 银行卡号
-            "EMAIL": r'[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+',  # 电子邮箱
-            "IP": r'(?:\d{1,3}\.){3}\d{1,3}',  # IPv4地址
-            "DATE": r'\d{4}[-/年]\d{1,2}[-/月]\d{1,2}[日]?',  # 日期
-            "TIME": r'\d{1,2}:\d{1,2}(:\d{1,2})?',  # 时间
-            "MONEY": r'\d+(\.\d+)?元|\d+(\.\d+)?万元|\d+(\.\d+)?亿元|\d+(\.\d+)?美元|\d+(\.\d+)?欧元'  # 金额
-        }
+        self.regex_patterns = dict(DEFAULT_REGEX_PATTERNS)
+        # 预编译的正则扫描器，模式变化时重建
+        self._regex_scanner: Optional[RegexScanner] = None
+    
+    @staticmethod
+    def _configured_mask_secret() -> Optional[bytes]:
+        """config.json 中 mask_id_config 配置的密钥（配置文件不存在或未启用时返回None）"""
+        try:
+            config = load_config()
+        except FileNotFoundError:
+            return None
+        return load_mask_secret(config)
+    
+    @property
+    def mapping(self) -> Dict[str, Tuple[str, str]]:
+        """脱敏映射表 {脱敏后的文本: (原始文本, 实体类型)}"""
+        return self.store.mapping
+    
+    @property
+    def entity_to_mask(self) -> Dict[Tuple[str, str], str]:
+        """实体到掩码的映射表 {(原始文本, 实体类型): 脱敏后的文本}，用于确保同一实体始终使用相同的掩码"""
+        return self.store.entity_to_mask
     
     def _load_mapping(self):
         """加载脱敏映射表"""
@@ -45,32 +80,26 @@ class DataMasker:
             try:
                 with open(self.mapping_file, 'rb') as f:
                     data = pickle.load(f)
-                    print(f"[DEBUG] 加载映射表: {self.mapping_file}")
-                    print(f"[DEBUG] 映射表数据类型: {type(data)}")
+                    logger.debug("加载映射表: %s，数据类型: %s", self.mapping_file, type(data).__name__)
                     
                     if isinstance(data, dict):
-                        # 兼容旧版本，旧版本只保存了mapping
-                        self.mapping = data
-                        # 根据mapping重建entity_to_mask
-                        self.entity_to_mask = {(original, entity_type): mask_id 
-                                              for mask_id, (original, entity_type) in self.mapping.items()}
-                        print(f"[DEBUG] 加载旧版本映射表: {len(self.mapping)} 条记录")
+                        # 兼容旧版本，旧版本只保存了mapping，根据mapping重建entity_to_mask
+                        self.store.load(data)
+                        logger.debug("加载旧版本映射表: %d 条记录", len(self.mapping))
                     elif isinstance(data, tuple) and len(data) == 2:
                         # 新版本，保存了mapping和entity_to_mask
-                        self.mapping, self.entity_to_mask = data
-                        print(f"[DEBUG] 加载新版本映射表: {len(self.mapping)} 条记录")
+                        self.store.load(*data)
+                        logger.debug("加载新版本映射表: %d 条记录", len(self.mapping))
                     elif isinstance(data, tuple) and len(data) == 3:
                         # 最新版本，包含自定义词汇映射
-                        self.mapping, self.entity_to_mask, _ = data
-                        print(f"[DEBUG] 加载最新版本映射表(含自定义词汇): {len(self.mapping)} 条记录")
+                        self.store.load(data[0], data[1])
+                        logger.debug("加载最新版本映射表(含自定义词汇): %d 条记录", len(self.mapping))
                     else:
-                        print(f"[DEBUG] 未知的映射表格式: {type(data)}")
-                        self.mapping = {}
-                        self.entity_to_mask = {}
+                        logger.warning("未知的映射表格式: %s", type(data).__name__)
+                        self.store.load({}, {})
             except Exception as e:
-                print(f"加载脱敏映射表失败: {e}")
-                self.mapping = {}
-                self.entity_to_mask = {}
+                logger.error("加载脱敏映射表失败: %s", e)
+                self.store.load({}, {})
     
     def _save_mapping(self):
         """保存脱敏映射表"""
@@ -84,11 +113,13 @@ class DataMasker:
             if hasattr(strategy, 'get_custom_replacements') and callable(getattr(strategy, 'get_custom_replacements')):
                 custom_replacements = strategy.get_custom_replacements()
             
+            # 其他线程可能正在新建映射，保存一致的副本
+            mapping, entity_to_mask = self.store.snapshot()
             with open(self.mapping_file, 'wb') as f:
                 # 同时保存mapping、entity_to_mask和custom_replacements三个映射表
-                pickle.dump((self.mapping, self.entity_to_mask, custom_replacements), f)
+                pickle.dump((mapping, entity_to_mask, custom_replacements), f)
         except Exception as e:
-            print(f"保存脱敏映射表失败: {e}")
+            logger.error("保存脱敏映射表失败: %s", e)
     
     def set_strategy(self, entity_type: str, strategy: MaskingStrategy):
         """为特定实体类型设置脱敏策略"""
@@ -105,131 +136,298 @@ class DataMasker:
     def add_regex_pattern(self, entity_type: str, pattern: str):
         """添加正则表达式模式"""
         self.regex_patterns[entity_type] = pattern
+        self._regex_scanner = None
     
     def _get_strategy(self, entity_type: str) -> MaskingStrategy:
         """获取特定实体类型的脱敏策略"""
         return self.type_strategies.get(entity_type, self.default_strategy)
     
     def _mask_entity(self, text: str, entity_type: str) -> str:
-        """对单个实体进行脱敏"""
-        # 检查实体是否已存在于映射表中，确保同一实体始终使用相同的掩码
-        entity_key = (text, entity_type)
-        if entity_key in self.entity_to_mask:
-            return self.entity_to_mask[entity_key]
+        """对单个实体进行脱敏（可在多个线程中并发调用）"""
+        if self._mask_secret is not None:
+            # 密钥派生标记不依赖映射表，映射表只记录反向映射用于恢复
+            # 首次保存时原子地调用一次脱敏策略，与随机标记的 get_or_create 一致
+            def call_strategy():
+                with self._strategy_lock:
+                    self._call_strategy(text, entity_type)
+            
+            return self.store.put(text, entity_type, keyed_mask_id(text, entity_type, self._mask_secret),
+                                  on_insert=call_strategy)
+        
+        def create_mask() -> str:
+            with self._strategy_lock:
+                self._call_strategy(text, entity_type)
+            
+            # 生成唯一标识符作为脱敏后的文本，使用实体类型作为前缀
+            # 格式: __MASKED_{entity_type.lower()}_{uuid.uuid4().hex[:8]}__
+            # 这样可以在脱敏后的文本中保留实体类型信息，提高可读性
+            return random_mask_id(entity_type)
         
+        # 已存在的实体直接返回原掩码；新实体由映射表原子地生成并保存，确保同一实体始终使用相同的掩码
+        return self.store.get_or_create(text, entity_type, create_mask)
+    
+    def _call_strategy(self, text: str, entity_type: str) -> str:
+        """调用实体类型对应的脱敏策略（策略可能记录自定义替换等状态）"""
         strategy = self._get_strategy(entity_type)
-        masked_text = strategy.mask(text, entity_type) if isinstance(strategy, ContextAwareStrategy) else strategy.mask(text)
+        return strategy.mask(text, entity_type) if isinstance(strategy, ContextAwareStrategy) else strategy.mask(text)
+    
+    def _find_regex_entities(self, text: str) -> List[Dict[str, Any]]:
+        """使用正则表达式查找额外的实体（所有模式一次扫描）"""
+        if self._regex_scanner is None or self._regex_scanner.patterns != self.regex_patterns:
+            self._regex_scanner = RegexScanner(self.regex_patterns)
+        entities = self._regex_scanner.scan(text)
+        for entity in entities:
+            entity["source"] = "regex"
+        return entities
+    
+    def _find_known_entities(self, text: str) -> List[Dict[str, Any]]:
+        """在文本中查找映射表中已脱敏过的实体（已知实体词典），用于远程NER不可用时的降级识别"""
+        if self._known_entity_count != len(self.store):
+            self._known_entity_types = {}
+            _, entity_to_mask = self.store.snapshot()
+            for original, entity_type in entity_to_mask:
+                # 单字实体误伤过多，不参与词典匹配
+                if len(original) >= 2:
+                    self._known_entity_types.setdefault(original, entity_type)
+            self._known_entity_matcher = AhoCorasick(self._known_entity_types)
+            self._known_entity_count = len(entity_to_mask)
+
+        return [
+            {"type": self._known_entity_types[span], "start": start, "end": end, "span": span, "prob": 1.0,
+             "source": "dictionary"}
+            for start, end, span in self._known_entity_matcher.iter_matches(text)
+        ]
+
+    def _degraded_entities(self, text: str, error: CircuitOpenError) -> List[Dict[str, Any]]:
+        """远程NER熔断时的降级识别：已知实体词典 + 正则表达式"""
+        self.degraded = True
+        logger.warning("降级脱敏: %s，仅使用正则表达式和已知实体词典识别实体，结果可能不完整", error)
+        return self._find_known_entities(text) + self._find_regex_entities(text)
+
+    def find_entities(self, text: str, num_workers: Optional[int] = None,
+                      enable_parallel: Optional[bool] = None, deduplicate: bool = True) -> List[Dict[str, Any]]:
+        """识别文本中的所有实体（NER模型 + 正则表达式），不做替换
+        
+        返回的实体列表可以传给 mask_text 的 entities 参数复用，
+        从而避免对同一段文本重复调用NER模型。
         
-        # 生成唯一标识符作为脱敏后的文本，使用实体类型作为前缀
-        # 格式: __MASKED_{entity_type.lower()}_{uuid.uuid4().hex[:8]}__
-        # 这样可以在脱敏后的文本中保留实体类型信息，提高可读性
-        unique_id = f"__MASKED_{entity_type.lower()}_{uuid.uuid4().hex[:8]}__"
+        参数:
+            text (str): 待识别的文本
+            num_workers (int, optional): 并行处理的工作线程数，默认取 ner_config.num_workers
+            enable_parallel (bool, optional): 是否启用并行处理，默认取 ner_config.enable_parallel
+            deduplicate (bool): NER结果是否按 (实体文本, 实体类型) 去重，默认为True；
+                为False时保留每一次出现的位置，用于按位置替换（mask_text_with_offsets）
         
-        # 保存映射关系
-        self.mapping[unique_id] = (text, entity_type)
-        # 保存实体到掩码的映射，确保同一实体始终使用相同的掩码
-        self.entity_to_mask[entity_key] = unique_id
+        远程NER服务熔断时不等待超时，立即降级为正则表达式 + 已知实体词典识别，
+        并将 degraded 属性置为True；熔断器会定期探测，服务恢复后自动回到正常识别。
         
-        return unique_id
-    
-    def _find_regex_entities(self, text: str) -> List[Dict[str, Any]]:
-        """使用正则表达式查找额外的实体"""
-        entities = []
-        
-        for entity_type, pattern in self.regex_patterns.items():
-            for match in re.finditer(pattern, text):
-                entities.append({
-                    "type": entity_type,
-                    "start": match.start(),
-                    "end": match.end(),
-                    "span": match.group(),
-                    "prob": 1.0  # 正则匹配的确定性为1
-                })
+        返回:
+            List[Dict[str, Any]]: 实体列表，每个实体包含span、type、start、end、prob字段
+        """
+        # 使用NER模型识别实体，未指定的执行参数（并行、线程数、分块大小）取 ner_config 或自动调优结果
+        try:
+            ner_result = recognize_entities(text, save_to_file=False, num_workers=num_workers,
+                                            enable_parallel=enable_parallel, deduplicate=deduplicate)
+        except CircuitOpenError as e:
+            return self._degraded_entities(text, e)
+        self.degraded = False
+        entities = ner_result.get("output", [])
         
-        return entities
+        # 使用正则表达式查找额外的实体
+        regex_entities = self._find_regex_entities(text)
+        
+        # 合并实体列表
+        return entities + regex_entities
     
-    def mask_text(self, text: str, save_mapping: bool = True, num_workers: int = 4, enable_parallel: bool = False) -> str:
+    def find_segment_entities(self, segments: List[str], num_workers: Optional[int] = None,
+                              enable_parallel: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """识别多个文本段（文档内容项、Markdown段落等）中的实体
+
+        所有文本段去重、合并后一次识别，保证同一实体在整个文档中使用相同的映射。启用预过滤
+        （prefilter_config）时，不含实体线索的文本段（页码、表格分隔线、案号等）不调用NER模型，
+        只做正则检测。返回的实体用于 mask_text 的 entities 参数（按实体文本匹配），
+        位置不对应任何一个文本段。
+
+        参数:
+            segments (List[str]): 文本段列表
+            num_workers (int, optional): 并行处理的工作线程数，默认取 ner_config.num_workers
+            enable_parallel (bool, optional): 是否启用并行处理，默认取 ner_config.enable_parallel
+
+        返回:
+            List[Dict[str, Any]]: 实体列表
+        """
+        # 页眉页脚、免责声明等重复出现的文本段只保留第一次出现，替换时仍按实体文本作用于每一处
+        segments = [segments[chunk_occurrences[0][0]] for chunk_occurrences in deduplicate_chunks(segments)[1]]
+        prefilter = get_backend().get_prefilter() if segments else None
+        selected = set(prefilter.select(segments)) if prefilter is not None else set(range(len(segments)))
+
+        ner_text = "".join(segment + "\n\n" for i, segment in enumerate(segments) if i in selected)
+        skipped_text = "".join(segment + "\n\n" for i, segment in enumerate(segments) if i not in selected)
+
+        entities = self.find_entities(ner_text, num_workers, enable_parallel) if ner_text else []
+        if skipped_text:
+            entities = entities + self._find_regex_entities(skipped_text)
+        return entities
+
+    def mask_text(self, text: str, save_mapping: bool = True, num_workers: Optional[int] = None,
+                  enable_parallel: Optional[bool] = None,
+                  entities: Optional[List[Dict[str, Any]]] = None) -> str:
         """对文本进行脱敏处理
         
         参数:
             text (str): 待脱敏的文本
             save_mapping (bool): 是否保存映射表，默认为True
-            num_workers (int): 并行处理的工作线程数，默认为4
-            enable_parallel (bool): 是否启用并行处理，默认为False
+            num_workers (int, optional): 并行处理的工作线程数，默认取 ner_config.num_workers
+            enable_parallel (bool, optional): 是否启用并行处理，默认取 ner_config.enable_parallel
+            entities (List[Dict[str, Any]], optional): 预先识别好的实体列表（通常来自 find_entities），
+                提供时直接使用这些实体进行替换，不再调用NER模型，默认为None
+        
+        replace_config.mode 为 offset 时按实体位置替换（见 mask_text_with_offsets），包括提供了 entities 的情况
+        （如 DocumentMasker 复用整篇文档的识别结果）；否则按实体文本替换。两种方式都会替换实体在文本中的每一次出现。
         
         返回:
             str: 脱敏后的文本
         """
-        # 使用NER模型识别实体，根据设置决定是否启用并行处理
-        ner_result = recognize_entities(text, save_to_file=False, num_workers=num_workers if enable_parallel else 1)
+        if entities is None:
+            all_entities = self.find_entities(text, num_workers=num_workers, enable_parallel=enable_parallel)
+        else:
+            # 实体可能来自更大范围的文本（如整篇文档），只保留在当前文本中出现的实体
+            all_entities = [entity for entity in entities if entity["span"] and entity["span"] in text]
+        
+        if self._replace_config().get("mode") == "offset":
+            return self._mask_spans(text, all_entities, save_mapping)[0]
+        settings = resolve_execution_settings(enable_parallel, num_workers)
+        return self._replace_entities(text, all_entities, save_mapping, settings.num_workers, settings.enable_parallel)
+    
+    async def afind_entities(self, text: str, deduplicate: bool = True) -> List[Dict[str, Any]]:
+        """find_entities 的异步版本，NER请求通过AsyncOpenAI并发发送"""
+        try:
+            ner_result = await arecognize_entities(text, save_to_file=False, deduplicate=deduplicate)
+        except CircuitOpenError as e:
+            return self._degraded_entities(text, e)
+        self.degraded = False
         entities = ner_result.get("output", [])
+        return entities + self._find_regex_entities(text)
+    
+    async def amask_text(self, text: str, save_mapping: bool = True,
+                         entities: Optional[List[Dict[str, Any]]] = None) -> str:
+        """mask_text 的异步版本
         
-        # 使用正则表达式查找额外的实体
-        regex_entities = self._find_regex_entities(text)
+        实体识别阶段使用异步NER接口，替换阶段与 mask_text 相同（本地计算，不涉及IO）。
         
-        # 合并实体列表
-        all_entities = entities + regex_entities
+        参数:
+            text (str): 待脱敏的文本
+            save_mapping (bool): 是否保存映射表，默认为True
+            entities (List[Dict[str, Any]], optional): 预先识别好的实体列表，提供时不再调用NER模型
+        
+        返回:
+            str: 脱敏后的文本
+        """
+        if entities is None:
+            all_entities = await self.afind_entities(text)
+        else:
+            all_entities = [entity for entity in entities if entity["span"] and entity["span"] in text]
+        
+        if self._replace_config().get("mode") == "offset":
+            return self._mask_spans(text, all_entities, save_mapping)[0]
+        return self._replace_entities(text, all_entities, save_mapping)
+    
+    def _replace_entities(self, text: str, all_entities: List[Dict[str, Any]], save_mapping: bool = True,
+                          num_workers: int = 4, enable_parallel: bool = False) -> str:
+        """将文本中的实体替换为脱敏标记
         
-        # 采用两阶段替换策略，避免位置偏移问题
-        # 第一阶段：生成所有实体的脱敏替换文本和唯一标记
-        entity_replacements = []
+        先为每个不同的 (实体文本, 实体类型) 生成脱敏文本，再由替换引擎一次扫描完成替换：
+        同一位置优先替换最长的实体，较短的实体不会破坏包含它的较长实体；
+        同一实体文本有多个类型时使用第一个实体的类型。
+        """
+        # 第一阶段：生成脱敏文本，相同的 (实体文本, 实体类型) 只处理一次
+        unique_entities = list({(entity["span"], entity["type"]): entity
+                                for entity in reversed(all_entities) if entity["span"]}.values())[::-1]
         
         # 如果实体数量较多且启用了并行处理，使用并行处理生成脱敏替换文本
-        if len(all_entities) > 10 and enable_parallel:
+        if len(unique_entities) > 10 and enable_parallel:
             # 定义处理单个实体的函数
             def process_entity(entity):
-                entity_text = entity["span"]
-                entity_type = entity["type"]
-                
-                # 对实体进行脱敏
-                masked_entity = self._mask_entity(entity_text, entity_type)
-                
-                # 生成唯一标记，用于第一阶段替换
-                placeholder = f"__TEMP_PLACEHOLDER_{uuid.uuid4().hex}__"
-                
-                return (entity_text, placeholder, masked_entity)
+                return (entity["span"], self._mask_entity(entity["span"], entity["type"]))
             
             # 并行处理所有实体
-            print(f"处理实体: 共{len(all_entities)}个实体，使用{num_workers}个工作线程并行处理...")
+            logger.info("处理实体: 共%d个实体，使用%d个工作线程并行处理", len(unique_entities), num_workers)
             
-            with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-                # 使用tqdm显示进度
-                futures = [executor.submit(process_entity, entity) for entity in all_entities]
-                for future in tqdm.tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc="实体脱敏进度"):
-                    entity_replacements.append(future.result())
+            # 由共享调度器的CPU线程池执行，结果顺序与实体顺序一致
+            entity_replacements = get_scheduler().map(POOL_CPU, process_entity, unique_entities,
+                                                      max_workers=num_workers, desc="实体脱敏进度")
         else:
             # 实体数量较少，直接顺序处理
-            for entity in all_entities:
-                entity_text = entity["span"]
-                entity_type = entity["type"]
-                
-                # 对实体进行脱敏
-                masked_entity = self._mask_entity(entity_text, entity_type)
-                
-                # 生成唯一标记，用于第一阶段替换
-                placeholder = f"__TEMP_PLACEHOLDER_{uuid.uuid4().hex}__"
-                
-                entity_replacements.append((entity_text, placeholder, masked_entity))
-        
-        # 第二阶段：执行替换
-        # 先用唯一标记替换原文本中的实体，避免位置偏移
-        masked_text = text
-        for original, placeholder, _ in entity_replacements:
-            masked_text = masked_text.replace(original, placeholder)
-        
-        # 再将唯一标记替换为脱敏后的文本
-        for _, placeholder, masked_entity in entity_replacements:
-            masked_text = masked_text.replace(placeholder, masked_entity)
+            entity_replacements = [(entity["span"], self._mask_entity(entity["span"], entity["type"]))
+                                   for entity in unique_entities]
+        
+        # 第二阶段：一次扫描替换所有实体
+        replacements: Dict[str, str] = {}
+        for original, masked_entity in entity_replacements:
+            replacements.setdefault(original, masked_entity)
+        masked_text = ReplacementEngine(replacements).replace(text)
         
         # 保存映射表
         if save_mapping:
             self._save_mapping()
         
-        # 保存映射表
+        return masked_text
+    
+    def mask_text_with_offsets(self, text: str, save_mapping: bool = True, num_workers: Optional[int] = None,
+                               enable_parallel: Optional[bool] = None,
+                               entities: Optional[List[Dict[str, Any]]] = None) -> Tuple[str, OffsetMap]:
+        """按实体位置对文本进行脱敏处理，同时返回原文与脱敏后文本的位置对照
+        
+        每个实体文本的每一次出现都会被替换（模型对重复出现的实体通常只标注一次）。
+        NER模型与正则检测的结果位置相交时，按 replace_config.overlap_priority 的来源优先级取舍，
+        同一来源取更长的实体，不会像按文本替换那样由较早出现的实体截断其他实体。
+        
+        参数:
+            text (str): 待脱敏的文本
+            save_mapping (bool): 是否保存映射表，默认为True
+            num_workers (int, optional): 并行处理的工作线程数，默认取 ner_config.num_workers
+            enable_parallel (bool, optional): 是否启用并行处理，默认取 ner_config.enable_parallel
+            entities (List[Dict[str, Any]], optional): 预先识别好的实体列表（通常来自 find_entities 或
+                find_segment_entities），按实体文本在当前文本中重新定位，默认调用NER模型识别
+        
+        返回:
+            Tuple[str, OffsetMap]: 脱敏后的文本和位置对照
+        """
+        if entities is None:
+            entities = self.find_entities(text, num_workers, enable_parallel)
+        return self._mask_spans(text, entities, save_mapping)
+    
+    def _replace_config(self) -> Dict[str, Any]:
+        """config.json 中的 replace_config（配置文件不存在时使用默认值）"""
+        try:
+            return get_backend().config.get("replace_config", {})
+        except FileNotFoundError:
+            return {}
+    
+    def _mask_spans(self, text: str, entities: List[Dict[str, Any]],
+                    save_mapping: bool = True) -> Tuple[str, OffsetMap]:
+        """按实体位置替换：每个实体文本定位到它在原文中的每一次出现，再按优先级消除相交的实体"""
+        # 同一实体文本、类型和来源只保留第一个实体作为代表
+        representatives: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        for entity in entities:
+            if entity["span"]:
+                representatives.setdefault((entity["span"], entity["type"], entity.get("source", "ner")), entity)
+        by_span: Dict[str, List[Dict[str, Any]]] = {}
+        for (span, _, _), entity in representatives.items():
+            by_span.setdefault(span, []).append(entity)
+        located = [dict(entity, start=start, end=end)
+                   for start, end, span in AhoCorasick(by_span).iter_matches(text)
+                   for entity in by_span[span]] if by_span else []
+        
+        priority = self._replace_config().get("overlap_priority", DEFAULT_OVERLAP_PRIORITY)
+        spans = [(entity["start"], entity["end"], self._mask_entity(entity["span"], entity["type"]))
+                 for entity in resolve_overlaps(located, priority)]
+        masked_text, offset_map = replace_spans(text, spans)
+        
         if save_mapping:
             self._save_mapping()
         
-        return masked_text
+        return masked_text, offset_map
     
     def get_masked_entities(self, masked_text: str) -> Dict[str, Tuple[str, str]]:
         """获取脱敏实体信息
@@ -241,8 +439,7 @@ class DataMasker:
             Dict[str, Tuple[str, str]]: 脱敏标记到原始文本和实体类型的映射
         """
         # 查找所有脱敏标记 - 支持两种格式：旧格式 __MASKED_[hash]__ 和新格式 __MASKED_[type]_[hash]__
-        pattern = r'__MASKED_(?:[a-z]+_)?[0-9a-f]{8}__'
-        masked_ids = re.findall(pattern, masked_text)
+        masked_ids = MASKED_ID_PATTERN.findall(masked_text)
         
         # 创建结果字典
         result = {}
@@ -252,24 +449,22 @@ class DataMasker:
             if masked_id in self.mapping:
                 result[masked_id] = self.mapping[masked_id]
         
-        # 调试信息
-        print(f"[DEBUG] 找到脱敏标记数量: {len(masked_ids)}")
-        print(f"[DEBUG] 在映射表中找到的标记数量: {len(result)}")
+        # 调试信息（映射表中是原文，不记录具体内容）
+        logger.debug("找到脱敏标记数量: %d，在映射表中找到的标记数量: %d", len(masked_ids), len(result))
         if len(masked_ids) > 0 and len(result) == 0:
-            print(f"[DEBUG] 映射表类型: {type(self.mapping)}")
-            print(f"[DEBUG] 映射表大小: {len(self.mapping)}")
-            print(f"[DEBUG] 映射表示例: {list(self.mapping.items())[:2] if len(self.mapping) > 0 else '空'}")
-            print(f"[DEBUG] 脱敏标记示例: {masked_ids[:3] if len(masked_ids) > 0 else '空'}")
+            logger.debug("脱敏标记均不在映射表中，映射表大小: %d，脱敏标记示例: %s",
+                         len(self.mapping), masked_ids[:3])
         
         return result
         
-    def unmask_text(self, masked_text: str, num_workers: int = 4, enable_parallel: bool = False) -> str:
+    def unmask_text(self, masked_text: str, num_workers: Optional[int] = None,
+                    enable_parallel: Optional[bool] = None) -> str:
         """恢复脱敏后的文本
         
         参数:
             masked_text (str): 脱敏后的文本
-            num_workers (int): 并行处理的工作线程数，默认为4
-            enable_parallel (bool): 是否启用并行处理，默认为False
+            num_workers (int, optional): 并行处理的工作线程数，默认取 ner_config.num_workers
+            enable_parallel (bool, optional): 是否启用并行处理，默认取 ner_config.enable_parallel
         
         返回:
             str: 恢复后的文本
@@ -285,14 +480,14 @@ class DataMasker:
             masked_text = strategy.unmask(masked_text)
         
         # 查找所有脱敏标记 - 支持两种格式：旧格式 __MASKED_[hash]__ 和新格式 __MASKED_[type]_[hash]__
-        pattern = r'__MASKED_(?:[a-z]+_)?[0-9a-f]{8}__'
-        masked_ids = re.findall(pattern, masked_text)
+        masked_ids = MASKED_ID_PATTERN.findall(masked_text)
         
         # 如果没有脱敏标记，直接返回原文本
         if not masked_ids:
             return masked_text
         
         # 如果脱敏标记数量较多且启用了并行处理，使用并行处理
+        enable_parallel, num_workers = resolve_execution_settings(enable_parallel, num_workers)[:2]
         if len(masked_ids) > 10 and num_workers > 1 and enable_parallel:
             # 定义处理单个脱敏标记的函数
             def process_masked_id(masked_id):
@@ -303,14 +498,10 @@ class DataMasker:
             
             # 并行处理所有脱敏标记
             replacements = {}
-            print(f"恢复脱敏文本: 共{len(masked_ids)}个脱敏标记，使用{num_workers}个工作线程并行处理...")
+            logger.info("恢复脱敏文本: 共%d个脱敏标记，使用%d个工作线程并行处理", len(masked_ids), num_workers)
             
-            with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-                # 使用tqdm显示进度
-                futures = [executor.submit(process_masked_id, masked_id) for masked_id in masked_ids]
-                for future in tqdm.tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc="恢复脱敏进度"):
-                    masked_id, original_text = future.result()
-                    replacements[masked_id] = original_text
+            replacements.update(get_scheduler().map(POOL_CPU, process_masked_id, masked_ids,
+                                                    max_workers=num_workers, desc="恢复脱敏进度"))
             
             # 替换所有脱敏标记
             unmasked_text = masked_text
@@ -326,6 +517,6 @@ class DataMasker:
                 return masked_id
             
             # 使用正则表达式替换所有脱敏标记
-            unmasked_text = re.sub(pattern, replace_masked, masked_text)
+            unmasked_text = MASKED_ID_PATTERN.sub(replace_masked, masked_text)
         
         return unmasked_text
\ No newline at end of file
@@ -3,11 +3,14 @@
 import os
 import re
 import json
-import concurrent.futures
-import tqdm
+import logging
 from typing import Dict, List, Tuple, Union, Optional, Any
 
 from .data_masker import DataMasker
+from ..execution_settings import resolve_execution_settings
+from ..scheduler import POOL_CPU, get_scheduler
+
+logger = logging.getLogger(__name__)
 
 
 class DocumentMasker:
@@ -16,35 +19,37 @@ class DocumentMasker:
         # 数据脱敏器
         self.masker = masker if masker else DataMasker(mapping_file)
     
-    def mask_document(self, content_list: List[Dict[str, Any]], save_mapping: bool = True, num_workers: int = 4, enable_parallel: bool = False) -> List[Dict[str, Any]]:
+    def mask_document(self, content_list: List[Dict[str, Any]], save_mapping: bool = True, num_workers: Optional[int] = None, enable_parallel: Optional[bool] = None) -> List[Dict[str, Any]]:
         """对文档内容列表进行脱敏处理
         
         参数:
             content_list (List[Dict[str, Any]]): 文档内容列表
             save_mapping (bool): 是否保存映射表，默认为True
-            num_workers (int): 并行处理的工作线程数，默认为4
-            enable_parallel (bool): 是否启用并行处理，默认为False
+            num_workers (int, optional): 并行处理的工作线程数，默认取 ner_config.num_workers
+            enable_parallel (bool, optional): 是否启用并行处理，默认取 ner_config.enable_parallel
         
         返回:
             List[Dict[str, Any]]: 脱敏后的文档内容列表
         """
         # 第一遍扫描：收集所有实体并建立映射关系
-        print("第一遍扫描：收集所有实体并建立映射关系...")
+        logger.info("第一遍扫描：收集所有实体并建立映射关系")
         
         # 先将所有文本合并进行一次完整扫描，确保同一实体在整个文档中使用相同的映射
-        all_text = ""
+        segments = []
         for item in content_list:
             if "text" in item and item["text"]:
-                all_text += item["text"] + "\n\n"
+                segments.append(item["text"])
             if "title" in item and item["title"]:
-                all_text += item["title"] + "\n\n"
+                segments.append(item["title"])
         
-        # 对合并后的文本进行一次扫描，建立映射关系
-        if all_text:
-            self.masker.mask_text(all_text, save_mapping=False)
+        # 对合并后的文本进行一次实体识别，第二遍替换时复用识别结果，不再调用NER模型
+        # 启用预过滤时，页码、表格分隔线等内容项只做正则检测
+        entities = self.masker.find_segment_entities(segments, num_workers, enable_parallel)
+        # 替换阶段的并行设置：未指定时取 ner_config（识别阶段保留 None，以便使用自动调优结果）
+        enable_parallel, num_workers = resolve_execution_settings(enable_parallel, num_workers)[:2]
         
         # 第二遍：使用已建立的映射关系进行实际替换
-        print("第二遍：使用已建立的映射关系进行实际替换...")
+        logger.info("第二遍：使用已建立的映射关系进行实际替换")
         
         # 如果内容列表项数量足够多且启用了并行处理，使用并行处理
         if len(content_list) > 5 and enable_parallel:
@@ -54,23 +59,19 @@ class DocumentMasker:
                 
                 # 对文本内容进行脱敏
                 if "text" in item and item["text"]:
-                    masked_item["text"] = self.masker.mask_text(item["text"], save_mapping=False, num_workers=1, enable_parallel=False)
+                    masked_item["text"] = self.masker.mask_text(item["text"], save_mapping=False, num_workers=1, enable_parallel=False, entities=entities)
                 
                 # 处理其他可能包含文本的字段
                 if "title" in item and item["title"]:
-                    masked_item["title"] = self.masker.mask_text(item["title"], save_mapping=False, num_workers=1, enable_parallel=False)
+                    masked_item["title"] = self.masker.mask_text(item["title"], save_mapping=False, num_workers=1, enable_parallel=False, entities=entities)
                 
                 return masked_item
             
             # 并行处理所有内容项
-            masked_content_list = []
-            print(f"处理文档内容: 共{len(content_list)}个内容项，使用{num_workers}个工作线程并行处理...")
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-                # 使用tqdm显示进度
-                futures = [executor.submit(process_item, item) for item in content_list]
-                for future in tqdm.tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc="内容项脱敏进度"):
-                    masked_content_list.append(future.result())
+            logger.info("处理文档内容: 共%d个内容项，使用%d个工作线程并行处理", len(content_list), num_workers)
+            # 由共享调度器的CPU线程池执行，结果按输入顺序返回
+            masked_content_list = get_scheduler().map(POOL_CPU, process_item, content_list,
+                                                      max_workers=num_workers, desc="内容项脱敏进度")
         else:
             # 内容项数量较少，直接顺序处理
             masked_content_list = []
@@ -79,11 +80,11 @@ class DocumentMasker:
                 
                 # 对文本内容进行脱敏
                 if "text" in item and item["text"]:
-                    masked_item["text"] = self.masker.mask_text(item["text"], save_mapping=False)
+                    masked_item["text"] = self.masker.mask_text(item["text"], save_mapping=False, entities=entities)
                 
                 # 处理其他可能包含文本的字段
                 if "title" in item and item["title"]:
-                    masked_item["title"] = self.masker.mask_text(item["title"], save_mapping=False)
+                    masked_item["title"] = self.masker.mask_text(item["title"], save_mapping=False, entities=entities)
                 
                 masked_content_list.append(masked_item)
         
@@ -93,17 +94,19 @@ class DocumentMasker:
         
         return masked_content_list
     
-    def unmask_document(self, masked_content_list: List[Dict[str, Any]], num_workers: int = 4, enable_parallel: bool = False) -> List[Dict[str, Any]]:
+    def unmask_document(self, masked_content_list: List[Dict[str, Any]], num_workers: Optional[int] = None, enable_parallel: Optional[bool] = None) -> List[Dict[str, Any]]:
         """恢复脱敏后的文档内容列表
         
         参数:
             masked_content_list (List[Dict[str, Any]]): 脱敏后的文档内容列表
-            num_workers (int): 并行处理的工作线程数，默认为4
-            enable_parallel (bool): 是否启用并行处理，默认为False
+            num_workers (int, optional): 并行处理的工作线程数，默认取 ner_config.num_workers
+            enable_parallel (bool, optional): 是否启用并行处理，默认取 ner_config.enable_parallel
         
         返回:
             List[Dict[str, Any]]: 恢复后的文档内容列表
         """
+        enable_parallel, num_workers = resolve_execution_settings(enable_parallel, num_workers)[:2]
+
         # 如果内容列表项数量足够多且启用了并行处理，使用并行处理
         if len(masked_content_list) > 5 and num_workers > 1 and enable_parallel:
             # 定义处理单个内容项的函数
@@ -121,14 +124,10 @@ class DocumentMasker:
                 return unmasked_item
             
             # 并行处理所有内容项
-            unmasked_content_list = []
-            print(f"恢复文档内容: 共{len(masked_content_list)}个内容项，使用{num_workers}个工作线程并行处理...")
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-                # 使用tqdm显示进度
-                futures = [executor.submit(process_item, item) for item in masked_content_list]
-                for future in tqdm.tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc="内容项恢复进度"):
-                    unmasked_content_list.append(future.result())
+            logger.info("恢复文档内容: 共%d个内容项，使用%d个工作线程并行处理", len(masked_content_list), num_workers)
+            # 由共享调度器的CPU线程池执行，结果按输入顺序返回
+            unmasked_content_list = get_scheduler().map(POOL_CPU, process_item, masked_content_list,
+                                                        max_workers=num_workers, desc="内容项恢复进度")
         else:
             # 内容项数量较少，直接顺序处理
             unmasked_content_list = []
@@ -147,14 +146,14 @@ class DocumentMasker:
         
         return unmasked_content_list
     
-    def mask_markdown(self, markdown_content: str, save_mapping: bool = True, num_workers: int = 4, enable_parallel: bool = False) -> str:
+    def mask_markdown(self, markdown_content: str, save_mapping: bool = True, num_workers: Optional[int] = None, enable_parallel: Optional[bool] = None) -> str:
         """对Markdown文本进行脱敏处理
         
         参数:
             markdown_content (str): 待脱敏的Markdown文本
             save_mapping (bool): 是否保存映射表，默认为True
-            num_workers (int): 并行处理的工作线程数，默认为4
-            enable_parallel (bool): 是否启用并行处理，默认为False
+            num_workers (int, optional): 并行处理的工作线程数，默认取 ner_config.num_workers
+            enable_parallel (bool, optional): 是否启用并行处理，默认取 ner_config.enable_parallel
         
         返回:
             str: 脱敏后的Markdown文本
@@ -176,29 +175,28 @@ class DocumentMasker:
                 paragraph_indices.append(i)
         
         # 第一遍扫描：收集所有实体并建立映射关系
-        print("第一遍扫描：收集所有实体并建立映射关系...")
+        logger.info("第一遍扫描：收集所有实体并建立映射关系")
         
-        # 先对整个Markdown内容进行一次完整扫描，确保同一实体在整个文档中使用相同的映射
-        self.masker.mask_text(markdown_content, save_mapping=False)
+        # 先对所有段落进行一次完整的实体识别，确保同一实体在整个文档中使用相同的映射
+        # 第二遍替换时复用识别结果，不再调用NER模型；启用预过滤时不含实体线索的段落只做正则检测
+        entities = self.masker.find_segment_entities(paragraphs_to_process, num_workers, enable_parallel)
+        # 替换阶段的并行设置：未指定时取 ner_config（识别阶段保留 None，以便使用自动调优结果）
+        enable_parallel, num_workers = resolve_execution_settings(enable_parallel, num_workers)[:2]
         
         # 第二遍：使用已建立的映射关系进行实际替换
-        print("第二遍：使用已建立的映射关系进行实际替换...")
+        logger.info("第二遍：使用已建立的映射关系进行实际替换")
         
         # 如果段落数量足够多且启用了并行处理，使用并行处理
         if len(paragraphs_to_process) > 5 and enable_parallel:
             # 定义处理单个段落的函数
             def process_paragraph(paragraph):
-                return self.masker.mask_text(paragraph, save_mapping=False, num_workers=1, enable_parallel=False)
+                return self.masker.mask_text(paragraph, save_mapping=False, num_workers=1, enable_parallel=False, entities=entities)
             
             # 并行处理所有段落
-            masked_paragraphs_processed = []
-            print(f"处理Markdown文档: 共{len(paragraphs_to_process)}个段落，使用{num_workers}个工作线程并行处理...")
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-                # 使用tqdm显示进度
-                futures = [executor.submit(process_paragraph, p) for p in paragraphs_to_process]
-                for future in tqdm.tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc="段落脱敏进度"):
-                    masked_paragraphs_processed.append(future.result())
+            logger.info("处理Markdown文档: 共%d个段落，使用%d个工作线程并行处理", len(paragraphs_to_process), num_workers)
+            # 由共享调度器的CPU线程池执行，结果按输入顺序返回
+            masked_paragraphs_processed = get_scheduler().map(POOL_CPU, process_paragraph, paragraphs_to_process,
+                                                              max_workers=num_workers, desc="段落脱敏进度")
             
             # 将处理结果放回原来的位置
             result_paragraphs = paragraphs.copy()
@@ -217,7 +215,7 @@ class DocumentMasker:
                     continue
                 
                 # 对段落文本进行脱敏
-                masked_paragraph = self.masker.mask_text(paragraph, save_mapping=False)
+                masked_paragraph = self.masker.mask_text(paragraph, save_mapping=False, entities=entities)
                 masked_paragraphs.append(masked_paragraph)
             
             # 合并脱敏后的段落
@@ -229,17 +227,19 @@ class DocumentMasker:
         
         return masked_markdown
     
-    def unmask_markdown(self, masked_markdown: str, num_workers: int = 4, enable_parallel: bool = False) -> str:
+    def unmask_markdown(self, masked_markdown: str, num_workers: Optional[int] = None, enable_parallel: Optional[bool] = None) -> str:
         """恢复脱敏后的Markdown文本
         
         参数:
             masked_markdown (str): 脱敏后的Markdown文本
-            num_workers (int): 并行处理的工作线程数，默认为4
-            enable_parallel (bool): 是否启用并行处理，默认为False
+            num_workers (int, optional): 并行处理的工作线程数，默认取 ner_config.num_workers
+            enable_parallel (bool, optional): 是否启用并行处理，默认取 ner_config.enable_parallel
         
         返回:
             str: 恢复后的Markdown文本
         """
+        enable_parallel, num_workers = resolve_execution_settings(enable_parallel, num_workers)[:2]
+
         # 使用正则表达式匹配Markdown文本中的段落
         paragraphs = re.split(r'(\n\n|\r\n\r\n)', masked_markdown)
         
@@ -263,14 +263,10 @@ class DocumentMasker:
                 return self.masker.unmask_text(paragraph, num_workers=1, enable_parallel=False)
             
             # 并行处理所有段落
-            unmasked_paragraphs_processed = []
-            print(f"恢复Markdown文档: 共{len(paragraphs_to_process)}个段落，使用{num_workers}个工作线程并行处理...")
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-                # 使用tqdm显示进度
-                futures = [executor.submit(process_paragraph, p) for p in paragraphs_to_process]
-                for future in tqdm.tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc="段落恢复进度"):
-                    unmasked_paragraphs_processed.append(future.result())
+            logger.info("恢复Markdown文档: 共%d个段落，使用%d个工作线程并行处理", len(paragraphs_to_process), num_workers)
+            # 由共享调度器的CPU线程池执行，结果按输入顺序返回
+            unmasked_paragraphs_processed = get_scheduler().map(POOL_CPU, process_paragraph, paragraphs_to_process,
+                                                                max_workers=num_workers, desc="段落恢复进度")
             
             # 将处理结果放回原来的位置
             result_paragraphs = paragraphs.copy()
@@ -297,7 +293,7 @@ class DocumentMasker:
         
         return unmasked_markdown
     
-    def process_document_file(self, file_path: str, mask: bool, output_dir: str = "./output", save_mapping: bool = True, enable_parallel: bool = False, num_workers: int = 4) -> Tuple[str, str]:
+    def process_document_file(self, file_path: str, mask: bool, output_dir: str = "./output", save_mapping: bool = True, enable_parallel: Optional[bool] = None, num_workers: Optional[int] = None) -> Tuple[str, str]:
         """处理文档文件，支持脱敏和恢复
         
         参数:
@@ -305,8 +301,8 @@ class DocumentMasker:
             mask (bool): True表示脱敏，False表示恢复
             output_dir (str): 输出目录，默认为"./output"
             save_mapping (bool): 是否保存映射表，默认为True
-            enable_parallel (bool): 是否启用并行处理，默认为False
-            num_workers (int): 并行处理的工作线程数，默认为4
+            enable_parallel (bool, optional): 是否启用并行处理，默认取 ner_config.enable_parallel
+            num_workers (int, optional): 并行处理的工作线程数，默认取 ner_config.num_workers
         
         返回:
             Tuple[str, str]: (处理后的Markdown内容, 内容列表文件路径)
@@ -329,14 +325,11 @@ class DocumentMasker:
         file_extension = file_extension[1:].lower() if file_extension else ""
         
         # 根据文件类型选择不同的处理方式
-        print(f"[DEBUG] process_document_file 被调用")
-        print(f"[DEBUG] 文件路径: {file_path}")
-        print(f"[DEBUG] 文件扩展名: {file_extension}")
-        print(f"[DEBUG] 脱敏模式: {mask}")
+        logger.debug("process_document_file: 文件路径: %s，扩展名: %s，脱敏模式: %s", file_path, file_extension, mask)
         
         # 对于简单的文本文件，直接读取内容，避免导入magic_pdf
         if file_extension in ['txt', 'md']:
-            print(f"[DEBUG] 检测到文本文件，使用简单读取方式")
+            logger.debug("检测到文本文件，使用简单读取方式")
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     text_content = f.read()
@@ -344,27 +337,17 @@ class DocumentMasker:
                 # 构造简单的content_list格式
                 content_list = [{"type": "text", "text": text_content}]
                 md_content = text_content
-                print(f"[DEBUG] 文本文件读取成功，内容长度: {len(text_content)}")
-            except Exception as read_error:
-                print(f"[ERROR] 读取文本文件失败!")
-                print(f"[ERROR] 错误类型: {type(read_error).__name__}")
-                print(f"[ERROR] 错误信息: {str(read_error)}")
-                import traceback
-                traceback.print_exc()
+                logger.debug("文本文件读取成功，内容长度: %d", len(text_content))
+            except Exception:
+                logger.exception("读取文本文件失败: %s", file_path)
                 raise
         else:
             # 对于PDF、Word等复杂文档，使用document_to_markdown
-            print(f"[DEBUG] 检测到复杂文档，准备导入 document_to_markdown...")
+            logger.debug("检测到复杂文档，准备导入 document_to_markdown")
             try:
                 from doc_preprocess.pdf2md import document_to_markdown
-                print(f"[DEBUG] document_to_markdown 导入成功")
-            except Exception as import_error:
-                print(f"[ERROR] 导入 document_to_markdown 失败!")
-                print(f"[ERROR] 错误类型: {type(import_error).__name__}")
-                print(f"[ERROR] 错误信息: {str(import_error)}")
-                print(f"[ERROR] 提示: PDF/Word文档处理需要Python 3.10+")
-                import traceback
-                traceback.print_exc()
+            except Exception:
+                logger.exception("导入 document_to_markdown 失败（PDF/Word文档处理需要Python 3.10+）")
                 raise TypeError(
                     f"处理 {file_extension} 文件需要 Python 3.10 或更高版本。\n"
                     f"当前使用的是 Python 3.9。\n"
@@ -374,17 +357,11 @@ class DocumentMasker:
                 )
             
             # 使用document_to_markdown处理文档
-            print(f"[DEBUG] 开始调用 document_to_markdown...")
             try:
                 md_content, content_list = document_to_markdown(file_path)
-                print(f"[DEBUG] document_to_markdown 调用成功")
-                print(f"[DEBUG] 获得 {len(content_list) if content_list else 0} 个内容项")
-            except Exception as convert_error:
-                print(f"[ERROR] document_to_markdown 调用失败!")
-                print(f"[ERROR] 错误类型: {type(convert_error).__name__}")
-                print(f"[ERROR] 错误信息: {str(convert_error)}")
-                import traceback
-                traceback.print_exc()
+                logger.debug("document_to_markdown 调用成功，获得 %d 个内容项", len(content_list) if content_list else 0)
+            except Exception:
+                logger.exception("document_to_markdown 调用失败: %s", file_path)
                 raise
         
         # 根据操作类型进行脱敏或恢复处理
@@ -0,0 +1,133 @@
+# 脱敏映射表存储 - 多线程并行脱敏时保证同一实体只生成一个脱敏标记
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 映射表中的实体键：(原始文本, 实体类型)
+EntityKey = Tuple[str, str]
+
+
+class MappingStore:
+    """线程安全的脱敏映射表
+
+    同时维护 {脱敏标记: (原始文本, 实体类型)} 和 {(原始文本, 实体类型): 脱敏标记} 两个映射。
+    查询不加锁（单次字典读取在CPython中是原子操作）；新建映射时按实体键取分段锁，
+    并在锁内再次查询，保证同一实体在多线程下只生成一个脱敏标记，不同实体之间互不阻塞。
+    """
+
+    def __init__(self, mapping: Optional[Dict[str, EntityKey]] = None,
+                 entity_to_mask: Optional[Dict[EntityKey, str]] = None, stripes: int = 64):
+        """
+        参数:
+            mapping (Dict[str, Tuple[str, str]], optional): 已有的 {脱敏标记: (原始文本, 实体类型)}
+            entity_to_mask (Dict[Tuple[str, str], str], optional): 已有的 {(原始文本, 实体类型): 脱敏标记}
+            stripes (int): 分段锁的数量
+        """
+        self._locks: List[threading.Lock] = [threading.Lock() for _ in range(max(1, stripes))]
+        self.mapping: Dict[str, EntityKey] = {}
+        self.entity_to_mask: Dict[EntityKey, str] = {}
+        self.load(mapping or {}, entity_to_mask)
+
+    def _lock_for(self, key: EntityKey) -> threading.Lock:
+        return self._locks[hash(key) % len(self._locks)]
+
+    def load(self, mapping: Dict[str, EntityKey], entity_to_mask: Optional[Dict[EntityKey, str]] = None):
+        """替换全部映射（加载映射表文件时使用），未提供 entity_to_mask 时由 mapping 重建"""
+        if entity_to_mask is None:
+            entity_to_mask = {key: mask_id for mask_id, key in mapping.items()}
+        self._acquire_all()
+        try:
+            self.mapping, self.entity_to_mask = dict(mapping), dict(entity_to_mask)
+        finally:
+            self._release_all()
+
+    def get(self, original: str, entity_type: str) -> Optional[str]:
+        """返回实体的脱敏标记，不存在时返回None"""
+        return self.entity_to_mask.get((original, entity_type))
+
+    def lookup(self, mask_id: str) -> Optional[EntityKey]:
+        """返回脱敏标记对应的 (原始文本, 实体类型)，不存在时返回None"""
+        return self.mapping.get(mask_id)
+
+    def get_or_create(self, original: str, entity_type: str, create: Callable[[], str]) -> str:
+        """返回实体的脱敏标记，不存在时调用 create 生成并保存
+
+        同一实体并发调用时 create 只会被调用一次（除非生成的标记已被其他实体占用，此时重新生成）。
+
+        参数:
+            original (str): 原始文本
+            entity_type (str): 实体类型
+            create (Callable[[], str]): 生成新脱敏标记的函数
+
+        返回:
+            str: 脱敏标记
+        """
+        key = (original, entity_type)
+        mask_id = self.entity_to_mask.get(key)
+        if mask_id is not None:
+            return mask_id
+        with self._lock_for(key):
+            mask_id = self.entity_to_mask.get(key)
+            if mask_id is not None:
+                return mask_id
+            previous = None
+            while True:
+                mask_id = create()
+                # 不同实体由不同的锁保护，用 setdefault 原子地占用脱敏标记，避免两个实体共用一个标记
+                if self.mapping.setdefault(mask_id, key) == key:
+                    break
+                if mask_id == previous:
+                    raise ValueError(f"脱敏标记冲突: {mask_id} 已被其他实体占用")
+                previous = mask_id
+            self.entity_to_mask[key] = mask_id
+            return mask_id
+
+    def put(self, original: str, entity_type: str, mask_id: str, on_insert: Optional[Callable[[], Any]] = None) -> str:
+        """保存由调用方确定的脱敏标记（如密钥派生的标记），实体原有的标记仍可用于恢复
+
+        实体已使用该标记时直接返回；否则在分段锁内再次检查后保存，同一实体并发调用时
+        on_insert 只会被调用一次。
+
+        参数:
+            original (str): 原始文本
+            entity_type (str): 实体类型
+            mask_id (str): 脱敏标记
+            on_insert (Callable, optional): 首次保存该标记前调用（如调用有状态的脱敏策略）
+
+        返回:
+            str: 脱敏标记
+
+        异常:
+            ValueError: 脱敏标记已被其他实体占用
+        """
+        key = (original, entity_type)
+        if self.entity_to_mask.get(key) == mask_id:
+            return mask_id
+        with self._lock_for(key):
+            if self.entity_to_mask.get(key) == mask_id:
+                return mask_id
+            if on_insert is not None:
+                on_insert()
+            if self.mapping.setdefault(mask_id, key) != key:
+                raise ValueError(f"脱敏标记冲突: {mask_id} 已被其他实体占用")
+            self.entity_to_mask[key] = mask_id
+            return mask_id
+
+    def snapshot(self) -> Tuple[Dict[str, EntityKey], Dict[EntityKey, str]]:
+        """返回两个映射的一致副本（保存映射表时使用，期间暂停新建映射）"""
+        self._acquire_all()
+        try:
+            return dict(self.mapping), dict(self.entity_to_mask)
+        finally:
+            self._release_all()
+
+    def __len__(self) -> int:
+        return len(self.entity_to_mask)
+
+    def _acquire_all(self):
+        for lock in self._locks:
+            lock.acquire()
+
+    def _release_all(self):
+        for lock in reversed(self._locks):
+            lock.release()
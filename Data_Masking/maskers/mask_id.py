@@ -0,0 +1,63 @@
+# 脱敏标记 - 生成脱敏标记，以及在脱敏后的文本中查找脱敏标记
+
+import hashlib
+import hmac
+import os
+import re
+import uuid
+from typing import Any, Dict, Optional, Union
+
+# 脱敏标记格式：旧格式 __MASKED_[hash]__，新格式 __MASKED_[type]_[hash]__
+# 实体类型可以是中文（如"人名"），hash为8位随机标记或8~32位的密钥派生标记
+MASKED_ID_PATTERN = re.compile(r'__MASKED_(?:[^\W_]+(?:_[^\W_]+)*_)?[0-9a-f]{8,32}__')
+
+# 密钥派生标记的默认长度（16位十六进制，即64位）
+DEFAULT_KEYED_ID_LENGTH = 16
+
+
+def random_mask_id(entity_type: str) -> str:
+    """随机脱敏标记，同一实体的一致性依赖映射表"""
+    return f"__MASKED_{entity_type.lower()}_{uuid.uuid4().hex[:8]}__"
+
+
+def keyed_mask_id(original: str, entity_type: str, secret: bytes, length: int = DEFAULT_KEYED_ID_LENGTH) -> str:
+    """由密钥派生的脱敏标记：HMAC-SHA256(secret, 实体类型 + 原始文本)
+
+    相同密钥下同一实体在任何进程、任何机器上都得到相同的标记，无需共享映射表；
+    不知道密钥时无法由标记反推或验证原始文本。
+
+    参数:
+        original (str): 原始文本
+        entity_type (str): 实体类型
+        secret (bytes): 密钥（每个租户一个）
+        length (int): 标记中十六进制字符的个数，8~32
+
+    返回:
+        str: 脱敏标记
+    """
+    message = f"{entity_type}\x1f{original}".encode('utf-8')
+    digest = hmac.new(secret, message, hashlib.sha256).hexdigest()
+    return f"__MASKED_{entity_type.lower()}_{digest[:min(max(length, 8), 32)]}__"
+
+
+def load_mask_secret(config: Dict[str, Any]) -> Optional[bytes]:
+    """读取 config.json 中 mask_id_config 的密钥，mode 不为 hmac 时返回None
+
+    密钥优先取 secret_env 指定的环境变量，其次取 secret。
+
+    异常:
+        ValueError: mode 为 hmac 但没有配置密钥
+    """
+    mask_id_config = config.get('mask_id_config', {})
+    if mask_id_config.get('mode', 'random') != 'hmac':
+        return None
+    secret = os.environ.get(mask_id_config.get('secret_env') or 'DATA_MASKING_MASK_SECRET') or \
+        mask_id_config.get('secret')
+    if not secret:
+        raise ValueError("mask_id_config.mode 为 hmac 时必须配置密钥（secret_env 指定的环境变量或 secret）")
+    return encode_secret(secret)
+
+
+def encode_secret(secret: Union[str, bytes]) -> bytes:
+    """密钥统一转换为bytes"""
+    return secret if isinstance(secret, bytes) else secret.encode('utf-8')
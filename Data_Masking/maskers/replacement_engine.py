@@ -0,0 +1,241 @@
+# 替换引擎 - 把文本中的多个原文一次扫描替换为对应的脱敏文本，或按实体位置替换并记录位置对照
+
+import bisect
+import re
+from typing import Any, Dict, Iterable, List, Pattern, Sequence, Tuple
+
+# 位置相交的实体按来源取舍的默认优先级：越靠前越优先（正则检测 > 已知实体词典 > NER模型），
+# 没有 source 字段的实体视为NER模型识别的实体
+DEFAULT_OVERLAP_PRIORITY = ("regex", "dictionary", "ner")
+
+
+def build_trie_pattern(words: Iterable[str]) -> str:
+    """把一组字符串编译为按前缀树组织的正则表达式
+
+    相同前缀只出现一次（如"王鸿雁""王晗"编译为 王(?:鸿雁|晗)），
+    较短的词作为可选后缀的结尾（如"北京""北京市"编译为 北京(?:市)?），
+    正则在每个位置只沿前缀树走一条路径，并优先匹配最长的词。
+
+    参数:
+        words (Iterable[str]): 待匹配的字符串，空字符串被忽略
+
+    返回:
+        str: 正则表达式（没有任何词时返回永不匹配的表达式）
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        if not word:
+            continue
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # 当前位置已经是一个完整的词：更长的词优先，匹配不上时退回到当前词
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie) if trie else r'(?!)'
+
+
+class ReplacementEngine:
+    """多模式替换引擎
+
+    所有原文编译为一个前缀树正则，从左到右一次扫描文本，在每个位置取最长的原文，
+    替换结果按片段拼接。耗时与文本长度成正比，不随原文数量成倍增加；
+    较短的原文不会破坏包含它的较长原文（"王鸿"不会替换掉"王鸿雁"中的前两个字）。
+    """
+
+    def __init__(self, replacements: Dict[str, str]):
+        """
+        参数:
+            replacements (Dict[str, str]): 原文 -> 替换文本
+        """
+        self.replacements = {original: masked for original, masked in replacements.items() if original}
+        self.pattern: Pattern = re.compile(build_trie_pattern(self.replacements))
+
+    def replace(self, text: str) -> str:
+        """返回替换后的文本"""
+        if not self.replacements:
+            return text
+        replacements = self.replacements
+        return self.pattern.sub(lambda match: replacements[match.group()], text)
+
+
+def replace_all(text: str, replacements: Dict[str, str]) -> str:
+    """一次扫描把文本中的所有原文替换为对应的替换文本（最左、最长优先）"""
+    return ReplacementEngine(replacements).replace(text)
+
+
+def resolve_overlaps(entities: Iterable[Dict[str, Any]],
+                     priority: Sequence[str] = DEFAULT_OVERLAP_PRIORITY) -> List[Dict[str, Any]]:
+    """消除位置相交的实体，返回按起始位置排序、互不相交的实体
+
+    依次按来源优先级、实体长度（更长优先）、置信度（更高优先）、起始位置（更靠前优先）
+    选取实体，与已选实体相交的实体被丢弃。
+
+    参数:
+        entities (Iterable[Dict[str, Any]]): 带 start、end 的实体
+        priority (Sequence[str]): 来源优先级，未列出的来源排在最后
+
+    返回:
+        List[Dict[str, Any]]: 互不相交的实体
+    """
+    ranks = {source: rank for rank, source in enumerate(priority)}
+
+    def sort_key(entity: Dict[str, Any]):
+        return (ranks.get(entity.get("source", "ner"), len(ranks)), entity["start"] - entity["end"],
+                -entity.get("prob", 0), entity["start"])
+
+    starts: List[int] = []
+    selected: List[Dict[str, Any]] = []
+    for entity in sorted(entities, key=sort_key):
+        start, end = entity["start"], entity["end"]
+        index = bisect.bisect_right(starts, start)
+        if index > 0 and selected[index - 1]["end"] > start:
+            continue
+        if index < len(starts) and starts[index] < end:
+            continue
+        starts.insert(index, start)
+        selected.insert(index, entity)
+    return selected
+
+
+class OffsetMap:
+    """原文与替换后文本的位置对照
+
+    segments 中每一项为一个被替换的区间 (原文起点, 原文终点, 替换后起点, 替换后终点)，
+    区间之外的文本原样保留，位置按前面各区间的长度变化平移。
+    """
+
+    def __init__(self, segments: List[Tuple[int, int, int, int]]):
+        self.segments = segments
+        self._original_starts = [segment[0] for segment in segments]
+        self._masked_starts = [segment[2] for segment in segments]
+
+    def _convert(self, position: int, starts: List[int], source: int, target: int, is_end: bool) -> int:
+        index = bisect.bisect_right(starts, position) - 1
+        if index < 0:
+            return position
+        segment = self.segments[index]
+        if position < segment[source + 1]:
+            # 位于被替换的区间内部：起点对应替换文本的起点，终点对应替换文本的终点
+            return segment[target + 1] if is_end and position > segment[source] else segment[target]
+        return segment[target + 1] + position - segment[source + 1]
+
+    def to_masked(self, position: int, is_end: bool = False) -> int:
+        """原文位置 -> 替换后文本中的位置
+
+        参数:
+            position (int): 原文中的位置
+            is_end (bool): 是否为区间终点（落在被替换的实体内部时取替换文本的终点）
+        """
+        return self._convert(position, self._original_starts, 0, 2, is_end)
+
+    def to_original(self, position: int, is_end: bool = False) -> int:
+        """替换后文本中的位置 -> 原文位置，参数含义同 to_masked"""
+        return self._convert(position, self._masked_starts, 2, 0, is_end)
+
+    def masked_span(self, start: int, end: int) -> Tuple[int, int]:
+        """原文区间 -> 替换后文本中的区间"""
+        return self.to_masked(start), self.to_masked(end, is_end=True)
+
+    def original_span(self, start: int, end: int) -> Tuple[int, int]:
+        """替换后文本中的区间 -> 原文区间"""
+        return self.to_original(start), self.to_original(end, is_end=True)
+
+
+def replace_spans(text: str, spans: Iterable[Tuple[int, int, str]]) -> Tuple[str, OffsetMap]:
+    """按位置一次性替换文本中的多个区间
+
+    参数:
+        text (str): 原文
+        spans (Iterable[Tuple[int, int, str]]): (起点, 终点, 替换文本)，按起点排序且互不相交
+
+    返回:
+        Tuple[str, OffsetMap]: 替换后的文本和位置对照
+    """
+    pieces: List[str] = []
+    segments: List[Tuple[int, int, int, int]] = []
+    position = 0
+    masked_length = 0
+    for start, end, replacement in spans:
+        pieces.append(text[position:start])
+        masked_start = masked_length + start - position
+        pieces.append(replacement)
+        masked_length = masked_start + len(replacement)
+        segments.append((start, end, masked_start, masked_length))
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces), OffsetMap(segments)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    sample = "王鸿雁与王鸿在北京市和北京见面，王鸿雁的电话是13812345678。"
+    print(replace_all(sample, {"王鸿": "[人名1]", "王鸿雁": "[人名2]", "北京": "[地名1]", "北京市": "[地名2]"}))
+
+    # 按位置替换：正则检测到的手机号与NER识别的"8123"相交时保留手机号
+    phone_start, number_start = sample.index("13812345678"), sample.index("8123")
+    hits = [{"span": "王鸿", "type": "人名", "start": 4, "end": 6, "source": "ner"},
+            {"span": "13812345678", "type": "PHONE", "start": phone_start, "end": phone_start + 11, "source": "regex"},
+            {"span": "8123", "type": "数字", "start": number_start, "end": number_start + 4, "source": "ner"}]
+    masked, offset_map = replace_spans(sample, [(hit["start"], hit["end"], f"[{hit['type']}]")
+                                                for hit in resolve_overlaps(hits)])
+    print(masked)
+    print(offset_map.segments, masked[slice(*offset_map.masked_span(phone_start, phone_start + 11))],
+          offset_map.to_original(len(masked)) == len(sample))
+
+    # 性能对比：约500KB文本、2000个实体
+    rng = random.Random(0)
+    surnames, given = "王李张刘陈杨黄赵吴周", "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平"
+    entities = sorted({rng.choice(surnames) + "".join(rng.choice(given) for _ in range(rng.randint(1, 3)))
+                       for _ in range(4000)})[:2000]
+    filler = "本院经审理查明，双方当事人之间的法律关系清楚，证据充分。"
+    pieces = []
+    while sum(map(len, pieces)) < 500_000:
+        pieces.append(filler[:rng.randint(5, len(filler))])
+        pieces.append(rng.choice(entities))
+    document = "".join(pieces)
+    mapping = {entity: f"__MASKED_{i:08x}__" for i, entity in enumerate(entities)}
+
+    started = time.perf_counter()
+    result = replace_all(document, mapping)
+    print(f"单次扫描替换: {len(document)}字符，{len(mapping)}个实体，耗时 {time.perf_counter() - started:.3f}s")
+
+    # 原来的两阶段替换：每个实体先替换为临时标记，再把临时标记替换为脱敏文本
+    started = time.perf_counter()
+    two_phase = document
+    placeholders = {original: f"__TEMP_PLACEHOLDER_{i}__" for i, original in enumerate(mapping)}
+    for original, placeholder in placeholders.items():
+        two_phase = two_phase.replace(original, placeholder)
+    for original, placeholder in placeholders.items():
+        two_phase = two_phase.replace(placeholder, mapping[original])
+    print(f"两阶段 str.replace: 耗时 {time.perf_counter() - started:.3f}s")
+
+    # DataMasker 的按位置替换与按文本替换对重复出现的实体结果一致：
+    # 模型通常只标注重复实体的一次出现，按位置替换也要替换每一次出现
+    import os
+    import sys
+    import tempfile
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from Data_Masking.maskers import DataMasker
+
+    repeated = "王鸿雁称，王鸿雁所有。王鸿与王鸿雁在北京市见面，北京市的王鸿来电13800138000。"
+    repeated_entities = [
+        {"span": span, "type": entity_type, "start": repeated.index(span), "end": repeated.index(span) + len(span)}
+        for span, entity_type in [("王鸿雁", "人名"), ("王鸿", "人名"), ("北京市", "地名"), ("13800138000", "PHONE")]
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        masker = DataMasker(os.path.join(directory, "masking_map.pkl"))
+        by_text = masker.mask_text(repeated, save_mapping=False, entities=repeated_entities)
+        by_offset, offset_map = masker.mask_text_with_offsets(repeated, save_mapping=False, entities=repeated_entities)
+    print(f"按位置替换{len(offset_map.segments)}处实体，与按文本替换{'一致' if by_offset == by_text else '不一致'}")
+    assert by_offset == by_text and masker.unmask_text(by_offset) == repeated
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 本地模拟NER服务 - 提供OpenAI兼容的 /v1/chat/completions 接口，用于离线基准测试和调试
+#
+# 用法:
+#     python -m Data_Masking.mock_ner_server --port 8765 --latency-ms 200 --error-rate 0.01
+# 然后在 config.json 中将 model_config.api_base 设置为 http://127.0.0.1:8765/v1
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional
+
+# 默认词典：实体文本 -> 实体类型
+DEFAULT_GAZETTEER = {
+    "王鸿雁": "人名",
+    "李建国": "人名",
+    "张晓明": "人名",
+    "陈思远": "人名",
+    "北京市": "地名",
+    "上海市": "地名",
+    "深圳市南山区": "地名",
+    "繁星科技有限公司": "机构名",
+    "华夏银行": "机构名",
+    "北京市第一中级人民法院": "机构名",
+    "13800138000": "手机号",
+    "110101199003077777": "身份证号",
+    "zhangxm@example.com": "电子邮箱",
+}
+
+# 打包请求中的文本块标签（编号为数字，不匹配提示词说明中的 <chunk id="编号">）
+CHUNK_PATTERN = re.compile(r'<chunk id="(\d+)">(.*?)</chunk>', re.S)
+# 默认用户提示词中待识别文本前的标记，实体位置相对于该标记之后的文本计算
+TEXT_MARKER = "文本："
+# 提示词中出现该标记时按紧凑格式（每行 "类型<Tab>实体文本"）输出
+COMPACT_MARKER = "<Tab>"
+
+
+class LatencyModel:
+    """模拟响应延迟：基础延迟（按分布抽样）+ 每个输出token的解码耗时"""
+
+    DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal', 'pareto')
+
+    def __init__(self, distribution: str = 'fixed', latency_ms: float = 0.0, sigma: float = 0.5,
+                 per_token_ms: float = 0.0):
+        """
+        参数:
+            distribution (str): 基础延迟分布，fixed / uniform / lognormal / pareto
+            latency_ms (float): 基础延迟的均值（毫秒）；uniform 在 [0, 2*latency_ms] 内取值
+            sigma (float): lognormal 的形状参数；pareto 使用 1/sigma 作为尾部指数，sigma越大长尾越重
+            per_token_ms (float): 每个输出token的解码耗时（毫秒）
+        """
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"不支持的延迟分布: {distribution}")
+        self.distribution = distribution
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.per_token_ms = per_token_ms
+
+    def sample(self, rng: random.Random) -> float:
+        """抽样一次基础延迟（秒）"""
+        mean = self.latency_ms / 1000.0
+        if mean <= 0:
+            return 0.0
+        if self.distribution == 'uniform':
+            return rng.uniform(0, 2 * mean)
+        if self.distribution == 'lognormal':
+            # 调整 mu 使分布均值等于 latency_ms
+            mu = math.log(mean) - self.sigma ** 2 / 2
+            return rng.lognormvariate(mu, self.sigma)
+        if self.distribution == 'pareto':
+            alpha = max(1.05, 1.0 / max(self.sigma, 1e-6))
+            # paretovariate 的最小值为1，均值为 alpha/(alpha-1)
+            return mean * (alpha - 1) / alpha * rng.paretovariate(alpha)
+        return mean
+
+    def decode_time(self, output_tokens: int) -> float:
+        return output_tokens * self.per_token_ms / 1000.0
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：汉字每字1个，其他字符每4个1个"""
+    wide = sum(1 for c in text if ord(c) > 0x2E80)
+    return wide + math.ceil((len(text) - wide) / 4)
+
+
+class MockNERServer:
+    """模拟的OpenAI兼容NER服务
+
+    - 实体输出由词典决定：在用户消息中查找词典中的每个实体文本，结果确定、可复现
+    - 用户消息中包含 <chunk id="..."> 标签时按打包请求处理，返回以编号为键的JSON对象
+    - 提示词中包含 "<Tab>" 时按紧凑格式输出，每行一个 "类型<Tab>实体文本"
+    - 支持按比例注入500错误和429限流（带 Retry-After），可指定总是返回500的模型，支持 stream=true 的SSE流式响应
+    - GET /stats 返回请求统计，POST /stats/reset 清空统计
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 gazetteer: Optional[Dict[str, str]] = None,
+                 latency: Optional[LatencyModel] = None,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 retry_after: Optional[float] = 1.0, stream_chunk_chars: int = 8,
+                 seed: Optional[int] = 0, uncertain_models: Optional[Dict[str, float]] = None,
+                 failing_models: Optional[Iterable[str]] = None):
+        """
+        参数:
+            host (str): 监听地址
+            port (int): 监听端口，0表示自动分配
+            gazetteer (Dict[str, str], optional): 实体词典，默认使用 DEFAULT_GAZETTEER
+            latency (LatencyModel, optional): 延迟模型，默认无延迟
+            error_rate (float): 返回500错误的概率
+            rate_limit_rate (float): 返回429限流的概率
+            retry_after (float, optional): 429响应的 Retry-After 秒数，None表示不返回该响应头
+            stream_chunk_chars (int): 流式响应每个分片包含的字符数
+            seed (int, optional): 随机数种子，None表示不固定
+            uncertain_models (Dict[str, float], optional): 模拟能力较弱的模型 {模型名称: 比例}，
+                这些模型对该比例的文本块（按文本块内容固定选取）中的实体只给出0.5的置信度，用于测试级联识别
+            failing_models (Iterable[str], optional): 模拟故障的模型，这些模型的请求总是返回500错误，
+                用于测试初筛模型故障时的级联识别
+        """
+        self.gazetteer = dict(gazetteer or DEFAULT_GAZETTEER)
+        # 长实体优先，避免"北京市"抢占"北京市第一中级人民法院"
+        self._gazetteer_pattern = re.compile(
+            '|'.join(re.escape(span) for span in sorted(self.gazetteer, key=len, reverse=True))
+        ) if self.gazetteer else None
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+        self._rng = random.Random(seed)
+        self.uncertain_models = dict(uncertain_models or {})
+        self.failing_models = set(failing_models or ())
+        self._rng_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """服务的 api_base 地址"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'MockNERServer':
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='mock-ner-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.stats = {
+                'requests': 0, 'completed': 0, 'errors': 0, 'rate_limited': 0,
+                'packed_requests': 0, 'streamed': 0,
+                'prompt_tokens': 0, 'completion_tokens': 0,
+                'max_in_flight': 0, 'in_flight': 0,
+            }
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    def _draw(self):
+        """抽样本次请求的结果类型和基础延迟"""
+        with self._rng_lock:
+            roll = self._rng.random()
+            delay = self.latency.sample(self._rng)
+        if roll < self.rate_limit_rate:
+            return 'rate_limited', delay
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 'error', delay
+        return 'ok', delay
+
+    def find_entities(self, text: str, model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按词典查找文本中的实体
+
+        model 为 uncertain_models 中的模型时，按比例选取的文本块中的实体置信度降低。
+        比例按文本块而不是按实体计算：级联识别以文本块为单位升级，按实体计算时实体较多的
+        文本块几乎都会含有低置信度实体。
+        """
+        if self._gazetteer_pattern is None:
+            return []
+        prob = 0.5 if self._is_uncertain(text, self.uncertain_models.get(model, 0.0)) else 0.99
+        return [
+            {"span": match.group(), "type": self.gazetteer[match.group()],
+             "start": match.start(), "end": match.end(), "prob": prob}
+            for match in self._gazetteer_pattern.finditer(text)
+        ]
+
+    @staticmethod
+    def _is_uncertain(text: str, ratio: float) -> bool:
+        """按文本内容固定地选取比例为 ratio 的文本"""
+        if ratio <= 0:
+            return False
+        digest = hashlib.md5(text.encode('utf-8')).digest()
+        return int.from_bytes(digest[:4], 'big') / 2 ** 32 < ratio
+
+    @staticmethod
+    def extract_text(user_content: str) -> str:
+        """从用户消息中取出待识别文本：默认提示词中位于"文本："之后，找不到时使用整条消息"""
+        marker = user_content.find(TEXT_MARKER)
+        return user_content[marker + len(TEXT_MARKER):] if marker >= 0 else user_content
+
+    @staticmethod
+    def _compact_lines(entities: List[Dict[str, Any]], prefix: str = '') -> List[str]:
+        """紧凑格式输出，同一实体只输出一次，没有实体时输出"无" """
+        seen, lines = set(), []
+        for entity in entities:
+            key = (entity['type'], entity['span'])
+            if key not in seen:
+                seen.add(key)
+                lines.append(f"{prefix}{entity['type']}\t{entity['span']}")
+        return lines or [f"{prefix}无"]
+
+    def build_content(self, user_content: str, model: Optional[str] = None) -> str:
+        """根据用户消息生成模型输出文本"""
+        compact = COMPACT_MARKER in user_content
+        chunks = CHUNK_PATTERN.findall(user_content)
+        if chunks:
+            if compact:
+                return "\n".join(line for chunk_id, chunk_text in chunks
+                                 for line in self._compact_lines(self.find_entities(chunk_text, model), f"{chunk_id}\t"))
+            return json.dumps({chunk_id: self.find_entities(chunk_text, model) for chunk_id, chunk_text in chunks},
+                              ensure_ascii=False)
+        entities = self.find_entities(self.extract_text(user_content), model)
+        if compact:
+            return "\n".join(self._compact_lines(entities))
+        return json.dumps(entities, ensure_ascii=False)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # SSE分片很小，关闭Nagle算法避免每个分片被延迟发送
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.rstrip('/').endswith('/models'):
+                    self._send_json(200, {"object": "list", "data": [{"id": "mock-ner", "object": "model"}]})
+                elif self.path.rstrip('/') == '/stats':
+                    with server._stats_lock:
+                        self._send_json(200, dict(server.stats))
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                if self.path.rstrip('/') == '/stats/reset':
+                    server.reset_stats()
+                    self._send_json(200, {"ok": True})
+                    return
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                try:
+                    request = json.loads(raw.decode('utf-8'))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    self._send_json(400, {"error": {"message": "invalid JSON body", "type": "invalid_request_error"}})
+                    return
+
+                server._count(requests=1, in_flight=1)
+                try:
+                    self._complete(request)
+                finally:
+                    server._count(in_flight=-1)
+
+            def _complete(self, request: Dict[str, Any]):
+                outcome, delay = server._draw()
+                time.sleep(delay)
+                if outcome == 'rate_limited':
+                    server._count(rate_limited=1)
+                    headers = {'Retry-After': f"{server.retry_after:g}"} if server.retry_after is not None else {}
+                    self._send_json(429, {"error": {"message": "rate limited (mock)", "type": "rate_limit_error"}},
+                                    headers)
+                    return
+                if outcome == 'error' or request.get('model') in server.failing_models:
+                    server._count(errors=1)
+                    self._send_json(500, {"error": {"message": "internal error (mock)", "type": "server_error"}})
+                    return
+
+                messages = request.get('messages') or []
+                user_content = next((m.get('content') or '' for m in reversed(messages)
+                                     if m.get('role') == 'user'), '')
+                prompt_tokens = sum(estimate_tokens(m.get('content') or '') for m in messages)
+                content = server.build_content(user_content, request.get('model'))
+                completion_tokens = estimate_tokens(content)
+                server._count(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                              packed_requests=1 if CHUNK_PATTERN.search(user_content) else 0)
+
+                model = request.get('model', 'mock-ner')
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+                if request.get('stream'):
+                    server._count(streamed=1)
+                    self._stream(completion_id, model, content)
+                else:
+                    time.sleep(server.latency.decode_time(completion_tokens))
+                    self._send_json(200, {
+                        "id": completion_id,
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                     "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                                  "total_tokens": prompt_tokens + completion_tokens},
+                    })
+                server._count(completed=1)
+
+            def _stream(self, completion_id: str, model: str, content: str):
+                """按SSE格式分片发送响应，每个分片的发送间隔对应其token数的解码耗时"""
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+
+                def send_event(delta: Dict[str, Any], finish_reason=None):
+                    event = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": model,
+                             "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+                    self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+
+                send_event({"role": "assistant", "content": ""})
+                step = server.stream_chunk_chars
+                for i in range(0, len(content), step):
+                    piece = content[i:i + step]
+                    time.sleep(server.latency.decode_time(estimate_tokens(piece)))
+                    send_event({"content": piece})
+                send_event({}, finish_reason="stop")
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟NER服务（OpenAI兼容接口）")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--gazetteer', help="实体词典JSON文件，格式为 {实体文本: 实体类型}")
+    parser.add_argument('--latency-dist', default='fixed', choices=LatencyModel.DISTRIBUTIONS)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="基础延迟均值（毫秒）")
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help="lognormal/pareto 的长尾程度")
+    parser.add_argument('--per-token-ms', type=float, default=0.0, help="每个输出token的解码耗时（毫秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回500错误的概率")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="返回429限流的概率")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="429响应的Retry-After秒数，负数表示不返回")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--uncertain-model', action='append', default=[], metavar='NAME=RATIO',
+                        help="模拟能力较弱的模型，该比例的文本块中的实体只给出0.5的置信度，可重复指定")
+    parser.add_argument('--failing-model', action='append', default=[], metavar='NAME',
+                        help="模拟故障的模型，该模型的请求总是返回500错误，可重复指定")
+    args = parser.parse_args()
+
+    gazetteer = None
+    if args.gazetteer:
+        with open(args.gazetteer, 'r', encoding='utf-8') as f:
+            gazetteer = json.load(f)
+
+    server = MockNERServer(
+        host=args.host, port=args.port, gazetteer=gazetteer,
+        latency=LatencyModel(args.latency_dist, args.latency_ms, args.latency_sigma, args.per_token_ms),
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after if args.retry_after >= 0 else None, seed=args.seed,
+        uncertain_models={name: float(ratio) for name, ratio in
+                          (item.split('=', 1) for item in args.uncertain_model)},
+        failing_models=args.failing_model
+    )
+    print(f"模拟NER服务已启动: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("模拟NER服务已停止")
+
+
+if __name__ == "__main__":
+    main()
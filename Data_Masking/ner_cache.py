@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# NER结果缓存 - 以文本内容哈希为键的持久化缓存
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class NERResultCache:
+    """NER结果的磁盘缓存（基于SQLite）
+
+    缓存键由文本块内容、模型名称、提示词模板和temperature共同计算哈希得到，
+    任意一项变化都会使旧缓存失效。支持按条目数和存活时间淘汰，并统计命中/未命中次数。
+    """
+
+    def __init__(self, cache_path: str, max_entries: int = 100000,
+                 max_age_seconds: Optional[float] = 30 * 24 * 3600,
+                 prune_interval: int = 200):
+        """
+        参数:
+            cache_path (str): 缓存数据库文件路径
+            max_entries (int): 最多保留的缓存条目数，超出时淘汰最久未访问的条目
+            max_age_seconds (float, optional): 缓存条目的最长存活时间（秒），None表示永不过期
+            prune_interval (int): 每写入多少条记录执行一次淘汰检查
+        """
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.prune_interval = max(1, prune_interval)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts_since_prune = 0
+
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ner_cache ("
+            "key TEXT PRIMARY KEY, "
+            "value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ner_cache_accessed ON ner_cache (accessed_at)"
+        )
+        self._conn.commit()
+        self._prune()
+
+    @staticmethod
+    def make_key(text: str, model_name: str, system_prompt: str,
+                 user_prompt: str, temperature: float) -> str:
+        """根据文本块和模型调用参数计算缓存键"""
+        payload = json.dumps(
+            [text, model_name, system_prompt, user_prompt, temperature],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """查询缓存，未命中或已过期时返回None
+
+        每次命中都返回新反序列化的实体列表，调用方可以放心修改。
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM ner_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None and self._is_expired(row[1], now):
+                self._conn.execute("DELETE FROM ner_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE ner_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(row[0])
+
+    def put(self, key: str, entities: List[Dict[str, Any]]):
+        """写入缓存"""
+        now = time.time()
+        value = json.dumps(entities, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ner_cache (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._conn.commit()
+            self._puts_since_prune += 1
+            if self._puts_since_prune >= self.prune_interval:
+                self._prune_locked()
+
+    def clear(self):
+        """清空缓存及统计信息"""
+        with self._lock:
+            self._conn.execute("DELETE FROM ner_cache")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计信息"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM ner_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': entries,
+            'evictions': self.evictions,
+        }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.max_age_seconds is not None and now - created_at > self.max_age_seconds
+
+    def _prune(self):
+        with self._lock:
+            self._prune_locked()
+
+    def _prune_locked(self):
+        """淘汰过期条目，并在超出容量时淘汰最久未访问的条目（调用方需持有锁）"""
+        self._puts_since_prune = 0
+        removed = 0
+
+        if self.max_age_seconds is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM ner_cache WHERE created_at < ?",
+                (time.time() - self.max_age_seconds,)
+            )
+            removed += cursor.rowcount
+
+        if self.max_entries is not None and self.max_entries > 0:
+            count = self._conn.execute("SELECT COUNT(*) FROM ner_cache").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                cursor = self._conn.execute(
+                    "DELETE FROM ner_cache WHERE key IN ("
+                    "SELECT key FROM ner_cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,)
+                )
+                removed += cursor.rowcount
+
+        if removed:
+            self._conn.commit()
+            self.evictions += removed
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 级联NER - 先用低成本模型初筛每个文本块，只有结果不确定的文本块才交给大模型
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from Data_Masking.ner_resilience import RemoteNERError
+from Data_Masking.regex_detectors import find_regex_entities
+
+logger = logging.getLogger(__name__)
+
+# 参与"正则与初筛结果是否一致"判断的正则类型：格式固定、模型也应当识别出的敏感信息
+DEFAULT_CHECK_REGEX_TYPES = ("PHONE", "ID", "BANK", "EMAIL", "IP")
+
+
+class NERCascade:
+    """两级级联实体识别
+
+    每个文本块先由初筛模型识别，出现以下情况之一时升级到主模型重新识别：
+    - 初筛结果中有置信度低于 confidence_threshold 的实体
+    - 正则检测到的实体（手机号、身份证号等）没有被初筛结果覆盖
+    - 初筛调用失败（初筛模型熔断时同样升级；主模型的错误照常抛出）
+    升级的文本块以主模型结果为准，并补充初筛结果中不与其重叠的高置信度实体。
+    """
+
+    def __init__(self, screen_model, main_model, confidence_threshold: float = 0.8,
+                 check_regex_types: Sequence[str] = DEFAULT_CHECK_REGEX_TYPES):
+        """
+        参数:
+            screen_model: 初筛模型，需提供 process_texts / aprocess_texts
+            main_model: 主模型，需提供 process_texts / aprocess_texts
+            confidence_threshold (float): 初筛实体的最低置信度，低于该值的文本块升级
+            check_regex_types (Sequence[str]): 用于比对的正则实体类型，为空时不比对
+        """
+        self.screen_model = screen_model
+        self.main_model = main_model
+        self.confidence_threshold = confidence_threshold
+        self.check_regex_types = tuple(check_regex_types or ())
+        self._lock = threading.Lock()
+        self._stats = {'screened': 0, 'escalated': 0, 'low_confidence': 0,
+                       'regex_disagreement': 0, 'screen_failed': 0}
+
+    def _escalation_reason(self, text: str, entities: List[Dict[str, Any]]) -> Optional[str]:
+        """判断文本块是否需要升级到主模型，返回升级原因，不需要时返回None"""
+        if any(entity.get('prob', 0) < self.confidence_threshold for entity in entities):
+            return 'low_confidence'
+
+        if self.check_regex_types:
+            for regex_entity in find_regex_entities(text, types=self.check_regex_types):
+                covered = any(
+                    entity.get('start', -1) < regex_entity['end'] and regex_entity['start'] < entity.get('end', -1)
+                    for entity in entities
+                )
+                if not covered:
+                    return 'regex_disagreement'
+        return None
+
+    def _merge(self, screen_entities: List[Dict[str, Any]],
+               main_entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """以主模型结果为准，补充初筛结果中不与主模型实体重叠的高置信度实体"""
+        merged = list(main_entities)
+        for entity in screen_entities:
+            if entity.get('prob', 0) < self.confidence_threshold:
+                continue
+            overlaps = any(
+                entity['start'] < other['end'] and other['start'] < entity['end']
+                for other in main_entities
+            )
+            if not overlaps:
+                merged.append(entity)
+        return merged
+
+    def _plan(self, texts: List[str], screen_results: Optional[List[Dict[str, Any]]]) -> List[int]:
+        """根据初筛结果确定需要升级的文本块序号，并更新统计"""
+        with self._lock:
+            self._stats['screened'] += len(texts)
+            if screen_results is None:
+                self._stats['screen_failed'] += len(texts)
+                self._stats['escalated'] += len(texts)
+                return list(range(len(texts)))
+
+            escalate = []
+            for i, (text, result) in enumerate(zip(texts, screen_results)):
+                reason = self._escalation_reason(text, result.get('output', []))
+                if reason is not None:
+                    self._stats[reason] += 1
+                    escalate.append(i)
+            self._stats['escalated'] += len(escalate)
+            return escalate
+
+    def _combine(self, screen_results: Optional[List[Dict[str, Any]]], escalate: List[int],
+                 main_results: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+        results = list(screen_results) if screen_results is not None else [{'output': []} for _ in range(count)]
+        for i, main_result in zip(escalate, main_results):
+            results[i] = {'output': self._merge(results[i].get('output', []), main_result.get('output', []))}
+        return results
+
+    @staticmethod
+    def _screen_failed(error: Exception):
+        logger.warning("级联初筛失败，全部文本块交给主模型处理: %s: %s", type(error).__name__, error)
+
+    def process_texts(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """级联识别一组文本块，按输入顺序返回结果"""
+        try:
+            screen_results = self.screen_model.process_texts(texts)
+        except RemoteNERError as e:
+            self._screen_failed(e)
+            screen_results = None
+
+        escalate = self._plan(texts, screen_results)
+        main_results = self.main_model.process_texts([texts[i] for i in escalate]) if escalate else []
+        return self._combine(screen_results, escalate, main_results, len(texts))
+
+    async def aprocess_texts(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """process_texts 的异步版本"""
+        try:
+            screen_results = await self.screen_model.aprocess_texts(texts)
+        except RemoteNERError as e:
+            self._screen_failed(e)
+            screen_results = None
+
+        escalate = self._plan(texts, screen_results)
+        main_results = await self.main_model.aprocess_texts([texts[i] for i in escalate]) if escalate else []
+        return self._combine(screen_results, escalate, main_results, len(texts))
+
+    def stats(self) -> Dict[str, Any]:
+        """返回初筛和升级统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['escalation_rate'] = stats['escalated'] / stats['screened'] if stats['screened'] else 0.0
+        return stats
+
+
+def create_ner_cascade(main_model, config: Dict[str, Any]) -> Optional[NERCascade]:
+    """根据 config.json 中的 cascade_config 创建级联识别器，未启用时返回None
+
+    初筛模型通过 main_model.with_model_config 创建，cascade_config.screen_model_config
+    中的配置项（model_name、api_base、endpoints 等）覆盖 model_config 中的同名项。
+    """
+    cascade_config = config.get('cascade_config', {})
+    if not cascade_config.get('enabled', False):
+        return None
+
+    screen_overrides = cascade_config.get('screen_model_config') or {}
+    if not screen_overrides.get('model_name'):
+        logger.warning("级联识别未配置 screen_model_config.model_name，不启用级联")
+        return None
+
+    return NERCascade(
+        screen_model=main_model.with_model_config(screen_overrides),
+        main_model=main_model,
+        confidence_threshold=cascade_config.get('confidence_threshold', 0.8),
+        check_regex_types=cascade_config.get('check_regex_types', DEFAULT_CHECK_REGEX_TYPES)
+    )
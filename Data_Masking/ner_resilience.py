@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 远程NER调用的容错组件 - 限流、重试与退避、熔断
+
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteNERError(RuntimeError):
+    """远程NER调用失败（重试次数耗尽或遇到不可重试的错误）"""
+
+
+class CircuitOpenError(RemoteNERError):
+    """熔断器处于打开状态，请求未发送即失败"""
+
+
+class TokenBucket:
+    """令牌桶
+
+    采用预约方式：reserve 立即扣除令牌并返回需要等待的秒数，
+    令牌余额允许为负，后续请求会相应排队等待，因此同步和异步调用方都可以使用。
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        参数:
+            rate_per_minute (float): 每分钟补充的令牌数
+            capacity (float, optional): 桶容量（允许的突发量），默认等于每分钟令牌数
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """预约令牌，返回调用方需要等待的秒数"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def try_reserve(self, amount: float = 1.0) -> bool:
+        """令牌充足时扣除并返回True，否则不扣除并返回False"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens < amount:
+                return False
+            self.tokens -= amount
+            return True
+
+    def refund(self, amount: float):
+        """归还（amount为负时追加扣除）令牌，用于按实际用量修正预估值"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """按每分钟请求数和每分钟token数限流，任一项为0或未配置表示不限制"""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """为一次请求预约配额，返回需要等待的秒数"""
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.reserve(estimated_tokens))
+        return wait
+
+    def try_reserve(self, estimated_tokens: int) -> bool:
+        """不等待地预约配额（用于可选的额外请求，如对冲请求），配额不足时返回False"""
+        if self.request_bucket is not None and not self.request_bucket.try_reserve(1):
+            return False
+        if self.token_bucket is not None and not self.token_bucket.try_reserve(estimated_tokens):
+            if self.request_bucket is not None:
+                self.request_bucket.refund(1)
+            return False
+        return True
+
+    def release(self, estimated_tokens: int):
+        """撤销一次预约（请求未发出，或请求失败、没有消耗服务端配额）"""
+        if self.request_bucket is not None:
+            self.request_bucket.refund(1)
+        if self.token_bucket is not None:
+            self.token_bucket.refund(estimated_tokens)
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """请求完成后按实际token用量修正预约量"""
+        if self.token_bucket is not None and actual_tokens is not None:
+            self.token_bucket.refund(estimated_tokens - actual_tokens)
+
+
+class RetryPolicy:
+    """指数退避 + 随机抖动的重试策略，优先遵循服务端返回的 Retry-After"""
+
+    # 可重试的HTTP状态码：请求超时、冲突、限流和服务端错误
+    RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+    def __init__(self, max_retries: int = 5, backoff_base: float = 1.0, backoff_max: float = 60.0):
+        """
+        参数:
+            max_retries (int): 最大重试次数（不含首次请求）
+            backoff_base (float): 首次重试的基准等待秒数，之后每次翻倍
+            backoff_max (float): 单次等待的最大秒数
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def is_retryable(self, error: Exception) -> bool:
+        """判断错误是否值得重试"""
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        status_code = getattr(error, 'status_code', None)
+        if status_code is None:
+            return False
+        return status_code in self.RETRYABLE_STATUS_CODES or status_code >= 500
+
+    @staticmethod
+    def get_retry_after(error: Exception) -> Optional[float]:
+        """从错误响应头中读取 Retry-After（秒），不存在时返回None"""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+        if not headers:
+            return None
+
+        retry_after_ms = headers.get('retry-after-ms')
+        if retry_after_ms:
+            try:
+                return float(retry_after_ms) / 1000.0
+            except ValueError:
+                pass
+
+        retry_after = headers.get('retry-after')
+        if not retry_after:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+
+        # Retry-After 也可能是HTTP日期格式
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, retry_at.timestamp() - time.time())
+
+    def compute_delay(self, attempt: int, error: Exception) -> float:
+        """计算第 attempt 次（从0开始）失败后的等待秒数"""
+        retry_after = self.get_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # full jitter：在 [0, base * 2^attempt] 内随机取值
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """熔断器
+
+    - 关闭：正常放行，连续失败达到 failure_threshold 次后打开
+    - 打开：直接拒绝请求（抛出 CircuitOpenError），经过 recovery_seconds 秒后进入半开
+    - 半开：放行一个探测请求，成功则关闭，失败则重新打开，结果不能说明服务是否可用时（如参数错误）
+      保持半开并放行下一个探测请求；探测请求超过 recovery_seconds 秒未结束时允许发送新的探测请求
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, recovery_seconds: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_seconds = recovery_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = None
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """判断当前是否允许发送请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now - self.opened_at < self.recovery_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self.probe_started_at = None
+            # 半开状态只放行一个探测请求
+            if self.probe_started_at is not None and now - self.probe_started_at < self.recovery_seconds:
+                return False
+            self.probe_started_at = now
+            return True
+
+    def check(self):
+        """不允许发送请求时抛出 CircuitOpenError"""
+        if not self.allow_request():
+            raise CircuitOpenError(
+                f"远程NER服务熔断中（连续失败{self.consecutive_failures}次），"
+                f"{self.retry_in():.0f}秒后尝试恢复"
+            )
+
+    def retry_in(self) -> float:
+        """距离下一次允许探测的秒数"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0.0
+            started = self.opened_at if self.state == self.OPEN else (self.probe_started_at or 0.0)
+            return max(0.0, started + self.recovery_seconds - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.warning("熔断恢复: 远程NER服务探测成功，恢复正常调用")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.probe_started_at = None
+
+    def record_inconclusive(self):
+        """请求结果不能说明服务是否可用（如参数错误）：不改变熔断状态，半开时让出探测名额"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.probe_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.probe_started_at = None
+                logger.warning("熔断打开: 远程NER服务连续失败%d次，%.0f秒内不再发送请求",
+                               self.consecutive_failures, self.recovery_seconds)
+
+    @property
+    def is_open(self) -> bool:
+        """熔断器是否处于打开或半开状态"""
+        with self._lock:
+            return self.state != self.CLOSED
+
+
+def create_rate_limiter(config: Dict[str, Any]) -> RateLimiter:
+    """根据 config.json 中的 rate_limit_config 创建限流器"""
+    rate_limit_config = config.get('rate_limit_config', {})
+    return RateLimiter(
+        requests_per_minute=rate_limit_config.get('requests_per_minute', 0),
+        tokens_per_minute=rate_limit_config.get('tokens_per_minute', 0)
+    )
+
+
+def create_retry_policy(config: Dict[str, Any]) -> RetryPolicy:
+    """根据 config.json 中的 rate_limit_config 创建重试策略"""
+    rate_limit_config = config.get('rate_limit_config', {})
+    return RetryPolicy(
+        max_retries=rate_limit_config.get('max_retries', 5),
+        backoff_base=rate_limit_config.get('backoff_base', 1.0),
+        backoff_max=rate_limit_config.get('backoff_max', 60.0)
+    )
+
+
+def create_circuit_breaker(config: Dict[str, Any]) -> Optional[CircuitBreaker]:
+    """根据 config.json 中的 circuit_breaker_config 创建熔断器，显式禁用时返回None"""
+    breaker_config = config.get('circuit_breaker_config', {})
+    if not breaker_config.get('enabled', True):
+        return None
+    return CircuitBreaker(
+        failure_threshold=breaker_config.get('failure_threshold', 5),
+        recovery_seconds=breaker_config.get('recovery_seconds', 30.0)
+    )
@@ -1,18 +1,81 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import asyncio
+import concurrent.futures
 import json
+import logging
 import os
 import re
 import threading
-from typing import Dict, List, Any, Optional
+import time
+import weakref
+from collections import Counter
+from typing import AsyncIterator, Dict, Iterator, List, Any, Optional, Tuple
 import requests
-from openai import OpenAI
 
-
-class RemoteNERModel:
+from Data_Masking.backends.base import NERBackend
+from Data_Masking.backends.registry import get_backend, load_config
+from Data_Masking.endpoint_pool import FAILURE, INCONCLUSIVE, EndpointPool
+from Data_Masking.execution_settings import ExecutionSettings, resolve_execution_settings
+from Data_Masking.instrumentation import log_event, preview, sensitive_text_enabled
+from Data_Masking.entity_stream_parser import (
+    EMPTY_MARKERS, IncrementalCompactParser, IncrementalEntityParser,
+    looks_like_json, parse_compact_entities, split_compact_line
+)
+from Data_Masking.ner_cache import NERResultCache
+from Data_Masking.ner_cascade import create_ner_cascade
+from Data_Masking.ner_resilience import (
+    CircuitOpenError, RemoteNERError, create_circuit_breaker, create_rate_limiter, create_retry_policy
+)
+from Data_Masking.request_hedging import create_request_hedger
+from Data_Masking.scheduler import POOL_IO, POOL_NER, get_scheduler
+from Data_Masking.span_locator import align_entities
+from Data_Masking.text_chunker import (
+    TextChunker, deduplicate_chunks, expand_chunk_entities, merge_chunk_entities
+)
+
+logger = logging.getLogger(__name__)
+
+
+# 多块打包请求的默认用户提示词模板，{chunks} 会被替换为带编号的文本块
+DEFAULT_PACKED_USER_PROMPT = (
+    "下面有多个用<chunk id=\"编号\">标签包裹的文本块，请分别识别每个文本块中的实体信息。\n\n"
+    "{chunks}\n\n"
+    "要求：\n"
+    "1. 返回一个JSON对象，键为文本块编号（字符串），值为该文本块的实体数组，没有实体时为空数组\n"
+    "2. 每个实体包含字段：span(实体文本), type(实体类型), start(起始位置), end(结束位置), prob(置信度0-1)\n"
+    "3. start和end是实体在其所属文本块内的字符位置索引，不包括标签本身\n"
+    "4. 只返回JSON对象，不要其他说明"
+)
+
+# 紧凑输出格式（ner_config.response_format = "compact"）的默认用户提示词：
+# 每行只输出类型和实体文本，位置在本地计算，输出token数远少于JSON格式
+DEFAULT_COMPACT_USER_PROMPT = (
+    "请识别以下文本中的实体信息。\n\n"
+    "文本：{text}\n\n"
+    "要求：\n"
+    "1. 每行输出一个实体，格式为：实体类型<Tab>实体文本\n"
+    "2. 实体文本必须与原文完全一致，同一实体只输出一次\n"
+    "3. 没有实体时只输出：无\n"
+    "4. 不要输出位置、置信度、编号或其他说明"
+)
+
+DEFAULT_COMPACT_PACKED_USER_PROMPT = (
+    "下面有多个用<chunk id=\"编号\">标签包裹的文本块，请分别识别每个文本块中的实体信息。\n\n"
+    "{chunks}\n\n"
+    "要求：\n"
+    "1. 每行输出一个实体，格式为：文本块编号<Tab>实体类型<Tab>实体文本\n"
+    "2. 实体文本必须与原文完全一致，同一文本块内的同一实体只输出一次\n"
+    "3. 没有实体的文本块输出一行：文本块编号<Tab>无\n"
+    "4. 不要输出位置、置信度或其他说明"
+)
+
+
+class RemoteNERModel(NERBackend):
     """远程NER模型调用类，支持OpenAI兼容API和vLLM"""
 
+    name = 'remote'
     _instance = None
     _lock = threading.Lock()
     _initialized = False
@@ -28,42 +91,117 @@ class RemoteNERModel:
             with self._lock:
                 if not self._initialized:
                     self.config = self._load_config()
-                    self.client = self._init_client()
+                    self.endpoint_pool = self._init_endpoint_pool()
+                    # 兼容旧接口：client 指向第一个端点的客户端
+                    self.client = self.endpoint_pool.endpoints[0].client
+                    self.cache = self._init_cache()
+                    self.rate_limiter = create_rate_limiter(self.config)
+                    self.retry_policy = create_retry_policy(self.config)
+                    self.hedger = create_request_hedger(self.config)
+                    self._hedge_executor = None
+                    # 异步并发信号量按事件循环创建，见 _get_async_semaphore
+                    self._async_semaphores = weakref.WeakKeyDictionary()
+                    self._async_lock = threading.Lock()
+                    # 熔断器按 (模型名称, 端点) 创建，与模型视图共享，见 _get_circuit_breaker
+                    self._circuit_breakers: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+                    self.circuit_breaker = self._get_circuit_breaker()
+                    # 级联识别器（初筛模型 + 当前模型），未启用时为None
+                    self.cascade = None
+                    self.cascade = create_ner_cascade(self, self.config)
                     self._initialized = True
 
+    @classmethod
+    def reset_instance(cls):
+        """丢弃当前单例，下次创建时重新读取配置（用于基准测试等需要切换配置的场景）"""
+        with cls._lock:
+            cls._instance = None
+            cls._initialized = False
+
     def _load_config(self) -> Dict[str, Any]:
-        """加载配置文件"""
-        config_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-            'config.json'
-        )
+        """加载配置文件，环境变量 DATA_MASKING_CONFIG 可指定其他配置文件路径"""
+        return load_config()
 
-        if not os.path.exists(config_path):
-            raise FileNotFoundError(
-                f"配置文件不存在: {config_path}\n"
-                "请创建config.json文件并配置远程模型信息"
+    def _init_endpoint_pool(self) -> EndpointPool:
+        """初始化端点池，model_config.endpoints 未配置时只包含 api_base 一个端点"""
+        model_config = self.config.get('model_config', {})
+        endpoint_pool = EndpointPool.from_config(model_config)
+
+        logger.info("初始化远程NER模型，API地址: %s",
+                    ', '.join(endpoint.api_base for endpoint in endpoint_pool.endpoints))
+
+        return endpoint_pool
+
+    def _get_circuit_breaker(self):
+        """返回当前模型和端点对应的熔断器，未启用熔断时返回None
+
+        同一模型、同一组端点共用一个熔断器；级联初筛等使用其他模型的视图有各自的熔断器，
+        初筛模型故障不会让主模型熔断。
+        """
+        model_name = self.config.get('model_config', {}).get('model_name', 'gpt-3.5-turbo')
+        key = (model_name, tuple(endpoint.api_base for endpoint in self.endpoint_pool.endpoints))
+        with self._async_lock:
+            if key not in self._circuit_breakers:
+                self._circuit_breakers[key] = create_circuit_breaker(self.config)
+            return self._circuit_breakers[key]
+
+    def get_endpoint_stats(self) -> List[Dict[str, Any]]:
+        """返回各端点的在途请求数、失败次数、摘除状态和延迟统计"""
+        return self.endpoint_pool.stats()
+
+    def _init_cache(self) -> Optional[NERResultCache]:
+        """初始化NER结果缓存，未启用时返回None"""
+        cache_config = self.config.get('cache_config', {})
+        if not cache_config.get('enabled', False):
+            return None
+
+        cache_path = cache_config.get('cache_path', os.path.join('cache', 'ner_cache.sqlite3'))
+        if not os.path.isabs(cache_path):
+            cache_path = os.path.join(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                cache_path
             )
 
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        max_age_days = cache_config.get('max_age_days', 30)
+        try:
+            cache = NERResultCache(
+                cache_path,
+                max_entries=cache_config.get('max_entries', 100000),
+                max_age_seconds=max_age_days * 24 * 3600 if max_age_days else None
+            )
+        except Exception as e:
+            logger.warning("初始化NER结果缓存失败，将不使用缓存: %s", e)
+            return None
 
-        return config
+        logger.info("NER结果缓存: %s", cache_path)
+        return cache
 
-    def _init_client(self) -> OpenAI:
-        """初始化OpenAI客户端"""
+    def _cache_key(self, text: str, packed: bool = False) -> str:
+        """计算文本块对应的缓存键，packed表示结果来自多块打包请求"""
         model_config = self.config.get('model_config', {})
+        prompt_template = self.config.get('prompt_template', {})
+        user_prompt = self._get_packed_prompt_template() if packed else self._get_user_prompt_template()
+        return NERResultCache.make_key(
+            text,
+            model_config.get('model_name', 'gpt-3.5-turbo'),
+            prompt_template.get('system_prompt', ''),
+            user_prompt,
+            model_config.get('temperature', 0.1)
+        )
 
-        api_base = model_config.get('api_base', 'http://localhost:8000/v1')
-        api_key = model_config.get('api_key', 'dummy-key')
+    def get_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """返回NER结果缓存的命中统计，未启用缓存时返回None"""
+        return self.cache.stats() if self.cache else None
 
-        print(f"初始化远程NER模型...")
-        print(f"API地址: {api_base}")
+    def _compact_format(self) -> bool:
+        """是否使用紧凑输出格式（每行 "类型<Tab>实体文本"），默认使用JSON格式"""
+        return self.config.get('ner_config', {}).get('response_format', 'json') == 'compact'
 
-        return OpenAI(
-            base_url=api_base,
-            api_key=api_key,
-            timeout=model_config.get('timeout', 60)
-        )
+    def _get_user_prompt_template(self) -> str:
+        """获取逐块请求的用户提示词模板，紧凑格式使用 compact_user_prompt"""
+        prompt_template = self.config.get('prompt_template', {})
+        if self._compact_format():
+            return prompt_template.get('compact_user_prompt', DEFAULT_COMPACT_USER_PROMPT)
+        return prompt_template.get('user_prompt', '请识别以下文本中的实体信息：\n\n{text}')
 
     def _build_prompt(self, text: str) -> List[Dict[str, str]]:
         """构建提示词"""
@@ -72,21 +210,135 @@ class RemoteNERModel:
             'system_prompt',
             '你是一个专业的命名实体识别助手。'
         )
-        user_prompt_template = prompt_template.get(
-            'user_prompt',
-            '请识别以下文本中的实体信息：\n\n{text}'
-        )
 
-        user_prompt = user_prompt_template.format(text=text)
+        user_prompt = self._get_user_prompt_template().format(text=text)
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _get_packed_prompt_template(self) -> str:
+        """获取多块打包请求的用户提示词模板"""
+        prompt_template = self.config.get('prompt_template', {})
+        if self._compact_format():
+            return prompt_template.get('packed_compact_user_prompt', DEFAULT_COMPACT_PACKED_USER_PROMPT)
+        return prompt_template.get('packed_user_prompt', DEFAULT_PACKED_USER_PROMPT)
+
+    def _build_packed_prompt(self, texts: List[str]) -> List[Dict[str, str]]:
+        """构建多块打包请求的提示词，每个文本块用带编号的 <chunk> 标签包裹"""
+        prompt_template = self.config.get('prompt_template', {})
+        system_prompt = prompt_template.get(
+            'system_prompt',
+            '你是一个专业的命名实体识别助手。'
+        )
+        chunks = '\n'.join(
+            f'<chunk id="{i}">\n{text}\n</chunk>' for i, text in enumerate(texts)
+        )
+        user_prompt = self._get_packed_prompt_template().format(chunks=chunks)
 
         return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ]
 
-    def _parse_response(self, response_text: str, text: str) -> List[Dict[str, Any]]:
-        """解析模型响应，提取实体信息"""
+    @staticmethod
+    def _validate_entities(entities: List[Any], text: str) -> List[Dict[str, Any]]:
+        """验证和修正实体信息
+
+        所有实体文本一次扫描原文完成定位：模型给出的位置与原文一致时保留，
+        缺失或不符时改用最近的实际出现位置，原文中不存在的实体被丢弃。
+        """
+        valid_entities = []
+        for entity in entities:
+            if isinstance(entity, dict) and 'span' in entity and 'type' in entity:
+                # 确保有置信度
+                if 'prob' not in entity:
+                    entity['prob'] = 0.95
+                valid_entities.append(entity)
+
+        return align_entities(valid_entities, text)
+
+    def _parse_packed_response(self, response_text: str,
+                               texts: List[str]) -> List[Optional[List[Dict[str, Any]]]]:
+        """解析多块打包请求的响应，按文本块编号拆分实体
+
+        返回与 texts 等长的列表，实体位置均相对于各自的文本块；
+        响应中缺少的文本块对应位置为None，由调用方单独重试。
+        JSON解析失败时抛出 json.JSONDecodeError。
+        """
+        if self._compact_format() and not looks_like_json(response_text):
+            return self._parse_packed_compact_response(response_text, texts)
+
+        json_match = re.search(r'\{[\s\S]*\}', response_text)
+        data = json.loads(json_match.group() if json_match else response_text)
+
+        # 兼容 [{"id": 0, "entities": [...]}, ...] 形式的响应
+        if isinstance(data, list):
+            data = {
+                str(item.get('id')): item.get('entities', [])
+                for item in data if isinstance(item, dict)
+            }
+        if not isinstance(data, dict):
+            raise json.JSONDecodeError("打包响应不是JSON对象", response_text, 0)
+
+        results = []
+        for i, text in enumerate(texts):
+            entities = data.get(str(i))
+            if not isinstance(entities, list):
+                results.append(None)
+                continue
+            results.append(self._validate_entities(entities, text))
+        return results
+
+    def _parse_packed_compact_response(self, response_text: str,
+                                       texts: List[str]) -> List[Optional[List[Dict[str, Any]]]]:
+        """解析紧凑格式的打包响应，每行为 "编号<Tab>类型<Tab>实体文本" 或 "编号<Tab>无" """
+        answered: Dict[str, List[Dict[str, Any]]] = {}
+        for line in response_text.splitlines():
+            fields = split_compact_line(line, 2)
+            if fields is None:
+                continue
+            chunk_id, rest = fields
+            chunk_entities = answered.setdefault(chunk_id, [])
+            entity_fields = split_compact_line(rest, 2)
+            if entity_fields is not None:
+                chunk_entities.append({"type": entity_fields[0], "span": entity_fields[1]})
+
+        if not answered and response_text.strip():
+            raise json.JSONDecodeError("无法解析的紧凑格式打包响应", response_text, 0)
+
+        return [
+            self._validate_entities(answered[str(i)], text) if str(i) in answered else None
+            for i, text in enumerate(texts)
+        ]
+
+    @staticmethod
+    def _parse_compact_response(response_text: str) -> List[Dict[str, Any]]:
+        """解析紧凑格式响应，既没有实体行也没有"无"标记时视为解析失败"""
+        entities = parse_compact_entities(response_text)
+        if not entities:
+            lines = [line.strip().strip('`').strip() for line in response_text.splitlines()]
+            lines = [line for line in lines if line]
+            if lines and not any(line.lower() in EMPTY_MARKERS for line in lines):
+                raise json.JSONDecodeError("无法解析的紧凑格式响应", response_text, 0)
+        return entities
+
+    def _parse_response(self, response_text: str, text: str,
+                        raise_on_error: bool = False) -> List[Dict[str, Any]]:
+        """解析模型响应，提取实体信息
+
+        紧凑格式下优先按行解析，响应为JSON时回退到JSON解析。
+
+        参数:
+            response_text (str): 模型返回的文本
+            text (str): 原始输入文本
+            raise_on_error (bool): 解析失败时是否抛出 json.JSONDecodeError，默认为False（返回空列表）
+        """
         try:
+            if self._compact_format() and not looks_like_json(response_text):
+                return self._validate_entities(self._parse_compact_response(response_text), text)
+
             # 尝试提取JSON数组
             json_match = re.search(r'\[[\s\S]*\]', response_text)
             if json_match:
@@ -96,299 +348,895 @@ class RemoteNERModel:
                 entities = json.loads(response_text)
 
             # 验证和修正实体信息
-            valid_entities = []
-            for entity in entities:
-                if isinstance(entity, dict) and 'span' in entity and 'type' in entity:
-                    # 如果缺少位置信息，尝试查找
-                    if 'start' not in entity or 'end' not in entity:
-                        start = text.find(entity['span'])
-                        if start != -1:
-                            entity['start'] = start
-                            entity['end'] = start + len(entity['span'])
-                        else:
-                            continue
-
-                    # 确保有置信度
-                    if 'prob' not in entity:
-                        entity['prob'] = 0.95
-
-                    valid_entities.append(entity)
-
-            return valid_entities
+            return self._validate_entities(entities, text)
 
         except json.JSONDecodeError as e:
-            print(f"JSON解析失败: {e}")
-            print(f"响应内容: {response_text}")
+            log_event(logger, logging.WARNING, 'ner.parse_error', f"响应解析失败: {e}",
+                      response_chars=len(response_text), response_preview=preview(response_text, 500))
+            if raise_on_error:
+                raise
             return []
 
-    def process_text(self, text: str) -> Dict[str, Any]:
-        """处理单个文本，返回NER结果"""
-        model_config = self.config.get('model_config', {})
+    def _lookup_cache(self, text: str, packed: bool = False):
+        """查询缓存，返回 (缓存键, 缓存的实体列表或None)"""
+        if self.cache is None:
+            return None, None
+        cache_key = self._cache_key(text, packed)
+        return cache_key, self.cache.get(cache_key)
 
-        messages = self._build_prompt(text)
-        
-        # 记录调用参数
+    def _build_api_params(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """构建API调用参数"""
+        model_config = self.config.get('model_config', {})
         model_name = model_config.get('model_name', 'gpt-3.5-turbo')
-        temperature = model_config.get('temperature', 0.1)
-        max_tokens = model_config.get('max_tokens', 4096)
-        
-        print("=" * 80)
-        print("【远程模型调用】开始")
-        print(f"模型名称: {model_name}")
-        print(f"Temperature: {temperature}")
-        print(f"Max Tokens: {max_tokens}")
-        print(f"输入文本长度: {len(text)} 字符")
-        print(f"输入文本预览: {text[:200]}{'...' if len(text) > 200 else ''}")
-        print("-" * 80)
-        print("提示词消息:")
-        for i, msg in enumerate(messages):
-            print(f"  [{i+1}] {msg['role']}: {msg['content'][:150]}{'...' if len(msg['content']) > 150 else ''}")
-        print("-" * 80)
+
+        api_params = {
+            "model": model_name,
+            "messages": messages,
+            "temperature": model_config.get('temperature', 0.1),
+            "max_tokens": model_config.get('max_tokens', 4096)
+        }
+
+        # 对于支持 enable_thinking 的模型（如通义千问），在非流式调用时必须设置为 false
+        # 参考：https://help.aliyun.com/zh/model-studio/developer-reference/use-qwen-by-calling-api
+        if 'qwen' in model_name.lower():
+            api_params["extra_body"] = {"enable_thinking": False}
+
+        return api_params
+
+    def _log_request(self, text: str, api_params: Dict[str, Any]):
+        """记录调用参数（DEBUG级别、按采样率记录，原文默认只记录长度）"""
+        log_event(logger, logging.DEBUG, 'ner.request', sampled=True,
+                  model=api_params['model'], temperature=api_params['temperature'],
+                  max_tokens=api_params['max_tokens'], stream=bool(api_params.get('stream')),
+                  chunk_chars=len(text), prompt_chars=sum(len(msg['content']) for msg in api_params['messages']),
+                  text_preview=preview(text, 200))
+
+    def _log_failure(self, error: Exception):
+        """记录调用失败信息"""
+        log_event(logger, logging.ERROR, 'ner.failure', f"远程模型调用失败: {type(error).__name__}: {error}",
+                  error_type=type(error).__name__)
+
+    def _handle_response(self, response_text: str, text: str,
+                         cache_key: Optional[str], started: Optional[float] = None) -> List[Dict[str, Any]]:
+        """解析模型响应、写入缓存并记录结果"""
+        self._log_response(response_text)
 
         try:
-            # 构建API调用参数
-            api_params = {
-                "model": model_name,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens
-            }
-            
-            # 对于支持 enable_thinking 的模型（如通义千问），在非流式调用时必须设置为 false
-            # 参考：https://help.aliyun.com/zh/model-studio/developer-reference/use-qwen-by-calling-api
-            if 'qwen' in model_name.lower():
-                api_params["extra_body"] = {"enable_thinking": False}
-            
-            response = self.client.chat.completions.create(**api_params)
-
-            response_text = response.choices[0].message.content
-            
-            # 记录响应结果
-            print("【远程模型响应】")
-            print(f"响应长度: {len(response_text)} 字符")
-            print(f"响应内容: {response_text[:500]}{'...' if len(response_text) > 500 else ''}")
-            print("-" * 80)
-            
-            entities = self._parse_response(response_text, text)
-            
-            # 记录解析结果
-            print("【实体识别结果】")
-            print(f"识别到实体数量: {len(entities)}")
-            if entities:
-                print("实体详情:")
-                for i, entity in enumerate(entities[:10], 1):  # 只显示前10个
-                    print(f"  [{i}] {entity.get('span')} | 类型: {entity.get('type')} | "
-                          f"位置: [{entity.get('start')}, {entity.get('end')}] | "
-                          f"置信度: {entity.get('prob', 0):.3f}")
-                if len(entities) > 10:
-                    print(f"  ... 还有 {len(entities) - 10} 个实体")
+            entities = self._parse_response(response_text, text, raise_on_error=True)
+        except json.JSONDecodeError:
+            # 响应无法解析时不写入缓存，下次重新调用
+            entities = []
+            cache_key = None
+
+        if cache_key is not None:
+            self.cache.put(cache_key, entities)
+
+        # 记录解析结果
+        self._log_call(text, entities, started)
+        return entities
+
+    @staticmethod
+    def _estimate_tokens(api_params: Dict[str, Any], text: str) -> int:
+        """粗略估算一次请求消耗的token数（提示词 + 预期输出），用于限流预约"""
+        prompt_length = sum(len(msg['content']) for msg in api_params['messages'])
+        return prompt_length + len(text)
+
+    @staticmethod
+    def _get_total_tokens(response) -> Optional[int]:
+        """读取响应中的实际token用量，不存在时返回None"""
+        usage = getattr(response, 'usage', None)
+        return getattr(usage, 'total_tokens', None) if usage is not None else None
+
+    def _handle_call_error(self, error: Exception, attempt: int) -> float:
+        """处理一次调用失败：不可重试或重试次数耗尽时抛出 RemoteNERError，
+        熔断器因此打开时抛出 CircuitOpenError，否则返回退避等待秒数"""
+        retryable = self.retry_policy.is_retryable(error)
+        autotuner = self.get_autotuner()
+        if autotuner is not None:
+            autotuner.record_error()
+        if self.circuit_breaker is not None:
+            # 只有服务不可用类的错误计入熔断；参数错误等不能证明服务已经恢复，不改变熔断状态
+            if retryable:
+                self.circuit_breaker.record_failure()
+                if self.circuit_breaker.is_open:
+                    self._log_failure(error)
+                    raise CircuitOpenError(
+                        f"远程NER服务熔断（已尝试{attempt + 1}次）: {type(error).__name__}: {error}"
+                    ) from error
             else:
-                print("  未识别到任何实体")
-            print("=" * 80)
-            print()
+                self.circuit_breaker.record_inconclusive()
+
+        if not retryable or attempt >= self.retry_policy.max_retries:
+            self._log_failure(error)
+            raise RemoteNERError(
+                f"远程NER调用失败（已尝试{attempt + 1}次）: {type(error).__name__}: {error}"
+            ) from error
+
+        delay = self.retry_policy.compute_delay(attempt, error)
+        log_event(logger, logging.WARNING, 'ner.retry',
+                  f"远程模型调用失败，{delay:.1f}秒后进行第{attempt + 1}次重试: {type(error).__name__}: {error}",
+                  error_type=type(error).__name__, attempt=attempt + 1, delay=round(delay, 3))
+        return delay
+
+    def _call_endpoint(self, api_params: Dict[str, Any], exclude=None, endpoint=None):
+        """向端点发送请求并返回响应，未指定 endpoint 时从端点池中选择
+
+        失败时异常上抛，异常对象的 endpoint 属性记录出错的端点，供重试时避开。
+        """
+        endpoint = endpoint or self.endpoint_pool.acquire(exclude=exclude)
+        started = time.monotonic()
+        try:
+            response = endpoint.client.chat.completions.create(**api_params)
+        except Exception as e:
+            self.endpoint_pool.release(endpoint, outcome=self._endpoint_outcome(e))
+            e.endpoint = endpoint
+            raise
+        self._record_latency(endpoint, api_params, time.monotonic() - started)
+        return response
+
+    async def _acall_endpoint(self, api_params: Dict[str, Any], exclude=None, endpoint=None):
+        """_call_endpoint 的异步版本"""
+        endpoint = endpoint or self.endpoint_pool.acquire(exclude=exclude)
+        started = time.monotonic()
+        try:
+            response = await endpoint.get_async_client().chat.completions.create(**api_params)
+        except BaseException as e:
+            # 请求被取消（如对冲请求落后）时不能说明端点是否健康
+            self.endpoint_pool.release(endpoint, outcome=self._endpoint_outcome(e) if isinstance(e, Exception)
+                                       else INCONCLUSIVE)
+            e.endpoint = endpoint
+            raise
+        self._record_latency(endpoint, api_params, time.monotonic() - started)
+        return response
+
+    def _endpoint_outcome(self, error: Exception) -> str:
+        """失败请求对端点健康状态的意义：可重试的错误计为端点故障，其余不影响端点状态"""
+        return FAILURE if self.retry_policy.is_retryable(error) else INCONCLUSIVE
+
+    def _record_latency(self, endpoint, api_params: Dict[str, Any], latency: float):
+        """归还端点并记录成功请求的耗时；流式请求只计到响应开始，不参与对冲延迟统计"""
+        self.endpoint_pool.release(endpoint, latency=latency)
+        if self.hedger is not None and not api_params.get('stream'):
+            self.hedger.record_latency(latency)
+
+    def _start_hedged_request(self, api_params: Dict[str, Any]) -> Optional[float]:
+        """登记一次请求，返回对冲延迟秒数；未启用对冲或样本不足时返回None"""
+        if self.hedger is None or api_params.get('stream'):
+            return None
+        return self.hedger.start_request()
+
+    def _try_reserve_hedge(self, estimated_tokens: int) -> bool:
+        """为对冲请求预约限流配额和对冲额度，任一不足时不发送对冲请求"""
+        if not self.rate_limiter.try_reserve(estimated_tokens):
+            return False
+        if not self.hedger.try_hedge():
+            self.rate_limiter.release(estimated_tokens)
+            return False
+        return True
+
+    def _get_hedge_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        """对冲模式下同步请求使用的线程池，调用线程只负责等待先返回的结果"""
+        with self._async_lock:
+            if self._hedge_executor is None:
+                max_workers = 2 * self.config.get('model_config', {}).get('max_concurrent_requests', 32)
+                self._hedge_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix='ner-hedge'
+                )
+            return self._hedge_executor
 
-            return {'output': entities}
+    def _call_hedged(self, api_params: Dict[str, Any], estimated_tokens: int, exclude=None):
+        """发送请求，超过对冲延迟仍未返回时向另一个端点发送副本，返回先成功的响应
 
+        落后的同步请求无法中途取消，会在后台线程中继续执行完并丢弃结果。
+        两个请求都失败时抛出先出现的错误。
+        """
+        hedge_delay = self._start_hedged_request(api_params)
+        if hedge_delay is None:
+            return self._call_endpoint(api_params, exclude=exclude)
+
+        executor = self._get_hedge_executor()
+        primary_endpoint = self.endpoint_pool.acquire(exclude=exclude)
+        primary = executor.submit(self._call_endpoint, api_params, endpoint=primary_endpoint)
+        try:
+            return primary.result(timeout=hedge_delay)
+        except concurrent.futures.TimeoutError:
+            pass
+        if not self._try_reserve_hedge(estimated_tokens):
+            return primary.result()
+
+        hedge = executor.submit(self._call_endpoint, api_params, exclude=primary_endpoint)
+        pending = {primary, hedge}
+        first_error = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.hedger.record_win()
+                    return future.result()
+                first_error = first_error or future.exception()
+        raise first_error
+
+    async def _acall_hedged(self, api_params: Dict[str, Any], estimated_tokens: int, exclude=None):
+        """_call_hedged 的异步版本，先返回的结果胜出后取消落后的请求"""
+        hedge_delay = self._start_hedged_request(api_params)
+        if hedge_delay is None:
+            return await self._acall_endpoint(api_params, exclude=exclude)
+
+        # 端点在任务内部选择，任务未开始就被取消时不会占用端点
+        primary_endpoints = []
+
+        async def call_primary():
+            endpoint = self.endpoint_pool.acquire(exclude=exclude)
+            primary_endpoints.append(endpoint)
+            return await self._acall_endpoint(api_params, endpoint=endpoint)
+
+        primary = asyncio.ensure_future(call_primary())
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done or not self._try_reserve_hedge(estimated_tokens):
+                return await primary
+
+            hedge = asyncio.ensure_future(self._acall_endpoint(api_params, exclude=primary_endpoints[0]))
+            tasks.append(hedge)
+            pending = set(tasks)
+            first_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedger.record_win()
+                        return task.result()
+                    first_error = first_error or task.exception()
+            raise first_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def get_hedge_stats(self) -> Optional[Dict[str, Any]]:
+        """返回对冲请求统计，未启用对冲时返回None"""
+        return self.hedger.stats() if self.hedger is not None else None
+
+    def _create_completion(self, api_params: Dict[str, Any], text: str):
+        """调用远程模型，带限流、指数退避重试和 Retry-After 支持，重试时优先换用其他端点
+
+        每次尝试都预约一次限流配额，失败的尝试在退避前撤销预约。
+        """
+        estimated_tokens = self._estimate_tokens(api_params, text)
+        attempt = 0
+        failed_endpoint = None
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.check()
+            wait = self.rate_limiter.reserve(estimated_tokens)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                response = self._call_hedged(api_params, estimated_tokens, exclude=failed_endpoint)
+            except Exception as e:
+                failed_endpoint = getattr(e, 'endpoint', None)
+                # 失败的请求没有消耗服务端配额，撤销本次预约，避免重试风暴耗尽令牌桶
+                self.rate_limiter.release(estimated_tokens)
+                time.sleep(self._handle_call_error(e, attempt))
+                attempt += 1
+                continue
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success()
+            self.rate_limiter.settle(estimated_tokens, self._get_total_tokens(response))
+            return response
+
+    async def _acreate_completion(self, api_params: Dict[str, Any], text: str):
+        """_create_completion 的异步版本，退避等待期间不占用并发信号量"""
+        semaphore = self._get_async_semaphore()
+        estimated_tokens = self._estimate_tokens(api_params, text)
+        attempt = 0
+        failed_endpoint = None
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.check()
+            wait = self.rate_limiter.reserve(estimated_tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                async with semaphore:
+                    response = await self._acall_hedged(api_params, estimated_tokens, exclude=failed_endpoint)
+            except Exception as e:
+                failed_endpoint = getattr(e, 'endpoint', None)
+                self.rate_limiter.release(estimated_tokens)
+                await asyncio.sleep(self._handle_call_error(e, attempt))
+                attempt += 1
+                continue
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success()
+            self.rate_limiter.settle(estimated_tokens, self._get_total_tokens(response))
+            return response
+
+    def _stream_enabled(self) -> bool:
+        """是否启用流式响应"""
+        return bool(self.config.get('model_config', {}).get('stream', False))
+
+    def _start_stream(self, text: str):
+        """构造并记录流式请求，返回 (请求参数, 增量解析器, 开始时间)"""
+        api_params = self._build_api_params(self._build_prompt(text))
+        api_params["stream"] = True
+        self._log_request(text, api_params)
+        parser = IncrementalCompactParser() if self._compact_format() else IncrementalEntityParser()
+        return api_params, parser, time.monotonic()
+
+    def _stream_event_entities(self, event, parser, text: str):
+        """解析一个流式分片，返回 (新闭合的实体, 分片中的结束原因)"""
+        if not event.choices:
+            return [], None
+        delta = getattr(event.choices[0].delta, 'content', None)
+        return self._validate_entities(parser.feed(delta), text), event.choices[0].finish_reason
+
+    def _finish_stream(self, text: str, parser, entities: List[Dict[str, Any]], error: Optional[Exception],
+                       finish_reason: Optional[str], cache_key: Optional[str],
+                       started: float) -> List[Dict[str, Any]]:
+        """流式响应结束后的收尾：返回解析器中剩余的实体，响应完整时写入缓存
+
+        entities 为已返回给调用方的实体，剩余实体会追加到其中。
+        """
+        complete = error is None
+        remaining = []
+        if error is not None:
+            log_event(logger, logging.WARNING, 'ner.stream_interrupted',
+                      f"流式响应中断，保留已解析的实体: {type(error).__name__}: {error}", entity_count=len(entities))
+        else:
+            remaining = self._validate_entities(parser.close(), text)
+            entities.extend(remaining)
+            if finish_reason == 'length' or not parser.finished:
+                complete = False
+                log_event(logger, logging.WARNING, 'ner.stream_truncated',
+                          "流式响应被截断，保留已解析的实体", entity_count=len(entities))
+
+        if complete and cache_key is not None:
+            self.cache.put(cache_key, entities)
+        self._log_call(text, entities, started)
+        return remaining
+
+    def stream_entities(self, text: str) -> Iterator[Dict[str, Any]]:
+        """以流式方式调用远程模型，每解析出一个完整的实体对象就立即返回
+
+        调用方可以在响应结束前开始处理实体。响应中途断开或被截断时，
+        已解析出的实体仍然有效，但结果不完整，不会写入缓存。
+        """
+        cache_key, cached_entities = self._lookup_cache(text)
+        if cached_entities is not None:
+            self._log_call(text, cached_entities, None, cached=True)
+            yield from cached_entities
+            return
+
+        api_params, parser, started = self._start_stream(text)
+        stream = self._create_completion(api_params, text)
+        entities = []
+        finish_reason = None
+        error = None
+        try:
+            for event in stream:
+                new_entities, event_finish_reason = self._stream_event_entities(event, parser, text)
+                finish_reason = event_finish_reason or finish_reason
+                for entity in new_entities:
+                    entities.append(entity)
+                    yield entity
+        except Exception as e:
+            error = e
+        yield from self._finish_stream(text, parser, entities, error, finish_reason, cache_key, started)
+
+    async def astream_entities(self, text: str) -> AsyncIterator[Dict[str, Any]]:
+        """stream_entities 的异步版本，使用AsyncOpenAI的流式响应"""
+        cache_key, cached_entities = self._lookup_cache(text)
+        if cached_entities is not None:
+            self._log_call(text, cached_entities, None, cached=True)
+            for entity in cached_entities:
+                yield entity
+            return
+
+        api_params, parser, started = self._start_stream(text)
+        stream = await self._acreate_completion(api_params, text)
+        entities = []
+        finish_reason = None
+        error = None
+        try:
+            async for event in stream:
+                new_entities, event_finish_reason = self._stream_event_entities(event, parser, text)
+                finish_reason = event_finish_reason or finish_reason
+                for entity in new_entities:
+                    entities.append(entity)
+                    yield entity
         except Exception as e:
-            print("【远程模型调用失败】")
-            print(f"错误类型: {type(e).__name__}")
-            print(f"错误信息: {e}")
-            print("=" * 80)
-            print()
-            return {'output': []}
+            error = e
+        for entity in self._finish_stream(text, parser, entities, error, finish_reason, cache_key, started):
+            yield entity
 
-    def get_pipeline(self):
-        """兼容旧接口，返回自身"""
-        return self
+    def process_text(self, text: str) -> Dict[str, Any]:
+        """处理单个文本，返回NER结果
+
+        远程调用在重试次数耗尽或遇到不可重试的错误时抛出 RemoteNERError，
+        不会以空结果代替，避免文本块在未脱敏的情况下被放行。
+        启用流式响应时收集 stream_entities 的全部实体后返回，响应被截断时只返回已解析的实体。
+        """
+        if self._stream_enabled():
+            return {'output': list(self.stream_entities(text))}
+
+        # 优先查询缓存，命中时不调用远程模型
+        cache_key, cached_entities = self._lookup_cache(text)
+        if cached_entities is not None:
+            self._log_call(text, cached_entities, None, cached=True)
+            return {'output': cached_entities}
+
+        api_params = self._build_api_params(self._build_prompt(text))
+        self._log_request(text, api_params)
+
+        started = time.monotonic()
+        response = self._create_completion(api_params, text)
+        response_text = response.choices[0].message.content or ''
+        return {'output': self._handle_response(response_text, text, cache_key, started)}
+
+    def _get_async_semaphore(self) -> asyncio.Semaphore:
+        """获取当前事件循环对应的并发信号量
+
+        asyncio.Semaphore 绑定在创建它的事件循环上，因此按事件循环分别创建；
+        同一事件循环内发往所有端点的请求共享同一个信号量。
+        """
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            semaphore = self._async_semaphores.get(loop)
+            if semaphore is None:
+                model_config = self.config.get('model_config', {})
+                semaphore = asyncio.Semaphore(model_config.get('max_concurrent_requests', 32))
+                self._async_semaphores[loop] = semaphore
+            return semaphore
+
+    async def aprocess_text(self, text: str) -> Dict[str, Any]:
+        """process_text 的异步版本，使用AsyncOpenAI并受全局并发信号量限制"""
+        if self._stream_enabled():
+            return {'output': [entity async for entity in self.astream_entities(text)]}
+
+        cache_key, cached_entities = self._lookup_cache(text)
+        if cached_entities is not None:
+            self._log_call(text, cached_entities, None, cached=True)
+            return {'output': cached_entities}
+
+        api_params = self._build_api_params(self._build_prompt(text))
+        self._log_request(text, api_params)
+
+        started = time.monotonic()
+        response = await self._acreate_completion(api_params, text)
+        response_text = response.choices[0].message.content or ''
+        return {'output': self._handle_response(response_text, text, cache_key, started)}
+
+    def _log_response(self, response_text: str):
+        """记录模型响应（DEBUG级别、按采样率记录，响应内容默认只记录长度）"""
+        log_event(logger, logging.DEBUG, 'ner.response', sampled=True,
+                  response_chars=len(response_text), response_preview=preview(response_text, 500))
+
+    def _log_call(self, text: str, entities: List[Dict[str, Any]], started: Optional[float],
+                  chunks: int = 1, cached: bool = False):
+        """记录一次识别的结构化结果：耗时、文本长度、实体数量和类型分布
+
+        实体文本只在开启 log_config.log_sensitive_text 时记录。
+        """
+        fields = {
+            'chunks': chunks,
+            'chunk_chars': len(text),
+            'cached': cached,
+            'latency': round(time.monotonic() - started, 4) if started is not None else 0.0,
+            'entity_count': len(entities),
+            'entity_types': dict(Counter(entity.get('type') for entity in entities)),
+        }
+        if sensitive_text_enabled():
+            fields['entities'] = [entity.get('span') for entity in entities[:10]]
+        log_event(logger, logging.DEBUG, 'ner.call', sampled=True, **fields)
+
+    def _get_pack_size(self) -> int:
+        """每个打包请求包含的文本块数，1表示不打包"""
+        return max(1, int(self.config.get('ner_config', {}).get('pack_size', 1)))
+
+    def get_batch_size(self) -> int:
+        """recognize_entities 每组提交的文本块数，与打包大小一致"""
+        return self._get_pack_size()
+
+    def _split_cached(self, texts: List[str]):
+        """查询打包模式的缓存，返回 (结果列表, 未命中的 [(序号, 文本, 缓存键)])"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            cache_key, cached_entities = self._lookup_cache(text, packed=True)
+            if cached_entities is not None:
+                results[i] = {'output': cached_entities}
+            else:
+                pending.append((i, text, cache_key))
+        return results, pending
+
+    def _handle_packed_response(self, response_text: str, pack,
+                                started: Optional[float] = None) -> List[Optional[List[Dict[str, Any]]]]:
+        """解析打包响应并写入缓存，pack 为 [(序号, 文本, 缓存键)]"""
+        self._log_response(response_text)
+
+        texts = [text for _, text, _ in pack]
+        try:
+            pack_entities = self._parse_packed_response(response_text, texts)
+        except json.JSONDecodeError as e:
+            log_event(logger, logging.WARNING, 'ner.parse_error', f"打包响应JSON解析失败，将逐块重新处理: {e}",
+                      chunks=len(pack), response_chars=len(response_text))
+            return [None] * len(pack)
+
+        for (_, _, cache_key), entities in zip(pack, pack_entities):
+            if entities is not None and cache_key is not None:
+                self.cache.put(cache_key, entities)
+
+        self._log_call(''.join(texts), [e for entities in pack_entities if entities for e in entities],
+                       started, chunks=len(pack))
+        return pack_entities
+
+    def _process_pack(self, pack) -> List[Dict[str, Any]]:
+        """将多个文本块打包成一次请求处理，响应中缺失的文本块单独重新请求"""
+        texts = [text for _, text, _ in pack]
+        api_params = self._build_api_params(self._build_packed_prompt(texts))
+        joined_text = ''.join(texts)
+        self._log_request(joined_text, api_params)
+
+        started = time.monotonic()
+        response = self._create_completion(api_params, joined_text)
+        response_text = response.choices[0].message.content or ''
+        pack_entities = self._handle_packed_response(response_text, pack, started)
+
+        return [
+            {'output': entities} if entities is not None else self.process_text(text)
+            for text, entities in zip(texts, pack_entities)
+        ]
+
+    def process_texts(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """批量处理多个文本块，返回与输入等长的NER结果列表
+
+        当 ner_config.pack_size 大于1时，每 pack_size 个未命中缓存的文本块合并为一次请求，
+        系统提示词和说明只发送一次；否则逐块调用 process_text。
+        """
+        pack_size = self._get_pack_size()
+        if pack_size <= 1 or len(texts) <= 1:
+            return [self.process_text(text) for text in texts]
+
+        results, pending = self._split_cached(texts)
+        for start in range(0, len(pending), pack_size):
+            pack = pending[start:start + pack_size]
+            for (i, _, _), result in zip(pack, self._process_pack(pack)):
+                results[i] = result
+        return results
+
+    async def _aprocess_pack(self, pack) -> List[Dict[str, Any]]:
+        """_process_pack 的异步版本"""
+        texts = [text for _, text, _ in pack]
+        api_params = self._build_api_params(self._build_packed_prompt(texts))
+        joined_text = ''.join(texts)
+        self._log_request(joined_text, api_params)
+
+        started = time.monotonic()
+        response = await self._acreate_completion(api_params, joined_text)
+        response_text = response.choices[0].message.content or ''
+        pack_entities = self._handle_packed_response(response_text, pack, started)
+
+        return [
+            {'output': entities} if entities is not None else await self.aprocess_text(text)
+            for text, entities in zip(texts, pack_entities)
+        ]
+
+    async def aprocess_texts(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """process_texts 的异步版本，所有打包请求并发发送"""
+        pack_size = self._get_pack_size()
+        if pack_size <= 1 or len(texts) <= 1:
+            return list(await asyncio.gather(*(self.aprocess_text(text) for text in texts)))
+
+        results, pending = self._split_cached(texts)
+        packs = [pending[start:start + pack_size] for start in range(0, len(pending), pack_size)]
+        pack_results = await asyncio.gather(*(self._aprocess_pack(pack) for pack in packs))
+        for pack, pack_result in zip(packs, pack_results):
+            for (i, _, _), result in zip(pack, pack_result):
+                results[i] = result
+        return results
+
+    def get_recognizer(self):
+        """返回实际执行识别的对象：启用级联时为级联识别器，否则为自身"""
+        return self.cascade or self
+
+    def get_cascade_stats(self) -> Optional[Dict[str, Any]]:
+        """返回级联识别的初筛和升级统计，未启用级联时返回None"""
+        return self.cascade.stats() if self.cascade is not None else None
+
+    def with_model_config(self, overrides: Dict[str, Any]) -> 'RemoteNERModel':
+        """创建一个使用另一组 model_config 的模型视图（如级联识别中的小模型）
+
+        视图与当前实例共享缓存、限流、重试策略和异步并发信号量；
+        端点池（失败计数和摘除状态）总是独立的，熔断器按 (模型名称, 端点) 区分，
+        因此初筛模型的故障既不会摘除主模型的端点，也不会让主模型熔断。
+
+        参数:
+            overrides (Dict[str, Any]): 要覆盖的 model_config 配置项，如 {"model_name": "qwen-turbo"}
+
+        返回:
+            RemoteNERModel: 新的模型视图（不是单例）
+        """
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        # 自动调优器统计整个识别流程的错误率，视图与当前实例共享
+        view._autotuner = self.get_autotuner()
+        model_config = dict(self.config.get('model_config', {}), **overrides)
+        view.config = dict(self.config, model_config=model_config)
+        # 延迟统计与模型相关，对冲控制器不共享
+        view.hedger = create_request_hedger(view.config)
+        view._hedge_executor = None
+        view.endpoint_pool = EndpointPool.from_config(model_config)
+        view.client = view.endpoint_pool.endpoints[0].client
+        view.circuit_breaker = view._get_circuit_breaker()
+        return view
+
+
+def _split_text(text: str, max_chunk_size: int, config: Dict[str, Any]) -> List[Tuple[str, int]]:
+    """按 ner_config 中的分块配置切分文本，返回 (文本块, 块在原文中的偏移量) 列表
+
+    配置了 max_chunk_tokens 时按token预算分块，否则按 max_chunk_size 字符数分块；
+    chunk_overlap_tokens 控制相邻块之间的重叠。
+    """
+    ner_config = config.get('ner_config', {})
+    max_chunk_tokens = ner_config.get('max_chunk_tokens') or None
+    chunker = TextChunker(
+        max_tokens=max_chunk_tokens,
+        max_chars=None if max_chunk_tokens else max_chunk_size,
+        overlap_tokens=ner_config.get('chunk_overlap_tokens', 0),
+        encoding_name=ner_config.get('tokenizer_encoding')
+    )
+    return chunker.split(text)
+
+
+def _select_chunks(ner_model: NERBackend, chunks: List[str]) -> List[int]:
+    """返回需要识别的文本块序号，启用预过滤时跳过不可能包含实体的文本块"""
+    prefilter = ner_model.get_prefilter()
+    if prefilter is None:
+        return list(range(len(chunks)))
+    return prefilter.select(chunks)
+
+
+def _plan_chunks(ner_model: NERBackend, chunks: List[str]):
+    """合并重复文本块并预过滤，返回 (每组第一次出现的原始文本块, 出现位置, 需要识别的组序号)"""
+    unique_texts, occurrences = deduplicate_chunks(chunks)
+    duplicates = sum(len(chunk_occurrences) for chunk_occurrences in occurrences) - len(unique_texts)
+    if duplicates:
+        log_event(logger, logging.INFO, 'ner.dedup',
+                  f"{len(chunks)}个文本块中有{duplicates}个重复，只识别{len(unique_texts)}个",
+                  chunks=len(chunks), unique_chunks=len(unique_texts))
+    return unique_texts, occurrences, _select_chunks(ner_model, unique_texts)
+
+
+def _recognize_chunks(ner_model: NERBackend, chunks: List[str],
+                      settings: ExecutionSettings) -> List[List[Dict[str, Any]]]:
+    """识别一组文本块，返回每个文本块的实体列表（位置为块内位置）
+
+    规范化（去掉首尾空白、合并连续空白）后相同的文本块（页眉页脚、免责声明、重复条款等）只调用一次后端，
+    后端收到的是第一次出现的原始文本块，识别结果按各次出现换算位置后复制回去；启用预过滤时跳过不含实体线索的文本块。
+    去重只在本次调用范围内进行，与持久化缓存无关。
+    线程数由自动调优器决定时，每次调用后端的耗时都会交给调优器，并发数随调优结果变化。
+    """
+    unique_texts, occurrences, selected = _plan_chunks(ner_model, chunks)
+
+    # 启用级联时先由初筛模型识别，不确定的文本块再交给主模型
+    recognizer = ner_model.get_recognizer()
+
+    # 每组文本块一次交给后端：远程模型启用打包时合并为一次请求，本地模型按批推理
+    batch_size = ner_model.get_batch_size()
+    groups = [selected[i:i + batch_size] for i in range(0, len(selected), batch_size)]
+
+    autotuner = ner_model.get_autotuner() if settings.autotuned else None
+    if autotuner is not None:
+        autotuner.begin_run()
+
+    # 处理一组文本块的函数，返回 [(不重复文本块序号, 实体列表)]
+    def process_group(group):
+        texts = [unique_texts[i] for i in group]
+        started = time.monotonic()
+        group_results = recognizer.process_texts(texts)
+        if autotuner is not None:
+            autotuner.record(len(texts), sum(len(text) for text in texts), time.monotonic() - started)
+        return [(i, result.get('output', [])) for i, result in zip(group, group_results)]
+
+    if autotuner is not None:
+        max_workers = autotuner.current_workers
+        mode = f"自动调优线程数（当前{autotuner.workers}个）"
+    elif settings.enable_parallel:
+        max_workers = settings.num_workers
+        mode = f"最多使用{settings.num_workers}个工作线程并行处理"
+    else:
+        max_workers = 1
+        mode = "使用顺序处理"
+    if len(groups) > 1:
+        log_event(logger, logging.INFO, 'ner.recognize', f"处理文本: 共{len(chunks)}个块（{len(groups)}个请求），{mode}",
+                  chunks=len(chunks), requests=len(groups), max_workers=settings.num_workers)
+
+    # 由共享调度器的NER线程池执行，并发数不超过 scheduler_config.ner_workers；
+    # 在调度器工作线程中调用时（如外层已经并行）直接顺序执行，不再嵌套线程池
+    group_results = get_scheduler().map(
+        POOL_NER, process_group, groups,
+        max_workers=max_workers,
+        desc="实体识别进度" if len(groups) > 1 else None
+    )
+
+    unique_entities: List[List[Dict[str, Any]]] = [[] for _ in unique_texts]
+    for group_result in group_results:
+        for i, entities in group_result:
+            unique_entities[i] = entities
+
+    return expand_chunk_entities(chunks, unique_entities, occurrences)
+
+
+async def _arecognize_chunks(ner_model: NERBackend, chunks: List[str]) -> List[List[Dict[str, Any]]]:
+    """_recognize_chunks 的异步版本，所有需要识别的文本块同时提交"""
+    unique_texts, occurrences, selected = _plan_chunks(ner_model, chunks)
+
+    # aprocess_texts按输入顺序返回结果
+    results = await ner_model.get_recognizer().aprocess_texts([unique_texts[i] for i in selected]) \
+        if selected else []
+
+    unique_entities: List[List[Dict[str, Any]]] = [[] for _ in unique_texts]
+    for i, result in zip(selected, results):
+        unique_entities[i] = result.get('output', [])
+    return expand_chunk_entities(chunks, unique_entities, occurrences)
+
+
+def _offset_entities(entities: List[Dict[str, Any]], offset: int) -> List[Dict[str, Any]]:
+    """将文本块内的实体位置调整为原文中的位置"""
+    for entity in entities:
+        entity['start'] += offset
+        entity['end'] += offset
+    return entities
+
+
+def _deduplicate_entities(entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """按 (实体文本, 实体类型) 去重，保留置信度最高的实体"""
+    unique_entities = {}
+    for entity in entities:
+        entity_key = (entity["span"], entity["type"])
+        if entity_key not in unique_entities or \
+           entity.get("prob", 0) > unique_entities[entity_key].get("prob", 0):
+            unique_entities[entity_key] = entity
+    return list(unique_entities.values())
+
+
+def _save_result(result: Dict[str, Any], output_dir: str, output_filename: str):
+    """将识别结果保存到JSON文件"""
+    # 多个结果文件可能并行写出，目录已存在时不报错
+    os.makedirs(output_dir, exist_ok=True)
+
+    output_path = os.path.join(output_dir, output_filename)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    logger.info("结果已保存到: %s", output_path)
 
 
 def recognize_entities(text, save_to_file=True, output_dir='output',
-                      output_filename='result.json', max_chunk_size=450,
-                      num_workers=4, enable_parallel=False):
+                      output_filename='result.json', max_chunk_size=None,
+                      num_workers=None, enable_parallel=None, deduplicate=True):
     """
-    使用远程NER模型识别文本中的实体
+    使用 model_config.model_type 指定的NER后端（默认为远程模型）识别文本中的实体
 
     参数:
         text (str): 待识别的文本
         save_to_file (bool): 是否将结果保存到文件，默认为True
         output_dir (str): 输出目录，默认为'output'
         output_filename (str): 输出文件名，默认为'result.json'
-        max_chunk_size (int): 每个文本块的最大字符数，默认为450
-        num_workers (int): 并行处理的工作线程数，默认为4
-        enable_parallel (bool): 是否启用并行处理，默认为False
+        max_chunk_size (int): 每个文本块的最大字符数，默认取 ner_config.max_chunk_size（450）
+        num_workers (int): 并行处理的工作线程数，默认取 ner_config.num_workers（4）
+        enable_parallel (bool): 是否启用并行处理，默认取 ner_config.enable_parallel（False）
+        deduplicate (bool): 是否按 (实体文本, 实体类型) 去重，默认为True；
+            为False时保留实体的每一次出现及其位置（用于按位置替换）
 
     返回:
         dict: 识别结果的字典
     """
-    # 使用单例模式获取远程NER模型
-    ner_model = RemoteNERModel()
-
-    # 将长文本分成多个块进行处理
-    if len(text) > max_chunk_size:
-        import concurrent.futures
-        import tqdm
-
-        # 优化分块策略：尝试在句子边界处分割文本
-        sentence_endings = r'[。！？；.!?;]'
-
-        chunks = []
-        start = 0
-        while start < len(text):
-            if start + max_chunk_size >= len(text):
-                chunks.append(text[start:])
-                break
-
-            end = start + max_chunk_size
-            last_sentence_end = end
-
-            matches = list(re.finditer(sentence_endings, text[start:end]))
-            if matches:
-                last_match = matches[-1]
-                last_sentence_end = start + last_match.end()
-
-            chunks.append(text[start:last_sentence_end])
-            start = last_sentence_end
-
-        # 处理单个文本块的函数
-        def process_chunk(chunk_data):
-            chunk, chunk_offset = chunk_data
-            chunk_result = ner_model.process_text(chunk)
-            chunk_entities = chunk_result.get('output', [])
-
-            # 调整实体的位置偏移
-            for entity in chunk_entities:
-                entity['start'] += chunk_offset
-                entity['end'] += chunk_offset
-
-            return chunk_entities
-
-        # 准备带有偏移量的块数据
-        chunk_data = []
-        offset = 0
-        for chunk in chunks:
-            chunk_data.append((chunk, offset))
-            offset += len(chunk)
-
-        # 根据设置决定是否使用并行处理
-        all_entities = []
+    # 获取配置的NER后端（进程内只创建一次）
+    ner_model = get_backend()
+    settings = resolve_execution_settings(enable_parallel, num_workers, max_chunk_size, backend=ner_model)
 
-        if enable_parallel:
-            print(f"处理文本: 共{len(chunks)}个块，使用{num_workers}个工作线程并行处理...")
+    # 将长文本分成多个块进行处理，重复的文本块只识别一次
+    chunk_data = _split_text(text, settings.max_chunk_size, ner_model.config)
+    chunk_entities = _recognize_chunks(ner_model, [chunk for chunk, _ in chunk_data], settings)
 
-            with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-                futures = [executor.submit(process_chunk, data) for data in chunk_data]
-                for future in tqdm.tqdm(concurrent.futures.as_completed(futures),
-                                       total=len(futures), desc="实体识别进度"):
-                    chunk_entities = future.result()
-                    all_entities.extend(chunk_entities)
-        else:
-            print(f"处理文本: 共{len(chunks)}个块，使用顺序处理...")
-
-            for data in tqdm.tqdm(chunk_data, desc="实体识别进度"):
-                chunk_entities = process_chunk(data)
-                all_entities.extend(chunk_entities)
-
-        # 实体去重处理
-        unique_entities = {}
-        for entity in all_entities:
-            entity_key = (entity["span"], entity["type"])
-            if entity_key not in unique_entities or \
-               entity.get("prob", 0) > unique_entities[entity_key].get("prob", 0):
-                unique_entities[entity_key] = entity
-
-        all_entities = list(unique_entities.values())
-        result = {'output': all_entities}
-    else:
-        # 文本长度在可接受范围内，直接处理
-        result = ner_model.process_text(text)
-
-        # 对短文本也进行实体去重处理
-        if 'output' in result:
-            all_entities = result['output']
-            unique_entities = {}
-            for entity in all_entities:
-                entity_key = (entity["span"], entity["type"])
-                if entity_key not in unique_entities or \
-                   entity.get("prob", 0) > unique_entities[entity_key].get("prob", 0):
-                    unique_entities[entity_key] = entity
-
-            result['output'] = list(unique_entities.values())
+    # 按块序号换算为原文位置，合并相邻块重叠区内的重复实体后去重
+    for (_, chunk_offset), entities in zip(chunk_data, chunk_entities):
+        _offset_entities(entities, chunk_offset)
+    merged = merge_chunk_entities(chunk_entities)
+    result = {'output': _deduplicate_entities(merged) if deduplicate else merged}
 
     # 如果需要保存到文件
     if save_to_file:
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        _save_result(result, output_dir, output_filename)
+
+    return result
+
+
+async def arecognize_entities(text, save_to_file=False, output_dir='output',
+                              output_filename='result.json', max_chunk_size=None, deduplicate=True):
+    """
+    recognize_entities 的异步版本
 
-        output_path = os.path.join(output_dir, output_filename)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+    所有文本块同时提交，远程模型的实际在途请求数由全局并发信号量
+    （model_config.max_concurrent_requests）控制，不创建额外线程；
+    本地后端在线程池中推理，不阻塞事件循环。
 
-        print(f"结果已保存到: {output_path}")
+    参数:
+        text (str): 待识别的文本
+        save_to_file (bool): 是否将结果保存到文件，默认为False
+        output_dir (str): 输出目录，默认为'output'
+        output_filename (str): 输出文件名，默认为'result.json'
+        max_chunk_size (int): 每个文本块的最大字符数，默认取 ner_config.max_chunk_size（450）
+        deduplicate (bool): 是否按 (实体文本, 实体类型) 去重，默认为True
+
+    返回:
+        dict: 识别结果的字典
+    """
+    ner_model = get_backend()
+    settings = resolve_execution_settings(max_chunk_size=max_chunk_size, backend=ner_model)
+    chunk_data = _split_text(text, settings.max_chunk_size, ner_model.config)
+    chunk_entities = await _arecognize_chunks(ner_model, [chunk for chunk, _ in chunk_data])
+
+    for (_, chunk_offset), entities in zip(chunk_data, chunk_entities):
+        _offset_entities(entities, chunk_offset)
+    merged = merge_chunk_entities(chunk_entities)
+    result = {'output': _deduplicate_entities(merged) if deduplicate else merged}
+
+    if save_to_file:
+        _save_result(result, output_dir, output_filename)
 
     return result
 
 
 def batch_recognize_entities(texts, save_to_file=True, output_dir='output',
-                            output_filename_prefix='result', max_chunk_size=450,
-                            num_workers=4, enable_parallel=False):
+                            output_filename_prefix='result', max_chunk_size=None,
+                            num_workers=None, enable_parallel=None):
     """
     批量处理多个文本的实体识别
 
+    所有文本的文本块一起去重后识别，在多个文本中重复出现的段落（页眉页脚、免责声明等）只识别一次。
+
     参数:
         texts (List[str]): 待识别的文本列表
         save_to_file (bool): 是否将结果保存到文件，默认为True
         output_dir (str): 输出目录，默认为'output'
         output_filename_prefix (str): 输出文件名前缀，默认为'result'
-        max_chunk_size (int): 每个文本块的最大字符数，默认为450
-        num_workers (int): 并行处理的工作线程数，默认为4
-        enable_parallel (bool): 是否启用并行处理，默认为False
+        max_chunk_size (int): 每个文本块的最大字符数，默认取 ner_config.max_chunk_size（450）
+        num_workers (int): 并行处理的工作线程数，默认取 ner_config.num_workers（4）
+        enable_parallel (bool): 是否启用并行处理，默认取 ner_config.enable_parallel（False）
 
     返回:
-        List[dict]: 识别结果的字典列表
+        List[dict]: 识别结果的字典列表，与输入文本一一对应
     """
-    import concurrent.futures
-    import tqdm
+    ner_model = get_backend()
+    settings = resolve_execution_settings(enable_parallel, num_workers, max_chunk_size, backend=ner_model)
+    chunk_data_list = [_split_text(text, settings.max_chunk_size, ner_model.config) for text in texts]
+    all_chunks = [chunk for chunk_data in chunk_data_list for chunk, _ in chunk_data]
+
+    logger.info("批量处理文本: 共%d个文本，%d个文本块", len(texts), len(all_chunks))
+    all_chunk_entities = _recognize_chunks(ner_model, all_chunks, settings)
 
     results = []
+    position = 0
+    for chunk_data in chunk_data_list:
+        chunk_entities = all_chunk_entities[position:position + len(chunk_data)]
+        position += len(chunk_data)
+        for (_, chunk_offset), entities in zip(chunk_data, chunk_entities):
+            _offset_entities(entities, chunk_offset)
 
-    if enable_parallel and len(texts) > 1:
-        print(f"批量处理文本: 共{len(texts)}个文本，使用{num_workers}个工作线程并行处理...")
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-            futures = []
-            for i, text in enumerate(texts):
-                output_filename = f"{output_filename_prefix}_{i}.json" if save_to_file else None
-                future = executor.submit(
-                    recognize_entities,
-                    text,
-                    save_to_file,
-                    output_dir,
-                    output_filename,
-                    max_chunk_size,
-                    num_workers,
-                    False
-                )
-                futures.append(future)
+        results.append({'output': _deduplicate_entities(merge_chunk_entities(chunk_entities))})
 
-            for future in tqdm.tqdm(concurrent.futures.as_completed(futures),
-                                   total=len(futures), desc="批量实体识别进度"):
-                result = future.result()
-                results.append(result)
-    else:
-        print(f"批量处理文本: 共{len(texts)}个文本，使用顺序处理...")
-
-        for i, text in enumerate(tqdm.tqdm(texts, desc="批量实体识别进度")):
-            output_filename = f"{output_filename_prefix}_{i}.json" if save_to_file else None
-            result = recognize_entities(
-                text,
-                save_to_file,
-                output_dir,
-                output_filename,
-                max_chunk_size,
-                num_workers,
-                enable_parallel
-            )
-            results.append(result)
+    if save_to_file:
+        # 结果文件由共享调度器的文件读写线程池写出
+        def save(item):
+            index, result = item
+            _save_result(result, output_dir, f"{output_filename_prefix}_{index}.json")
+
+        get_scheduler().map(POOL_IO, save, list(enumerate(results)))
 
     # 合并和去重
     if len(results) > 1:
@@ -396,21 +1244,17 @@ def batch_recognize_entities(texts, save_to_file=True, output_dir='output',
         for result in results:
             all_entities.extend(result.get('output', []))
 
-        unique_entities = {}
-        for entity in all_entities:
-            entity_key = (entity["span"], entity["type"])
-            if entity_key not in unique_entities or \
-               entity.get("prob", 0) > unique_entities[entity_key].get("prob", 0):
-                unique_entities[entity_key] = entity
-
         if results:
-            results[0]['output'] = list(unique_entities.values())
+            results[0]['output'] = _deduplicate_entities(all_entities)
 
     return results
 
 
 # 示例用法
 if __name__ == "__main__":
+    from Data_Masking.instrumentation import configure_logging
+    configure_logging(level='DEBUG')
+
     sample_text = """庭审中，王鸿雁称王晗因违规直播而不能注册帐号，但其不清楚王晗违规直播的具体情况；双方口头约定以王鸿雁的身份信息进行实名注册并绑定其银行卡帐号，由王晗进行直播并向王鸿雁支付分红款，帐号归王鸿雁所有。"""
 
     # 单个文本处理示例
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 对冲请求 - 请求迟迟未返回时再发一个副本，取先返回的结果，以降低尾延迟
+
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class RequestHedger:
+    """决定何时发送对冲请求，并限制对冲带来的额外负载
+
+    - 对冲延迟：最近 window 次成功请求耗时的第 percentile 百分位，
+      样本数不足 min_samples 时不对冲；延迟不低于 min_delay 秒
+    - 负载上限：每个主请求积累 max_extra_load 个额度，每个对冲请求消耗1个额度，
+      长期来看对冲请求数不超过主请求数的 max_extra_load 倍；额度最多积累 burst 个
+    """
+
+    def __init__(self, percentile: float = 95, max_extra_load: float = 0.1, min_samples: int = 20,
+                 window: int = 200, min_delay: float = 0.05, burst: float = 10):
+        """
+        参数:
+            percentile (float): 触发对冲的延迟百分位（0-100）
+            max_extra_load (float): 对冲请求占主请求的最大比例，如0.1表示最多增加10%的请求
+            min_samples (int): 开始对冲前至少需要的延迟样本数
+            window (int): 参与统计的最近请求数
+            min_delay (float): 对冲延迟的下限（秒）
+            burst (float): 对冲额度的积累上限
+        """
+        self.percentile = min(max(percentile, 0.0), 100.0)
+        self.max_extra_load = max(0.0, max_extra_load)
+        self.min_samples = max(1, min_samples)
+        self.min_delay = min_delay
+        self.burst = max(1.0, burst)
+        self._latencies = deque(maxlen=window)
+        self._credits = 0.0
+        self.primary_requests = 0
+        self.hedged_requests = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def record_latency(self, latency: float):
+        """记录一次成功请求的耗时（秒）"""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def start_request(self) -> Optional[float]:
+        """登记一个主请求，返回对冲延迟秒数；返回None表示本次不对冲"""
+        with self._lock:
+            self.primary_requests += 1
+            self._credits = min(self.burst, self._credits + self.max_extra_load)
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+            index = min(len(latencies) - 1, max(0, math.ceil(len(latencies) * self.percentile / 100) - 1))
+            return max(self.min_delay, latencies[index])
+
+    def try_hedge(self) -> bool:
+        """尝试消耗一个对冲额度，额度不足时返回False"""
+        with self._lock:
+            if self._credits < 1.0:
+                return False
+            self._credits -= 1.0
+            self.hedged_requests += 1
+            return True
+
+    def record_win(self):
+        """记录一次对冲请求先于主请求返回"""
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'primary_requests': self.primary_requests,
+                'hedged_requests': self.hedged_requests,
+                'hedge_wins': self.hedge_wins,
+                'extra_load': self.hedged_requests / self.primary_requests if self.primary_requests else 0.0,
+            }
+
+
+def create_request_hedger(config: Dict[str, Any]) -> Optional[RequestHedger]:
+    """根据 config.json 中的 hedge_config 创建对冲控制器，未启用时返回None"""
+    hedge_config = config.get('hedge_config', {})
+    if not hedge_config.get('enabled', False):
+        return None
+    return RequestHedger(
+        percentile=hedge_config.get('latency_percentile', 95),
+        max_extra_load=hedge_config.get('max_extra_load', 0.1),
+        min_samples=hedge_config.get('min_samples', 20),
+        window=hedge_config.get('window', 200),
+        min_delay=hedge_config.get('min_delay', 0.05)
+    )
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 任务调度器 - 进程内共享的线程池，NER请求、CPU计算和文件读写分别有全局并发上限
+
+import concurrent.futures
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+import tqdm
+
+# 任务类别：NER请求（等待网络或本地推理）、CPU计算（实体替换等）、文件读写
+POOL_NER = 'ner'
+POOL_CPU = 'cpu'
+POOL_IO = 'io'
+
+
+class TaskScheduler:
+    """进程内共享的任务调度器
+
+    每类任务一个线程池，线程数即该类任务在整个进程中的并发上限，与调用层级无关。
+    已经在调度器工作线程中执行的任务再调用 map 时直接在当前线程顺序执行，
+    避免嵌套的线程池把并发数成倍放大，也避免工作线程等待同一线程池而死锁。
+    map 的结果始终按输入顺序返回。
+    """
+
+    def __init__(self, ner_workers: int = 8, cpu_workers: Optional[int] = None, io_workers: int = 4):
+        """
+        参数:
+            ner_workers (int): 同时进行的NER调用数上限
+            cpu_workers (int, optional): 同时进行的CPU计算任务数上限，默认为CPU核数
+            io_workers (int): 同时进行的文件读写任务数上限
+        """
+        self.limits = {
+            POOL_NER: max(1, ner_workers),
+            POOL_CPU: max(1, cpu_workers or os.cpu_count() or 1),
+            POOL_IO: max(1, io_workers),
+        }
+        self._executors: Dict[str, concurrent.futures.ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {pool: {'tasks': 0, 'inline_tasks': 0} for pool in self.limits}
+
+    def _get_executor(self, pool: str) -> concurrent.futures.ThreadPoolExecutor:
+        if pool not in self.limits:
+            raise ValueError(f"未知的任务类别: {pool}，可选: {', '.join(self.limits)}")
+        with self._lock:
+            executor = self._executors.get(pool)
+            if executor is None:
+                executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.limits[pool], thread_name_prefix=f"masking-{pool}"
+                )
+                self._executors[pool] = executor
+            return executor
+
+    def in_worker(self) -> bool:
+        """当前线程是否为调度器的工作线程"""
+        return getattr(self._local, 'pool', None) is not None
+
+    def _run(self, pool: str, func: Callable, item: Any):
+        self._local.pool = pool
+        try:
+            return func(item)
+        finally:
+            self._local.pool = None
+
+    def map(self, pool: str, func: Callable[[Any], Any], items: Iterable[Any],
+            max_workers: Union[int, Callable[[], int], None] = None, desc: Optional[str] = None) -> List[Any]:
+        """在指定类别的线程池中对每一项执行 func，按输入顺序返回结果
+
+        参数:
+            pool (str): 任务类别，POOL_NER / POOL_CPU / POOL_IO
+            func (Callable): 处理单项的函数
+            items (Iterable): 待处理的项
+            max_workers (int | Callable, optional): 本次调用最多同时占用的线程数，不超过该类别的全局上限；
+                传入函数时每次提交任务前重新读取（供自动调优在执行过程中调整并发数）
+            desc (str, optional): 进度条描述，为None时不显示进度条
+
+        返回:
+            List[Any]: 与输入顺序一致的结果列表；任一项抛出异常时重新抛出第一个异常
+        """
+        items = list(items)
+        executor = self._get_executor(pool)
+
+        def current_limit() -> int:
+            requested = max_workers() if callable(max_workers) else max_workers
+            return min(self.limits[pool], requested or self.limits[pool])
+
+        # 固定为1个线程时顺序执行；上限可变时即使当前为1也进入线程池，以便之后增加并发
+        if len(items) <= 1 or (current_limit() <= 1 and not callable(max_workers)) or self.in_worker():
+            with self._lock:
+                self._stats[pool]['inline_tasks'] += len(items)
+            iterator = tqdm.tqdm(items, desc=desc) if desc else items
+            return [func(item) for item in iterator]
+
+        with self._lock:
+            self._stats[pool]['tasks'] += len(items)
+        results: List[Any] = [None] * len(items)
+        progress = tqdm.tqdm(total=len(items), desc=desc) if desc else None
+        pending: Dict[concurrent.futures.Future, int] = {}
+        next_index = 0
+        try:
+            # 本次调用最多保持 limit 个任务在途，其余任务等有任务完成后再提交
+            while next_index < len(items) or pending:
+                limit = current_limit()
+                while next_index < len(items) and len(pending) < limit:
+                    future = executor.submit(self._run, pool, func, items[next_index])
+                    pending[future] = next_index
+                    next_index += 1
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+                    if progress is not None:
+                        progress.update(1)
+        finally:
+            for future in pending:
+                future.cancel()
+            if progress is not None:
+                progress.close()
+        return results
+
+    def submit(self, pool: str, func: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """提交单个任务，返回Future；在工作线程中调用时直接执行并返回已完成的Future"""
+        if self.in_worker():
+            future: concurrent.futures.Future = concurrent.futures.Future()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+        with self._lock:
+            self._stats[pool]['tasks'] += 1
+        return self._get_executor(pool).submit(self._run, pool, lambda _: func(*args, **kwargs), None)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """返回各类任务的并发上限、线程池中执行的任务数和在当前线程顺序执行的任务数"""
+        with self._lock:
+            return {pool: dict(self._stats[pool], limit=self.limits[pool]) for pool in self.limits}
+
+    def shutdown(self, wait: bool = True):
+        """关闭所有线程池"""
+        with self._lock:
+            executors, self._executors = list(self._executors.values()), {}
+        for executor in executors:
+            executor.shutdown(wait=wait)
+
+
+_scheduler: Optional[TaskScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def create_scheduler(config: Dict[str, Any]) -> TaskScheduler:
+    """根据 config.json 中的 scheduler_config 创建调度器"""
+    scheduler_config = config.get('scheduler_config', {})
+    return TaskScheduler(
+        ner_workers=scheduler_config.get('ner_workers', 8),
+        cpu_workers=scheduler_config.get('cpu_workers') or None,
+        io_workers=scheduler_config.get('io_workers', 4)
+    )
+
+
+def get_scheduler() -> TaskScheduler:
+    """返回进程内共享的调度器，首次调用时按配置文件创建（配置文件不存在时使用默认上限）"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            from Data_Masking.backends.registry import load_config
+            try:
+                config = load_config()
+            except FileNotFoundError:
+                config = {}
+            _scheduler = create_scheduler(config)
+        return _scheduler
+
+
+def reset_scheduler():
+    """关闭当前调度器，下次调用 get_scheduler 时重新读取配置"""
+    global _scheduler
+    with _scheduler_lock:
+        scheduler, _scheduler = _scheduler, None
+    if scheduler is not None:
+        scheduler.shutdown(wait=False)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 实体位置定位 - 基于Aho-Corasick自动机一次扫描定位所有实体文本
+
+import bisect
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """Aho-Corasick多模式匹配自动机
+
+    一次扫描文本即可找到所有模式串的全部出现位置（包括相互重叠的出现），
+    耗时与文本长度和匹配数成正比，与模式串数量无关。
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        # 状态转移表、失败指针、每个状态可输出的模式串序号
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        seen = set()
+        for pattern in patterns:
+            if pattern and pattern not in seen:
+                seen.add(pattern)
+                self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(len(self.patterns))
+        self.patterns.append(pattern)
+
+    def _build(self):
+        """按广度优先顺序计算失败指针，并把失败链上的输出合并到当前状态"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """遍历文本中所有匹配，返回 (起始位置, 结束位置, 模式串)"""
+        goto, fail, output, patterns = self._goto, self._fail, self._output, self.patterns
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern_id in output[state]:
+                pattern = patterns[pattern_id]
+                yield i + 1 - len(pattern), i + 1, pattern
+
+    def find_all(self, text: str) -> Dict[str, List[int]]:
+        """返回每个模式串在文本中所有出现的起始位置（升序）"""
+        occurrences: Dict[str, List[int]] = {}
+        for start, _, pattern in self.iter_matches(text):
+            occurrences.setdefault(pattern, []).append(start)
+        for starts in occurrences.values():
+            starts.sort()
+        return occurrences
+
+
+def align_entities(entities: List[Dict[str, Any]], text: str) -> List[Dict[str, Any]]:
+    """将模型返回的实体与原文对齐，修正或补全 start/end
+
+    用所有实体文本构建一个自动机，一次扫描原文得到每个实体文本的全部出现位置：
+    - 模型给出的位置在原文范围内且与原文一致时保留；
+    - 位置缺失、越界（包括负数位置）或与原文不符时，改用离模型给出位置最近的出现位置（无位置时取第一次出现）；
+    - 实体文本在原文中不存在时丢弃该实体。
+
+    参数:
+        entities (List[Dict[str, Any]]): 实体列表，每个实体至少包含span字段
+        text (str): 原文
+
+    返回:
+        List[Dict[str, Any]]: 位置可信的实体列表
+    """
+    spans = [entity['span'] for entity in entities if isinstance(entity.get('span'), str) and entity['span']]
+    if not spans:
+        return []
+    occurrences = AhoCorasick(spans).find_all(text)
+
+    aligned = []
+    for entity in entities:
+        span = entity.get('span')
+        starts = occurrences.get(span) if isinstance(span, str) else None
+        if not starts:
+            continue
+
+        start, end = entity.get('start'), entity.get('end')
+        if not (isinstance(start, int) and isinstance(end, int) and 0 <= start < end <= len(text)
+                and text[start:end] == span):
+            start = _nearest(starts, start if isinstance(start, int) else 0)
+            entity['start'] = start
+            entity['end'] = start + len(span)
+        aligned.append(entity)
+
+    return aligned
+
+
+def _nearest(starts: List[int], position: int) -> int:
+    """在升序位置列表中找离 position 最近的位置"""
+    idx = bisect.bisect_left(starts, position)
+    if idx == 0:
+        return starts[0]
+    if idx == len(starts):
+        return starts[-1]
+    before, after = starts[idx - 1], starts[idx]
+    return before if position - before <= after - position else after
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 文本分块器 - 按模型token预算切分文本，并在相邻块之间保留重叠
+
+import bisect
+import logging
+import re
+from itertools import accumulate
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 句子结束标点，用于在句子边界处分割文本
+SENTENCE_ENDINGS = re.compile(r'[。！？；.!?;]')
+
+# ASCII字母数字和空白在常见分词器中通常几个字符合成一个token，按0.25个token估算；
+# 汉字及其他字符按每字1个token估算（对中文模型略偏保守）
+_LIGHT_CHARS = frozenset(
+    'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 \t\r\n'
+)
+
+def _load_encoding(encoding_name: Optional[str]):
+    """加载tiktoken编码器（可选依赖），不可用时返回None"""
+    if not encoding_name:
+        return None
+    try:
+        import tiktoken
+    except ImportError:
+        logger.info("未安装tiktoken，使用字符估算token数")
+        return None
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logger.warning("加载分词编码 %s 失败，使用字符估算token数: %s", encoding_name, e)
+        return None
+
+
+class TextChunker:
+    """按token预算切分文本
+
+    - 每个块的token数不超过 max_tokens（未设置时按 max_chars 字符数限制）
+    - 优先在句子结束标点处切分，找不到时在预算上限处硬切
+    - 相邻块之间保留约 overlap_tokens 个token的重叠，避免实体被切断后漏识别
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, max_chars: Optional[int] = 450,
+                 overlap_tokens: int = 0, encoding_name: Optional[str] = None):
+        """
+        参数:
+            max_tokens (int, optional): 每个块的最大token数，None或0表示不按token限制
+            max_chars (int, optional): 每个块的最大字符数，None表示不按字符限制
+            overlap_tokens (int): 相邻块之间重叠的token数，默认为0
+            encoding_name (str, optional): tiktoken编码名称（如 cl100k_base），
+                未安装tiktoken或未设置时按字符类型估算token数
+        """
+        if not max_tokens and not max_chars:
+            raise ValueError("max_tokens 和 max_chars 至少需要设置一个")
+        self.max_tokens = max_tokens or None
+        self.max_chars = max_chars
+        self.overlap_tokens = max(0, overlap_tokens)
+        self.encoding = _load_encoding(encoding_name)
+
+    def _char_costs(self, text: str) -> List[float]:
+        """计算每个字符的token开销"""
+        if self.encoding is None:
+            return [0.25 if c in _LIGHT_CHARS else 1.0 for c in text]
+
+        # 精确计数：把每个token的开销记在它的起始字符上
+        costs = [0.0] * len(text)
+        tokens = self.encoding.encode(text, disallowed_special=())
+        _, offsets = self.encoding.decode_with_offsets(tokens)
+        for offset in offsets:
+            if offset < len(costs):
+                costs[offset] += 1.0
+        return costs
+
+    def estimate_tokens(self, text: str) -> float:
+        """估算文本的token数"""
+        return sum(self._char_costs(text))
+
+    def split(self, text: str) -> List[Tuple[str, int]]:
+        """切分文本，返回 (文本块, 块在原文中的偏移量) 列表"""
+        n = len(text)
+        if n == 0:
+            return [(text, 0)]
+
+        # 前缀和：cum[i] 为 text[:i] 的token数，区间开销 O(1) 计算
+        cum = [0.0]
+        cum.extend(accumulate(self._char_costs(text)))
+
+        if self._fits(cum, 0, n):
+            return [(text, 0)]
+
+        # 整篇文本只扫描一次句子边界
+        boundaries = [match.end() for match in SENTENCE_ENDINGS.finditer(text)]
+
+        chunks = []
+        start = 0
+        while start < n:
+            end = self._max_end(cum, start, n)
+            if end >= n:
+                chunks.append((text[start:], start))
+                break
+
+            # 在 (start, end] 范围内找最后一个句子边界
+            idx = bisect.bisect_right(boundaries, end) - 1
+            cut = boundaries[idx] if idx >= 0 and boundaries[idx] > start else end
+
+            chunks.append((text[start:cut], start))
+            start = self._overlap_start(cum, start, cut)
+
+        return chunks
+
+    def _fits(self, cum: List[float], start: int, end: int) -> bool:
+        if self.max_chars is not None and end - start > self.max_chars:
+            return False
+        return self.max_tokens is None or cum[end] - cum[start] <= self.max_tokens
+
+    def _max_end(self, cum: List[float], start: int, n: int) -> int:
+        """从 start 开始、不超过预算的最远结束位置（至少前进一个字符）"""
+        end = n
+        if self.max_chars is not None:
+            end = min(end, start + self.max_chars)
+        if self.max_tokens is not None:
+            end = min(end, bisect.bisect_right(cum, cum[start] + self.max_tokens, start, n + 1) - 1)
+        return max(end, start + 1)
+
+    def _overlap_start(self, cum: List[float], start: int, cut: int) -> int:
+        """下一个块的起始位置：从 cut 向前回退约 overlap_tokens 个token，且保证向前推进"""
+        if not self.overlap_tokens:
+            return cut
+        next_start = bisect.bisect_left(cum, cum[cut] - self.overlap_tokens, start, cut + 1)
+        if self.max_chars is not None:
+            # 重叠部分不超过块长度的一半，避免块数成倍增加
+            next_start = max(next_start, cut - self.max_chars // 2)
+        return min(max(next_start, start + 1), cut)
+
+
+def merge_chunk_entities(chunk_entities: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """合并各文本块的实体（位置已换算为原文位置），消除重叠区内的重复实体
+
+    相邻块的重叠区会被识别两次：位置相同的实体只保留置信度更高的一个；
+    来自不同块、位置相交的实体（如一个块在边界处只识别到"王鸿"，另一个块识别到"王鸿雁"）
+    只保留更长的一个。同一块内部的实体保持原样。
+    """
+    tagged = [
+        (entity['start'], -(entity['end'] - entity['start']), chunk_index, entity)
+        for chunk_index, entities in enumerate(chunk_entities)
+        for entity in entities
+    ]
+    tagged.sort(key=lambda item: (item[0], item[1], item[2]))
+
+    merged: List[Tuple[int, Dict[str, Any]]] = []
+    for _, _, chunk_index, entity in tagged:
+        if merged:
+            last_chunk, last = merged[-1]
+            overlaps = entity['start'] < last['end']
+            if overlaps and (last_chunk != chunk_index or
+                             (entity['start'], entity['end'], entity['type']) ==
+                             (last['start'], last['end'], last['type'])):
+                if _entity_rank(entity) > _entity_rank(last):
+                    merged[-1] = (chunk_index, entity)
+                continue
+        merged.append((chunk_index, entity))
+
+    return [entity for _, entity in merged]
+
+
+def _entity_rank(entity: Dict[str, Any]):
+    return (entity['end'] - entity['start'], entity.get('prob', 0))
+
+
+def normalize_chunk(text: str) -> Tuple[str, List[int]]:
+    """规范化文本块：去掉首尾空白，内部连续空白合并为一个空格
+
+    返回 (规范化文本, 位置表)，位置表中第i项为规范化文本第i个字符在原文中的位置（升序），
+    用于在规范化后相同的文本块之间换算实体位置。
+    """
+    normalized: List[str] = []
+    positions: List[int] = []
+    pending_space = -1
+    for i, char in enumerate(text):
+        if char.isspace():
+            if normalized and pending_space < 0:
+                pending_space = i
+            continue
+        if pending_space >= 0:
+            normalized.append(' ')
+            positions.append(pending_space)
+            pending_space = -1
+        normalized.append(char)
+        positions.append(i)
+    return ''.join(normalized), positions
+
+
+def deduplicate_chunks(chunks: List[str]) -> Tuple[List[str], List[List[Tuple[int, List[int]]]]]:
+    """合并规范化后相同的文本块
+
+    规范化文本只用作去重的键，识别时使用每组第一次出现的原始文本块，模型输入与不去重时一致。
+    返回 (每组第一次出现的原始文本块, 每组的出现位置)，出现位置为
+    [(原文本块序号, normalize_chunk 返回的位置表)]，第一项即识别时使用的文本块。只含空白的文本块不参与识别。
+    """
+    unique_texts: List[str] = []
+    occurrences: List[List[Tuple[int, List[int]]]] = []
+    index: Dict[str, int] = {}
+    for chunk_index, chunk in enumerate(chunks):
+        normalized, positions = normalize_chunk(chunk)
+        if not normalized:
+            continue
+        unique_index = index.get(normalized)
+        if unique_index is None:
+            unique_index = index[normalized] = len(unique_texts)
+            unique_texts.append(chunk)
+            occurrences.append([])
+        occurrences[unique_index].append((chunk_index, positions))
+    return unique_texts, occurrences
+
+
+def expand_chunk_entities(chunks: List[str], unique_entities: List[List[Dict[str, Any]]],
+                          occurrences: List[List[Tuple[int, List[int]]]]) -> List[List[Dict[str, Any]]]:
+    """把每组第一次出现的文本块的识别结果复制到该组的每次出现
+
+    实体位置为第一次出现的文本块内的位置，经规范化文本的位置表换算为其他各次出现内的位置。
+    """
+    chunk_entities: List[List[Dict[str, Any]]] = [[] for _ in chunks]
+    for entities, chunk_occurrences in zip(unique_entities, occurrences):
+        first_index, first_positions = chunk_occurrences[0]
+        valid = [
+            entity for entity in entities
+            if isinstance(entity.get('start'), int) and isinstance(entity.get('end'), int)
+            and 0 <= entity['start'] < entity['end'] <= len(chunks[first_index])
+        ]
+        chunk_entities[first_index] = valid
+        for chunk_index, positions in chunk_occurrences[1:]:
+            chunk = chunks[chunk_index]
+            expanded = []
+            for entity in valid:
+                # 实体覆盖的规范化字符区间，首尾的空白在规范化时已去掉
+                start = bisect.bisect_left(first_positions, entity['start'])
+                end = bisect.bisect_left(first_positions, entity['end'])
+                if start >= end:
+                    continue
+                raw_start, raw_end = positions[start], positions[end - 1] + 1
+                expanded.append(dict(entity, start=raw_start, end=raw_end, span=chunk[raw_start:raw_end]))
+            chunk_entities[chunk_index] = expanded
+    return chunk_entities
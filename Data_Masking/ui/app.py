@@ -13,6 +13,7 @@ from Data_Masking.masking import (
     DataMasker, DocumentMasker
 )
 from Data_Masking.NER_model import NERModelLoader, batch_recognize_entities
+from Data_Masking.instrumentation import configure_logging
 
 # 创建Flask应用
 app = Flask(__name__)
@@ -141,8 +142,7 @@ def upload_file():
             file_path=file_path,
             mask=True,
             output_dir=OUTPUT_FOLDER,
-            save_mapping=True,
-            enable_parallel=False
+            save_mapping=True
         )
         print(f"[DEBUG] 文档处理完成")
         
@@ -249,8 +249,7 @@ def unmask_file(filename):
             file_path=original_file,
             mask=False,
             output_dir=OUTPUT_FOLDER,
-            save_mapping=True,
-            enable_parallel=False
+            save_mapping=True
         )
         
         # 获取恢复后的文件路径
@@ -377,8 +376,7 @@ def api_mask_document():
             file_path=file_path,
             mask=True,
             output_dir=OUTPUT_FOLDER,
-            save_mapping=True,
-            enable_parallel=False
+            save_mapping=True
         )
         
         # 获取输出文件路径
@@ -455,8 +453,7 @@ def api_unmask_document():
             file_path=original_file,
             mask=False,
             output_dir=OUTPUT_FOLDER,
-            save_mapping=True,
-            enable_parallel=False
+            save_mapping=True
         )
         
         # 获取恢复后的文件路径
@@ -473,5 +470,7 @@ def api_unmask_document():
 
 
 if __name__ == '__main__':
+    # 按 config.json 中的 log_config 输出处理日志
+    configure_logging()
     # 启动Flask应用
     app.run(host='0.0.0.0', port=8080, debug=True)
\ No newline at end of file
@@ -44,6 +44,7 @@ from Data_Masking.masking import (
 )
 from Data_Masking.strategies import HybridContextStrategy
 from Data_Masking.NER_model import NERModelLoader, batch_recognize_entities
+from Data_Masking.instrumentation import configure_logging
 
 # 设置应用样式
 def set_macos_style(app):
@@ -179,8 +180,7 @@ class ProcessingThread(QThread):
                             file_path=self.file_path,
                             mask=True,
                             output_dir=self.output_dir,
-                            save_mapping=True,
-                            enable_parallel=False
+                            save_mapping=True
                         )
                         print(f"[DEBUG] process_document_file 调用成功")
                     except Exception as doc_error:
@@ -1252,6 +1252,9 @@ class MainWindow(QMainWindow):
 
 # 主函数
 if __name__ == "__main__":
+    # 按 config.json 中的 log_config 输出处理日志
+    configure_logging()
+
     # 创建应用
     app = QApplication(sys.argv)
     
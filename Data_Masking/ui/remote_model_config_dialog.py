@@ -220,36 +220,56 @@ class RemoteModelConfigDialog(QDialog):
 
     def save_config(self):
         """保存配置"""
-        config = {
-            "model_config": {
-                "model_type": "remote",
-                "api_type": self.api_type_combo.currentText(),
-                "api_base": self.api_base_input.text(),
-                "api_key": self.api_key_input.text(),
-                "model_name": self.model_name_input.text(),
-                "temperature": self.temperature_input.value(),
-                "max_tokens": self.max_tokens_input.value(),
-                "timeout": self.timeout_input.value()
-            },
-            "ner_config": {
-                "enable_parallel": self.enable_parallel_combo.currentText() == "是",
-                "num_workers": self.num_workers_input.value(),
-                "max_chunk_size": self.max_chunk_size_input.value(),
-                "supported_entity_types": [
-                    line.strip() for line in self.entity_types_input.toPlainText().split('\n')
-                    if line.strip()
-                ]
-            },
-            "prompt_template": {
-                "system_prompt": self.system_prompt_input.toPlainText(),
-                "user_prompt": self.user_prompt_input.toPlainText()
-            }
-        }
+        # 保留界面未覆盖的配置项（如缓存配置），只更新界面中编辑的部分
+        config = {}
+        if os.path.exists(self.config_path):
+            try:
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            except Exception:
+                config = {}
+
+        model_config = config.get("model_config", {})
+        ner_config = config.get("ner_config", {})
+        prompt_template = config.get("prompt_template", {})
+
+        # 保留已选择的本地后端，只在未配置时默认使用远程模型
+        model_config.setdefault("model_type", "remote")
+        model_config.update({
+            "api_type": self.api_type_combo.currentText(),
+            "api_base": self.api_base_input.text(),
+            "api_key": self.api_key_input.text(),
+            "model_name": self.model_name_input.text(),
+            "temperature": self.temperature_input.value(),
+            "max_tokens": self.max_tokens_input.value(),
+            "timeout": self.timeout_input.value()
+        })
+        ner_config.update({
+            "enable_parallel": self.enable_parallel_combo.currentText() == "是",
+            "num_workers": self.num_workers_input.value(),
+            "max_chunk_size": self.max_chunk_size_input.value(),
+            "supported_entity_types": [
+                line.strip() for line in self.entity_types_input.toPlainText().split('\n')
+                if line.strip()
+            ]
+        })
+        prompt_template.update({
+            "system_prompt": self.system_prompt_input.toPlainText(),
+            "user_prompt": self.user_prompt_input.toPlainText()
+        })
+
+        config["model_config"] = model_config
+        config["ner_config"] = ner_config
+        config["prompt_template"] = prompt_template
 
         try:
             with open(self.config_path, 'w', encoding='utf-8') as f:
                 json.dump(config, f, ensure_ascii=False, indent=2)
 
+            # 丢弃已创建的NER后端，下次处理文档时按新配置（含并行、线程数、分块大小）重新创建
+            from Data_Masking.backends import reset_backends
+            reset_backends()
+
             QMessageBox.information(self, "保存成功", "配置已成功保存")
             self.accept()
         except Exception as e:
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 级联识别故障检查 - 初筛模型的请求全部失败时，每个文本块都应升级到主模型，而不是让主模型熔断、整篇文档降级
+#
+# 用法:
+#     python benchmarks/check_cascade_failover.py --chars 5000
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from ner_benchmark import build_document, load_base_config, merge_config
+
+from Data_Masking.backends import get_backend, reset_backends
+from Data_Masking.mock_ner_server import DEFAULT_GAZETTEER, MockNERServer
+from Data_Masking.ner_resilience import RemoteNERError
+from Data_Masking.remote_ner_model import arecognize_entities, recognize_entities
+
+
+def run_check(text: str, expected, use_async: bool, shared_endpoint: bool, failure_threshold: int,
+              quiet: bool = True) -> bool:
+    """主模型正常、初筛模型的每个请求都返回500时识别一次文档，返回检查是否通过
+
+    shared_endpoint 为True时初筛模型与主模型使用同一个服务（该服务只对初筛模型返回500），
+    否则初筛模型使用另一个对所有请求都返回500的服务。
+    """
+    label = f"{'异步' if use_async else '多线程'}，{'共用服务' if shared_endpoint else '独立服务'}"
+    with MockNERServer(failing_models=['mock-ner-small']) as main_server, \
+            MockNERServer(error_rate=1.0) as screen_server:
+        screen_overrides = {'model_name': 'mock-ner-small'}
+        if not shared_endpoint:
+            screen_overrides['api_base'] = screen_server.url
+        config = merge_config(load_base_config(), {
+            'model_config': {'api_base': main_server.url, 'endpoints': [], 'model_name': 'mock-ner'},
+            'ner_config': {'max_chunk_size': 200, 'pack_size': 1},
+            'cascade_config': {'enabled': True, 'confidence_threshold': 0.8,
+                               'screen_model_config': screen_overrides},
+            'rate_limit_config': {'requests_per_minute': 0, 'tokens_per_minute': 0, 'max_retries': 1,
+                                  'backoff_base': 0.01, 'backoff_max': 0.02},
+            'circuit_breaker_config': {'enabled': True, 'failure_threshold': failure_threshold,
+                                       'recovery_seconds': 60},
+        })
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+            config_path = f.name
+
+        previous = os.environ.get('DATA_MASKING_CONFIG')
+        os.environ['DATA_MASKING_CONFIG'] = config_path
+        try:
+            reset_backends()
+            # 初筛请求的重试、熔断日志和进度条会大量输出，检查时屏蔽
+            sink = io.StringIO()
+            with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext(), \
+                    contextlib.redirect_stderr(sink) if quiet else contextlib.nullcontext():
+                try:
+                    if use_async:
+                        result = asyncio.run(arecognize_entities(text))
+                    else:
+                        result = recognize_entities(text, save_to_file=False, enable_parallel=True, num_workers=4)
+                except RemoteNERError as e:
+                    error = e
+                else:
+                    error = None
+            if error is not None:
+                print(f"{label}: 识别失败 {type(error).__name__}: {error} -> 失败")
+                return False
+            model = get_backend()
+            stats = model.get_cascade_stats()
+            main_open = model.circuit_breaker.is_open
+            screen_open = model.cascade.screen_model.circuit_breaker.is_open
+        finally:
+            reset_backends()
+            if previous is None:
+                os.environ.pop('DATA_MASKING_CONFIG', None)
+            else:
+                os.environ['DATA_MASKING_CONFIG'] = previous
+            os.remove(config_path)
+
+        found = {(entity['span'], entity['type']) for entity in result['output']}
+        # 主模型的请求数 = 初筛服务收到的请求之外的请求（共用服务时两者都发往 main_server）
+        screen_requests = main_server.stats['errors'] if shared_endpoint else screen_server.stats['requests']
+        main_requests = main_server.stats['requests'] - main_server.stats['errors']
+        passed = (stats['screened'] > 0 and stats['escalated'] == stats['screened'] == stats['screen_failed']
+                  and main_requests == stats['screened'] and screen_open and not main_open
+                  and expected <= found)
+        print(f"{label}: 初筛{stats['screened']}块，初筛失败{stats['screen_failed']}块，升级{stats['escalated']}块；"
+              f"初筛请求{screen_requests}个，主模型请求{main_requests}个；"
+              f"初筛模型{'已' if screen_open else '未'}熔断，主模型{'已' if main_open else '未'}熔断；"
+              f"识别到{len(found & expected)}/{len(expected)}个实体 -> {'通过' if passed else '失败'}")
+        return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="级联识别初筛模型故障检查")
+    parser.add_argument('--chars', type=int, default=5000, help="测试文档字符数")
+    parser.add_argument('--failure-threshold', type=int, default=3, help="熔断器的连续失败次数阈值")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help="显示远程模型的请求日志")
+    args = parser.parse_args()
+
+    text, expected = build_document(DEFAULT_GAZETTEER, args.chars, args.seed)
+    results = [run_check(text, expected, use_async, shared_endpoint, args.failure_threshold, quiet=not args.verbose)
+               for shared_endpoint in (True, False) for use_async in (False, True)]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 并发脱敏检查 - 多个线程同时脱敏时，每个实体只能得到一个脱敏标记，保存的映射表重新加载后能恢复全部原文
+#
+# 用法:
+#     python benchmarks/check_masking_concurrency.py --threads 32
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from ner_benchmark import build_document, load_base_config, merge_config
+
+from Data_Masking.backends import reset_backends
+from Data_Masking.maskers import DataMasker, DocumentMasker
+from Data_Masking.maskers.mapping_store import EntityKey, MappingStore
+from Data_Masking.maskers.mask_id import MASKED_ID_PATTERN
+from Data_Masking.mock_ner_server import DEFAULT_GAZETTEER, MockNERServer
+
+ENTITY_TYPES = ["人名", "地名", "机构名"]
+
+
+def count_conflicts(masker: DataMasker, outputs: List[str]) -> Tuple[int, int, int]:
+    """统计脱敏结果中的实体数、得到多个脱敏标记的实体数和映射表中不存在的脱敏标记数"""
+    seen: Dict[EntityKey, Set[str]] = {}
+    unknown = 0
+    for output in outputs:
+        for mask_id in MASKED_ID_PATTERN.findall(output):
+            key = masker.mapping.get(mask_id)
+            if key is None:
+                unknown += 1
+            else:
+                seen.setdefault(key, set()).add(mask_id)
+    return len(seen), sum(len(mask_ids) > 1 for mask_ids in seen.values()), unknown
+
+
+def check_mapping_store(threads: int) -> bool:
+    """多个线程对同一批实体反复并发申请脱敏标记，检查同一实体只有一个标记、两个映射一致"""
+    rng = random.Random(0)
+    entities = [(f"实体{i}", rng.choice(ENTITY_TYPES)) for i in range(200)]
+    keys = [rng.choice(entities) for _ in range(20000)]
+
+    def new_mask_id() -> str:
+        time.sleep(0.0001)  # 放大生成标记期间的竞争窗口
+        return f"__MASKED_{uuid.uuid4().hex[:8]}__"
+
+    def run(get_or_create) -> Tuple[int, float]:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(get_or_create, keys))
+        seen: Dict[EntityKey, Set[str]] = {}
+        for key, mask_id in zip(keys, results):
+            seen.setdefault(key, set()).add(mask_id)
+        return sum(len(mask_ids) > 1 for mask_ids in seen.values()), time.perf_counter() - started
+
+    # 不加锁的"先查询再写入"，用于对照
+    plain_mapping: Dict[str, EntityKey] = {}
+    plain_entity_to_mask: Dict[EntityKey, str] = {}
+
+    def unsafe_get_or_create(key: EntityKey) -> str:
+        if key in plain_entity_to_mask:
+            return plain_entity_to_mask[key]
+        mask_id = new_mask_id()
+        plain_mapping[mask_id] = key
+        plain_entity_to_mask[key] = mask_id
+        return mask_id
+
+    conflicts, elapsed = run(unsafe_get_or_create)
+    print(f"不加锁（对照）: {conflicts}个实体得到了多个脱敏标记，映射表 {len(plain_mapping)} 条，耗时 {elapsed:.3f}s")
+
+    store = MappingStore()
+    conflicts, elapsed = run(lambda key: store.get_or_create(key[0], key[1], new_mask_id))
+    mapping, entity_to_mask = store.snapshot()
+    consistent = len(mapping) == len(entity_to_mask) == len(set(keys)) and \
+        all(mapping[mask_id] == key for key, mask_id in entity_to_mask.items())
+    passed = conflicts == 0 and consistent
+    print(f"MappingStore: {conflicts}个实体得到了多个脱敏标记，映射表 {len(mapping)} 条，"
+          f"两个映射{'一致' if consistent else '不一致'}，耗时 {elapsed:.3f}s -> {'通过' if passed else '失败'}")
+    return passed
+
+
+def check_data_masker(threads: int, mask_secret: Optional[str]) -> bool:
+    """多个线程用 DataMasker.mask_text 并发脱敏共享实体的文档（实体预先给出，不调用NER模型）"""
+    rng = random.Random(0)
+    names = [(f"当事人{i:03d}", rng.choice(ENTITY_TYPES)) for i in range(200)]
+    filler = "本院经审理查明，双方当事人之间的法律关系清楚。"
+    documents = []
+    for _ in range(300):
+        pieces, document_entities = [], []
+        for span, entity_type in rng.sample(names, 20):
+            pieces.append(filler[:rng.randint(2, len(filler))])
+            start = sum(map(len, pieces))
+            pieces.append(span)
+            document_entities.append({"span": span, "type": entity_type, "start": start, "end": start + len(span)})
+        documents.append(("".join(pieces), document_entities))
+
+    with tempfile.TemporaryDirectory() as directory:
+        mapping_file = os.path.join(directory, "masking_map.pkl")
+        masker = DataMasker(mapping_file, mask_secret=mask_secret)
+
+        def mask_document(index: int) -> str:
+            text, document_entities = documents[index]
+            return masker.mask_text(text, save_mapping=index % 10 == 0, num_workers=4,
+                                    enable_parallel=True, entities=document_entities)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            outputs = list(executor.map(mask_document, range(len(documents))))
+        elapsed = time.perf_counter() - started
+        masker._save_mapping()
+
+        entity_count, conflicts, unknown = count_conflicts(masker, outputs)
+        restored = DocumentMasker(DataMasker(mapping_file, mask_secret=mask_secret)).unmask_document(
+            [{"text": output} for output in outputs], num_workers=8, enable_parallel=True)
+        round_trip = all(item["text"] == text for item, (text, _) in zip(restored, documents))
+
+    passed = conflicts == 0 and unknown == 0 and entity_count == len(names) and round_trip and \
+        len(masker.mapping) == len(masker.entity_to_mask) == len(names)
+    print(f"DataMasker（{'密钥派生' if mask_secret else '随机'}标记）: {entity_count}个实体，"
+          f"{conflicts}个实体得到了多个脱敏标记，映射表 {len(masker.mapping)} 条，"
+          f"重新加载后{'全部恢复' if round_trip else '恢复失败'}，耗时 {elapsed:.3f}s -> {'通过' if passed else '失败'}")
+    return passed
+
+
+def check_document_masker(threads: int, chars: int) -> bool:
+    """多个线程用共享同一个 DataMasker 的 DocumentMasker 并发脱敏文档（实体由本地模拟NER服务识别）"""
+    documents = []
+    for seed in range(threads):
+        text, _ = build_document(DEFAULT_GAZETTEER, chars, seed)
+        documents.append([{"text": paragraph} for paragraph in text.split("。") if paragraph])
+
+    with MockNERServer() as server, tempfile.TemporaryDirectory() as directory:
+        config = merge_config(load_base_config(), {
+            'model_config': {'api_base': server.url, 'endpoints': [], 'model_name': 'mock-ner'},
+            'rate_limit_config': {'requests_per_minute': 0, 'tokens_per_minute': 0},
+        })
+        config_path = os.path.join(directory, "config.json")
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+        mapping_file = os.path.join(directory, "masking_map.pkl")
+
+        previous = os.environ.get('DATA_MASKING_CONFIG')
+        os.environ['DATA_MASKING_CONFIG'] = config_path
+        try:
+            reset_backends()
+            document_masker = DocumentMasker(DataMasker(mapping_file))
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                outputs = list(executor.map(
+                    lambda content_list: document_masker.mask_document(content_list, save_mapping=False,
+                                                                       enable_parallel=True),
+                    documents))
+            elapsed = time.perf_counter() - started
+            document_masker.masker._save_mapping()
+            restored = [DocumentMasker(DataMasker(mapping_file)).unmask_document(output) for output in outputs]
+        finally:
+            reset_backends()
+            if previous is None:
+                os.environ.pop('DATA_MASKING_CONFIG', None)
+            else:
+                os.environ['DATA_MASKING_CONFIG'] = previous
+
+    masker = document_masker.masker
+    texts = [item["text"] for output in outputs for item in output]
+    entity_count, conflicts, unknown = count_conflicts(masker, texts)
+    round_trip = restored == documents
+    passed = entity_count > 0 and conflicts == 0 and unknown == 0 and round_trip and \
+        len(masker.mapping) == len(masker.entity_to_mask)
+    print(f"DocumentMasker: {len(documents)}篇文档，{entity_count}个实体，{conflicts}个实体得到了多个脱敏标记，"
+          f"映射表 {len(masker.mapping)} 条，重新加载后{'全部恢复' if round_trip else '恢复失败'}，"
+          f"耗时 {elapsed:.3f}s -> {'通过' if passed else '失败'}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发脱敏检查")
+    parser.add_argument('--threads', type=int, default=32, help="并发脱敏的线程数")
+    parser.add_argument('--chars', type=int, default=2000, help="DocumentMasker 检查中每篇文档的字符数")
+    parser.add_argument('--verbose', action='store_true', help="显示进度条和识别日志")
+    args = parser.parse_args()
+
+    # 进度条和识别日志会大量输出，检查时屏蔽
+    with contextlib.redirect_stderr(io.StringIO()) if not args.verbose else contextlib.nullcontext():
+        results = [
+            check_mapping_store(args.threads),
+            check_data_masker(args.threads, None),
+            check_data_masker(args.threads, "tenant-secret"),
+            check_document_masker(args.threads, args.chars),
+        ]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
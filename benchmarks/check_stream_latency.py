@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 流式响应检查 - 启用流式响应时，第一个实体应在模型解码完最后一个token之前返回，同步和异步接口都以流式方式请求
+#
+# 用法:
+#     python benchmarks/check_stream_latency.py --per-token-ms 5
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from ner_benchmark import build_document, load_base_config, merge_config
+
+from Data_Masking.backends import get_backend, reset_backends
+from Data_Masking.mock_ner_server import DEFAULT_GAZETTEER, LatencyModel, MockNERServer
+
+
+def consume_stream(model, text: str, use_async: bool) -> Tuple[List[Tuple[str, str]], float, float]:
+    """迭代流式接口，返回 (实体, 第一个实体的到达时间, 响应结束时间)，时间从发出请求开始计算"""
+    started = time.perf_counter()
+    arrivals = []
+    entities = []
+
+    async def consume_async():
+        async for entity in model.astream_entities(text):
+            arrivals.append(time.perf_counter() - started)
+            entities.append((entity['span'], entity['type']))
+
+    if use_async:
+        asyncio.run(consume_async())
+    else:
+        for entity in model.stream_entities(text):
+            arrivals.append(time.perf_counter() - started)
+            entities.append((entity['span'], entity['type']))
+    finished = time.perf_counter() - started
+    return entities, arrivals[0] if arrivals else finished, finished
+
+
+def run_check(server: MockNERServer, text: str, use_async: bool) -> bool:
+    """检查一种接口：流式迭代的第一个实体早于响应结束，process_text 的结果与流式迭代一致且以流式方式请求"""
+    label = '异步' if use_async else '同步'
+    model = get_backend()
+
+    server.reset_stats()
+    entities, first_at, finished_at = consume_stream(model, text, use_async)
+    decode_time = server.latency.decode_time(server.stats['completion_tokens'])
+
+    server.reset_stats()
+    result = asyncio.run(model.aprocess_text(text)) if use_async else model.process_text(text)
+    processed = [(entity['span'], entity['type']) for entity in result['output']]
+    streamed = server.stats['streamed'] == server.stats['requests'] == 1
+
+    # 第一个实体应在解码时间过半之前到达，而不是等到最后一个token
+    passed = len(entities) > 1 and first_at < finished_at - decode_time / 2 and processed == entities and streamed
+    print(f"{label}: {len(entities)}个实体，第一个实体 {first_at:.3f}s，响应结束 {finished_at:.3f}s，"
+          f"解码耗时 {decode_time:.3f}s；{label}process_text {'以流式方式请求' if streamed else '未以流式方式请求'}，"
+          f"结果{'一致' if processed == entities else '不一致'} -> {'通过' if passed else '失败'}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式响应的首个实体延迟检查")
+    parser.add_argument('--chars', type=int, default=150, help="测试文本字符数（单个文本块）")
+    parser.add_argument('--per-token-ms', type=float, default=5.0, help="模拟服务每个输出token的解码耗时")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help="显示远程模型的请求日志")
+    args = parser.parse_args()
+
+    text, _ = build_document(DEFAULT_GAZETTEER, args.chars, args.seed)
+    with MockNERServer(latency=LatencyModel(per_token_ms=args.per_token_ms), stream_chunk_chars=4) as server:
+        config = merge_config(load_base_config(), {
+            'model_config': {'api_base': server.url, 'endpoints': [], 'model_name': 'mock-ner', 'stream': True},
+            'ner_config': {'max_chunk_size': max(args.chars * 2, 1000)},
+            'rate_limit_config': {'requests_per_minute': 0, 'tokens_per_minute': 0},
+        })
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+            config_path = f.name
+
+        previous = os.environ.get('DATA_MASKING_CONFIG')
+        os.environ['DATA_MASKING_CONFIG'] = config_path
+        try:
+            reset_backends()
+            # 远程模型会逐条打印请求日志，检查时屏蔽
+            sink = io.StringIO()
+            with contextlib.redirect_stderr(sink) if not args.verbose else contextlib.nullcontext():
+                results = [run_check(server, text, use_async) for use_async in (False, True)]
+        finally:
+            reset_backends()
+            if previous is None:
+                os.environ.pop('DATA_MASKING_CONFIG', None)
+            else:
+                os.environ['DATA_MASKING_CONFIG'] = previous
+            os.remove(config_path)
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
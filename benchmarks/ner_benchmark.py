@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 端到端NER基准测试 - 针对本地模拟服务（或指定的服务）测量不同并发、打包、流式配置下的吞吐
+#
+# 用法:
+#     python benchmarks/ner_benchmark.py --chars 20000 --latency-ms 150 --latency-dist lognormal
+#     python benchmarks/ner_benchmark.py --scenarios threads,async --error-rate 0.05 --rate-limit-rate 0.05
+#     python benchmarks/ner_benchmark.py --api-base http://127.0.0.1:8000/v1 --model qwen2.5-7b
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from Data_Masking.mock_ner_server import DEFAULT_GAZETTEER, LatencyModel, MockNERServer
+from Data_Masking.backends import get_backend, reset_backends
+from Data_Masking.remote_ner_model import arecognize_entities, recognize_entities
+
+# 生成测试文档的句式模板
+SENTENCE_TEMPLATES = [
+    "{人名}于2023年5月12日在{地名}与{机构名}签订了借款合同。",
+    "原告{人名}的联系电话为{手机号}，身份证号为{身份证号}。",
+    "{机构名}的法定代表人{人名}称，其住所地位于{地名}。",
+    "本院认为，被告{人名}应当向{机构名}偿还借款本金及利息。",
+    "证人{人名}出庭作证，其电子邮箱为{电子邮箱}。",
+    "经审理查明，双方当事人之间的借贷关系合法有效，本院予以确认。",
+]
+
+
+def build_document(gazetteer: Dict[str, str], target_chars: int, seed: int = 0) -> Tuple[str, Set[Tuple[str, str]]]:
+    """按模板生成测试文档，返回 (文档, 文档中出现的实体集合)"""
+    rng = random.Random(seed)
+    by_type: Dict[str, List[str]] = {}
+    for span, entity_type in gazetteer.items():
+        by_type.setdefault(entity_type, []).append(span)
+
+    sentences, expected, length = [], set(), 0
+    while length < target_chars:
+        template = rng.choice(SENTENCE_TEMPLATES)
+        values = {}
+        for entity_type in by_type:
+            if "{" + entity_type + "}" in template:
+                span = rng.choice(by_type[entity_type])
+                values[entity_type] = span
+                expected.add((span, entity_type))
+        try:
+            sentence = template.format(**values)
+        except KeyError:
+            # 词典中缺少模板需要的实体类型，跳过该模板
+            continue
+        sentences.append(sentence)
+        length += len(sentence)
+    return "".join(sentences), expected
+
+
+def load_base_config() -> Dict[str, Any]:
+    """以 config.example.json 为基础配置，关闭缓存以免结果被缓存命中影响"""
+    with open(os.path.join(project_root, 'config.example.json'), 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config.setdefault('cache_config', {})['enabled'] = False
+    return config
+
+
+def merge_config(base: Dict[str, Any], overrides: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    config = copy.deepcopy(base)
+    for section, values in overrides.items():
+        config.setdefault(section, {}).update(values)
+    return config
+
+
+# 场景名称 -> (配置覆盖项, 运行方式)
+SCENARIOS: Dict[str, Tuple[Dict[str, Dict[str, Any]], str]] = {
+    'sequential': ({}, 'sequential'),
+    'threads': ({}, 'threads'),
+    'async': ({}, 'async'),
+    'packed': ({'ner_config': {'pack_size': 4}}, 'threads'),
+    'stream': ({'model_config': {'stream': True}}, 'threads'),
+    'async_stream': ({'model_config': {'stream': True}}, 'async'),
+    'compact': ({'ner_config': {'response_format': 'compact'}}, 'threads'),
+    'compact_packed': ({'ner_config': {'response_format': 'compact', 'pack_size': 4}}, 'threads'),
+    'cascade': ({'cascade_config': {'enabled': True, 'screen_model_config': {'model_name': 'mock-ner-small'},
+                                    'confidence_threshold': 0.8}}, 'threads'),
+}
+
+
+def run_scenario(name: str, config: Dict[str, Any], text: str, workers: int,
+                 server: Optional[MockNERServer], quiet: bool = True) -> Dict[str, Any]:
+    """用指定配置运行一次端到端识别，返回耗时和统计信息"""
+    overrides, mode = SCENARIOS[name]
+    scenario_config = merge_config(config, overrides)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+        json.dump(scenario_config, f, ensure_ascii=False)
+        config_path = f.name
+
+    previous = os.environ.get('DATA_MASKING_CONFIG')
+    os.environ['DATA_MASKING_CONFIG'] = config_path
+    if server is not None:
+        server.reset_stats()
+
+    # 远程模型会逐条打印请求日志，测量时屏蔽输出
+    sink = io.StringIO()
+    redirect = (contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink)) if quiet else ()
+    error = None
+    cascade_stats = None
+    started = time.perf_counter()
+    try:
+        with contextlib.ExitStack() as stack:
+            for context in redirect:
+                stack.enter_context(context)
+            reset_backends()
+            started = time.perf_counter()
+            if mode == 'async':
+                result = asyncio.run(arecognize_entities(text, save_to_file=False))
+            else:
+                result = recognize_entities(text, save_to_file=False, num_workers=workers,
+                                            enable_parallel=(mode == 'threads'))
+            cascade_stats = get_backend().get_cascade_stats()
+    except Exception as e:
+        result, error = {'output': []}, f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - started
+
+    reset_backends()
+    if previous is None:
+        os.environ.pop('DATA_MASKING_CONFIG', None)
+    else:
+        os.environ['DATA_MASKING_CONFIG'] = previous
+    os.remove(config_path)
+
+    return {
+        'scenario': name,
+        'seconds': elapsed,
+        'entities': {(entity['span'], entity['type']) for entity in result.get('output', [])},
+        'server': dict(server.stats) if server is not None else None,
+        'cascade': cascade_stats,
+        'error': error,
+    }
+
+
+def format_report(results: List[Dict[str, Any]], expected: Set[Tuple[str, str]], text_length: int) -> str:
+    lines = [f"{'场景':<16}{'耗时(s)':>9}{'字符/秒':>10}{'召回率':>8}{'请求':>6}{'输出token':>10}"
+             f"{'429':>6}{'5xx':>6}{'最大并发':>9}"]
+    for item in results:
+        found = len(item['entities'] & expected)
+        recall = found / len(expected) if expected else 1.0
+        stats = item['server'] or {}
+        lines.append(
+            f"{item['scenario']:<16}{item['seconds']:>9.2f}{text_length / max(item['seconds'], 1e-9):>10.0f}"
+            f"{recall:>8.1%}{stats.get('requests', '-'):>6}{stats.get('completion_tokens', '-'):>10}"
+            f"{stats.get('rate_limited', '-'):>6}"
+            f"{stats.get('errors', '-'):>6}{stats.get('max_in_flight', '-'):>9}"
+        )
+        if item['cascade']:
+            cascade = item['cascade']
+            lines.append(f"    级联: 初筛{cascade['screened']}块，升级{cascade['escalated']}块"
+                         f"（{cascade['escalation_rate']:.0%}；低置信度{cascade['low_confidence']}块，"
+                         f"正则不一致{cascade['regex_disagreement']}块，初筛失败{cascade['screen_failed']}块）")
+        if item['error']:
+            lines.append(f"    失败: {item['error']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="远程NER端到端基准测试")
+    parser.add_argument('--chars', type=int, default=20000, help="测试文档字符数")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"逗号分隔的场景: {', '.join(SCENARIOS)}")
+    parser.add_argument('--workers', type=int, default=8, help="threads 场景的工作线程数")
+    parser.add_argument('--max-concurrent', type=int, default=32, help="async 场景的最大并发请求数")
+    parser.add_argument('--api-base', help="使用已有服务而不启动本地模拟服务（仅统计耗时和召回率）")
+    parser.add_argument('--model', default='mock-ner')
+    parser.add_argument('--latency-dist', default='lognormal', choices=LatencyModel.DISTRIBUTIONS)
+    parser.add_argument('--latency-ms', type=float, default=100.0)
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--per-token-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--screen-uncertain-ratio', type=float, default=0.2,
+                        help="cascade 场景中初筛模型给出低置信度结果的文本块比例")
+    parser.add_argument('--json', help="将结果另存为JSON文件")
+    parser.add_argument('--verbose', action='store_true', help="显示远程模型的请求日志")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}")
+
+    text, expected = build_document(DEFAULT_GAZETTEER, args.chars, args.seed)
+
+    server = None
+    if args.api_base is None:
+        server = MockNERServer(
+            latency=LatencyModel(args.latency_dist, args.latency_ms, args.latency_sigma, args.per_token_ms),
+            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+            retry_after=args.retry_after, seed=args.seed,
+            uncertain_models={'mock-ner-small': args.screen_uncertain_ratio}
+        ).start()
+
+    config = merge_config(load_base_config(), {
+        'model_config': {
+            'api_base': args.api_base or server.url,
+            'endpoints': [],
+            'model_name': args.model,
+            'max_concurrent_requests': args.max_concurrent,
+        },
+        'rate_limit_config': {'requests_per_minute': 0, 'tokens_per_minute': 0,
+                              'backoff_base': 0.05, 'backoff_max': 2.0},
+    })
+
+    print(f"测试文档: {len(text)} 字符，{len(expected)} 个不同实体；服务: {config['model_config']['api_base']}")
+    results = []
+    try:
+        for name in names:
+            results.append(run_scenario(name, config, text, args.workers, server, quiet=not args.verbose))
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(format_report(results, expected, len(text)))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([dict(item, entities=len(item['entities'])) for item in results], f,
+                      ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()